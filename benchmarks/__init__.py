@@ -0,0 +1,4 @@
+"""
+Performance benchmarks for the pricing engine, nesting, PDF export and data layer.
+Run with `python -m benchmarks` from the project root (see benchmarks/runner.py).
+"""
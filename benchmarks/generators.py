@@ -0,0 +1,131 @@
+"""
+Synthetic Job Generators
+Seeded, reproducible materials lists and jobs (1 to 10,000+ items, mixed
+materials and labour) shaped like the Calculator's session state.
+"""
+
+import random
+from typing import Dict, List
+
+from utils.nesting_optimizer import NestingOptimizer
+
+# Common sign sizes in metres (A-sizes, boards, banners, vehicle panels)
+ITEM_SIZES_M = [
+    (0.297, 0.420), (0.420, 0.594), (0.594, 0.841), (0.210, 0.297),
+    (1.220, 2.440), (0.600, 0.900), (1.000, 3.000), (0.500, 0.500),
+    (2.000, 0.800), (1.500, 1.000),
+]
+ROLL_WIDTHS_M = [0.61, 1.00, 1.22, 1.37, 1.52, 1.60]
+SHEET_SIZES_M = [(2.44, 1.22), (3.05, 1.52), (2.00, 1.00)]
+LAMINATES = ["Laminate Gloss", "Laminate Matte", "Anti-Graffiti Laminate"]
+CLIENTS = ["Acme Ltd", "Harbour Cafe", "Northside Motors", "City Council", "Green Grocers", "Bright Dental"]
+
+LABOUR_SHARE = 0.15  # roughly one line in seven is an extra labour entry
+
+
+def make_materials(n: int = 60, seed: int = 0) -> List[Dict]:
+    """
+    Materials list as fetch_materials() returns it: vinyl rolls, laminates,
+    rigid sheets and a few misc items, each with a unique id.
+    """
+    rng = random.Random(seed)
+    materials = [
+        {'id': f"lam{i}", 'name': name, 'cost_per_m2': round(rng.uniform(6, 14), 2),
+         'roll_width': 1.37, 'supplier': "Supplier A", 'category': 'Vinyl'}
+        for i, name in enumerate(LAMINATES)
+    ]
+    for i in range(max(0, n - len(materials))):
+        kind = ('Vinyl', 'Vinyl', 'Sheet', 'Misc')[i % 4]
+        supplier = f"Supplier {'ABCDE'[i % 5]}"
+        if kind == 'Vinyl':
+            width = rng.choice(ROLL_WIDTHS_M)
+            cost_lm = round(rng.uniform(8, 40), 2)
+            doc = {'name': f"Vinyl {i:04d}", 'cost_per_m2': cost_lm / width, 'roll_width': width,
+                   'unit_cost': cost_lm, 'unit_type': 'linear_m'}
+        elif kind == 'Sheet':
+            w, h = rng.choice(SHEET_SIZES_M)
+            cost_sheet = round(rng.uniform(20, 120), 2)
+            doc = {'name': f"Sheet {i:04d}", 'cost_per_m2': cost_sheet / (w * h), 'roll_width': w,
+                   'unit_cost': cost_sheet, 'unit_type': 'sheet'}
+        else:
+            cost = round(rng.uniform(0.1, 5), 2)
+            doc = {'name': f"Fixing {i:04d}", 'cost_per_m2': cost, 'roll_width': 0.0,
+                   'unit_cost': cost, 'unit_type': 'item'}
+        doc.update({'id': f"mat{i:05d}", 'supplier': supplier, 'category': kind})
+        materials.append(doc)
+    return materials
+
+
+def rates(materials: List[Dict]) -> Dict[str, float]:
+    """{name: cost_per_m2}, the mapping PricingEngine is built from."""
+    return {m['name']: m['cost_per_m2'] for m in materials}
+
+
+def make_items(n: int, materials: List[Dict], seed: int = 0, nesting: bool = True) -> List[Dict]:
+    """
+    `n` job lines: material items (a stock plus an optional laminate, with
+    nesting data when `nesting` is set) mixed with extra labour entries.
+    """
+    rng = random.Random(seed)
+    stocks = [m for m in materials if m['category'] in ('Vinyl', 'Sheet') and m['name'] not in LAMINATES]
+    items = []
+    for i in range(n):
+        if i and rng.random() < LABOUR_SHARE:
+            hours = rng.choice([0.5, 1.0, 2.0, 4.0])
+            items.append({
+                'type': 'labor',
+                'description': f"LABOUR: Additional ({hours}h)",
+                'raw_labor': {'prod': hours, 'inst': 0, 'trav': 0, 'fit': 1},
+            })
+            continue
+        stock = rng.choice(stocks)
+        w_m, h_m = rng.choice(ITEM_SIZES_M)
+        qty = rng.choice([1, 1, 2, 4, 6, 10, 25])
+        mats = [stock['name']] + ([rng.choice(LAMINATES)] if rng.random() < 0.6 else [])
+        item = {
+            'type': 'material',
+            'width': w_m,
+            'height': h_m,
+            'qty': qty,
+            'materials': mats,
+            'description': f"{', '.join(mats)} | {qty}x {w_m * 1000:.0f}mm×{h_m * 1000:.0f}mm",
+        }
+        if nesting:
+            width_cm = stock['roll_width'] * 100.0
+            best = NestingOptimizer.calculate_nesting(w_m * 100.0, h_m * 100.0, qty, width_cm, None)['best_layout']
+            item['nesting_area_m2'] = best['total_area_m2']
+            item['nesting_params'] = {
+                'width_cm': w_m * 100.0, 'height_cm': h_m * 100.0,
+                'material_width_cm': width_cm, 'material_length_cm': None,
+                'bleed_mm': 3.0, 'gutter_mm': 5.0,
+            }
+        items.append(item)
+    return items
+
+
+def material_items(items: List[Dict]) -> List[Dict]:
+    return [i for i in items if i.get('type') == 'material']
+
+
+def labour_hours(items: List[Dict], seed: int = 0) -> Dict:
+    """Labour totals for a job (the Calculator's live inputs plus extra labour lines)."""
+    rng = random.Random(seed)
+    extra = sum(i['raw_labor']['prod'] for i in items if i.get('type') == 'labor')
+    return {
+        'prod': rng.choice([1.0, 2.0, 4.0]) + extra,
+        'inst': rng.choice([0.0, 2.0, 6.0]),
+        'trav': rng.choice([0.0, 1.0]),
+        'design': rng.choice([0.0, 0.5, 1.0]),
+        'fitters': rng.choice([1, 2]),
+    }
+
+
+def make_job(n_items: int, materials: List[Dict], seed: int = 0) -> Dict:
+    """A job document shaped like the Calculator's save (pricing `results` are added by the caller)."""
+    rng = random.Random(seed)
+    return {
+        'client': {'name': rng.choice(CLIENTS), 'contact': "", 'description': f"Benchmark job {seed}"},
+        'items': make_items(n_items, materials, seed=seed),
+        'markup': rng.choice([1.5, 2.0, 2.5]),
+        'version': "v5-nesting",
+    }
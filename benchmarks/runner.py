@@ -0,0 +1,202 @@
+"""
+Benchmark Runner
+Times every registered case at each size, reports throughput and p50/p95
+latency, and compares the medians against a stored JSON baseline.
+
+    python -m benchmarks                      # run and compare with baseline.json
+    python -m benchmarks --save               # run and overwrite the baseline
+    python -m benchmarks --only engine,pdf --sizes 1,100 --threshold 1.3
+
+Exits with status 1 when any case is slower than `threshold` x its baseline.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 1.5     # fail when p50 is more than 1.5x the baseline
+MIN_DELTA_MS = 0.05         # ...and slower by at least this much (ignores timer noise)
+CONFIRM_RUNS = 2            # re-measure a slow case this many times before failing it
+
+
+def measure(run: Callable[[], object], reset: Optional[Callable[[], None]] = None,
+            min_runs: int = 5, max_runs: int = 200, min_seconds: float = 0.5,
+            warmup: int = 1) -> List[float]:
+    """
+    Time `run()` repeatedly (calling `reset()` untimed before each call).
+
+    Returns:
+        Per-call durations in seconds: at least `min_runs`, and more until
+        `min_seconds` of samples or `max_runs` have been collected.
+    """
+    for _ in range(warmup):
+        if reset is not None:
+            reset()
+        run()
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while len(samples) < max_runs and (len(samples) < min_runs or sum(samples) < min_seconds):
+            if reset is not None:
+                reset()
+            start = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples
+
+
+def summarise(samples: List[float], size: int) -> Dict:
+    """p50/p95/mean in ms and throughput (size per second at the median)."""
+    arr = np.asarray(samples) * 1000.0
+    p50 = float(np.percentile(arr, 50))
+    return {
+        'p50_ms': p50,
+        'p95_ms': float(np.percentile(arr, 95)),
+        'mean_ms': float(arr.mean()),
+        'runs': len(samples),
+        'throughput': size / (p50 / 1000.0) if p50 > 0 else float('inf'),
+    }
+
+
+def result_key(name: str, size: int) -> str:
+    return f"{name}[{size}]"
+
+
+def run_case(c: Dict, size: int, quick: bool = False, out=sys.stdout) -> Dict:
+    """Build and time one case at one size, printing a result line."""
+    run, reset = c['fn'](size)
+    samples = measure(run, reset, min_runs=3 if quick else 5, min_seconds=0.1 if quick else 0.5)
+    stats = summarise(samples, size)
+    stats['unit'] = c['unit']
+    print(f"{result_key(c['name'], size):<48} p50 {stats['p50_ms']:>10.3f} ms   "
+          f"p95 {stats['p95_ms']:>10.3f} ms   {stats['throughput']:>12,.0f} {c['unit']}/s   "
+          f"({stats['runs']} runs)", file=out)
+    return stats
+
+
+def run_cases(cases: List[Dict], sizes: Optional[List[int]] = None, quick: bool = False,
+              out=sys.stdout) -> Dict[str, Dict]:
+    """Run each case at its sizes (intersected with `sizes` if given)."""
+    results = {}
+    for c in cases:
+        for size in c['sizes']:
+            if sizes is None or size in sizes:
+                results[result_key(c['name'], size)] = run_case(c, size, quick, out)
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float,
+            min_delta_ms: float = MIN_DELTA_MS) -> List[Dict]:
+    """
+    Cases whose p50 exceeds `threshold` x the baseline p50 (and by at least
+    `min_delta_ms`). Cases missing from the baseline are skipped.
+    """
+    regressions = []
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        ratio = stats['p50_ms'] / base['p50_ms'] if base['p50_ms'] > 0 else float('inf')
+        if ratio > threshold and stats['p50_ms'] - base['p50_ms'] >= min_delta_ms:
+            regressions.append({'case': key, 'baseline_ms': base['p50_ms'], 'p50_ms': stats['p50_ms'],
+                                'ratio': ratio})
+    return regressions
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, Dict], threshold: float, previous: Optional[Dict] = None):
+    """Write results as the new baseline, keeping entries for cases that were not re-run."""
+    merged = dict((previous or {}).get('results', {}))
+    merged.update(results)
+    doc = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'numpy': np.__version__,
+        },
+        'threshold': threshold,
+        'results': dict(sorted(merged.items())),
+    }
+    with open(path, 'w') as f:
+        json.dump(doc, f, indent=2)
+        f.write("\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", help="Comma-separated name filters, e.g. engine,db.sqlite")
+    parser.add_argument("--sizes", help="Comma-separated sizes to run (default: each case's own)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--threshold", type=float,
+                        help=f"Allowed p50 slowdown ratio (default: the baseline's, else {DEFAULT_THRESHOLD})")
+    parser.add_argument("--min-delta-ms", type=float, default=MIN_DELTA_MS,
+                        help="Ignore slowdowns smaller than this many ms")
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions (smoke run)")
+    parser.add_argument("--json", help="Also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    from benchmarks.suite import CASES
+
+    cases = CASES
+    if args.only:
+        filters = [f.strip() for f in args.only.split(",") if f.strip()]
+        cases = [c for c in CASES if any(f in c['name'] for f in filters)]
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else None
+
+    baseline = load_baseline(args.baseline)
+    threshold = args.threshold or (baseline or {}).get('threshold') or DEFAULT_THRESHOLD
+
+    results = run_cases(cases, sizes, quick=args.quick)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save:
+        save_baseline(args.baseline, results, threshold, baseline)
+        print(f"\nBaseline saved to {args.baseline} ({len(results)} results)")
+        return 0
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save to create one.")
+        return 0
+
+    regressions = compare(results, baseline.get('results', {}), threshold, args.min_delta_ms)
+    if regressions:
+        # Timings on a shared machine are noisy: keep the fastest of a few re-runs of slow cases
+        print(f"\nRe-measuring {len(regressions)} slow case(s)...")
+        by_key = {result_key(c['name'], size): (c, size) for c in cases for size in c['sizes']}
+        for r in regressions:
+            c, size = by_key[r['case']]
+            for _ in range(CONFIRM_RUNS):
+                stats = run_case(c, size, args.quick)
+                if stats['p50_ms'] < results[r['case']]['p50_ms']:
+                    results[r['case']] = stats
+        regressions = compare(results, baseline.get('results', {}), threshold, args.min_delta_ms)
+    if not regressions:
+        print(f"\nNo case slower than {threshold:.2f}x baseline.")
+        return 0
+    print(f"\n{len(regressions)} case(s) slower than {threshold:.2f}x baseline:")
+    for r in regressions:
+        print(f"  {r['case']:<48} {r['baseline_ms']:.3f} ms -> {r['p50_ms']:.3f} ms ({r['ratio']:.2f}x)")
+    return 1
@@ -0,0 +1,204 @@
+"""
+Benchmark Cases
+Each case builds its inputs for one size outside the timed region and returns
+the callable to time, plus an optional reset run before every repetition (so
+cached paths are measured cold unless the case says otherwise).
+"""
+
+import os
+import random
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks import generators as gen
+from utils import db
+from utils.logic_engine import PricingEngine
+from utils.mixed_nesting import MixedNestingOptimizer
+from utils.nesting_optimizer import NestingOptimizer
+from utils import pdf_gen
+from utils.pdf_gen import generate_quote_pdf, generate_quote_pdf_pair, safe
+
+SIZES = (1, 10, 100, 1000, 10000)
+
+Prepared = Tuple[Callable[[], object], Optional[Callable[[], None]]]
+
+CASES: List[Dict] = []
+
+
+def case(name: str, sizes=SIZES, unit: str = "items"):
+    """Register `fn(size) -> (run, reset)`; throughput is reported as `unit`/s."""
+    def register(fn):
+        CASES.append({'name': name, 'fn': fn, 'sizes': tuple(sizes), 'unit': unit})
+        return fn
+    return register
+
+
+_MATERIALS = gen.make_materials(60)
+
+
+def _engine() -> PricingEngine:
+    return PricingEngine(gen.rates(_MATERIALS))
+
+
+def _job_args(items: List[Dict]) -> Dict:
+    hours = gen.labour_hours(items)
+    return dict(prod_hours=hours['prod'], install_hours=hours['inst'], travel_hours=hours['trav'],
+                installers=hours['fitters'], wastage_percent=15.0, markup=2.0, design_hours=hours['design'],
+                use_nesting=True)
+
+
+# ── Pricing engine ──────────────────────────────────────────────────────────
+
+@case("engine.calculate_job")
+def bench_calculate_job(n: int) -> Prepared:
+    engine = _engine()
+    items = gen.material_items(gen.make_items(n, _MATERIALS))
+    args = _job_args(items)
+    return (lambda: engine.calculate_job(items, **args)), engine.clear_cache
+
+
+@case("engine.calculate_job.cached")
+def bench_calculate_job_cached(n: int) -> Prepared:
+    engine = _engine()
+    items = gen.material_items(gen.make_items(n, _MATERIALS))
+    args = _job_args(items)
+    engine.calculate_job(items, **args)
+    return (lambda: engine.calculate_job(items, **args)), None
+
+
+# ── Nesting ─────────────────────────────────────────────────────────────────
+
+@case("nesting.calculate_nesting")
+def bench_calculate_nesting(n: int) -> Prepared:
+    items = gen.material_items(gen.make_items(n, _MATERIALS))
+    params = [i['nesting_params'] for i in items]
+    qtys = [i['qty'] for i in items]
+
+    def run():
+        for p, qty in zip(params, qtys):
+            NestingOptimizer.calculate_nesting(p['width_cm'], p['height_cm'], qty, p['material_width_cm'],
+                                               p['material_length_cm'], p['bleed_mm'], p['gutter_mm'])
+    return run, NestingOptimizer.clear_cache
+
+
+@case("nesting.mixed_pack", sizes=(100, 1000, 5000), unit="pieces")
+def bench_mixed_pack(n: int) -> Prepared:
+    # Worst case for the packer: every piece a different size, on 2440 x 1220 sheets
+    rng = random.Random(n)
+    pieces = [{'width_cm': rng.uniform(10, 80), 'height_cm': rng.uniform(10, 70), 'qty': 1} for _ in range(n)]
+    return (lambda: MixedNestingOptimizer.pack(pieces, 244.0, 122.0)), MixedNestingOptimizer.clear_cache
+
+
+# ── PDF ─────────────────────────────────────────────────────────────────────
+
+@case("pdf.generate_quote_pdf", sizes=(1, 10, 100, 1000))
+def bench_generate_quote_pdf(n: int) -> Prepared:
+    job = gen.make_job(n, _MATERIALS)
+    hours = gen.labour_hours(job['items'])
+    results = _engine().calculate_job(gen.material_items(job['items']), **_job_args(job['items']))
+    return (lambda: generate_quote_pdf(job['client'], job['items'], results, job['markup'],
+                                       created_by="Benchmark", labour_hours=hours)), None
+
+
+@case("pdf.generate_quote_pdf_pair", sizes=(1, 10, 100, 1000))
+def bench_generate_quote_pdf_pair(n: int) -> Prepared:
+    # Cost report and client quote from one row model (compare with pdf.generate_quote_pdf)
+    job = gen.make_job(n, _MATERIALS)
+    hours = gen.labour_hours(job['items'])
+    results = _engine().calculate_job(gen.material_items(job['items']), **_job_args(job['items']))
+    return (lambda: generate_quote_pdf_pair(job['client'], job['items'], results, job['markup'],
+                                            created_by="Benchmark", labour_hours=hours)), None
+
+
+@case("pdf.safe", sizes=(100, 1000, 10000), unit="cells")
+def bench_safe(n: int) -> Prepared:
+    # Cell text as the report writes it: descriptions, £ amounts, areas and plain labels
+    items = gen.make_items(max(1, n // 4), _MATERIALS, nesting=False)
+    cells = []
+    for i, item in enumerate(items):
+        cells += [item['description'], f"\u00a3{i * 1.37:,.2f}", f"{i * 0.21:.2f} m\u00b2", "Material"]
+    cells = cells[:n]
+    # Cold: each repetition starts with an empty string cache
+    return (lambda: [safe(c) for c in cells]), pdf_gen._latin1.cache_clear
+
+
+# ── Data layer (mock and local SQLite backends) ─────────────────────────────
+
+_tmpdir = None
+
+
+def use_backend(backend: str):
+    """Point utils.db at the mock lists or a fresh SQLite file, without a replica or queue."""
+    global _tmpdir
+    db.reset_db_client()
+    db.DB_BACKEND = backend
+    db.REPLICA_MODE = "off"
+    db.WRITE_BEHIND = "off"
+    if backend == "sqlite":
+        if _tmpdir is None:
+            _tmpdir = tempfile.mkdtemp(prefix="ds-bench-")
+        db.DB_PATH = os.path.join(_tmpdir, f"bench-{len(os.listdir(_tmpdir))}.db")
+    db.MOCK_MATERIALS[:] = []
+    db.MOCK_JOBS[:] = []
+    db.invalidate_materials_cache()
+
+
+def _seed_materials(backend: str, n: int) -> List[str]:
+    use_backend(backend)
+    materials = gen.make_materials(n)
+    store = db.get_store()
+    if store:
+        return store.add_materials(materials)
+    db.MOCK_MATERIALS[:] = [dict(m) for m in materials]
+    return [m['id'] for m in materials]
+
+
+def _db_cases(backend: str):
+
+    @case(f"db.{backend}.fetch_materials", sizes=(10, 100, 1000, 10000), unit="materials")
+    def bench_fetch_materials(n: int) -> Prepared:
+        _seed_materials(backend, n)
+        return (lambda: db.fetch_materials(force_refresh=True)), None
+
+    @case(f"db.{backend}.fetch_materials.cached", sizes=(10, 100, 1000, 10000), unit="materials")
+    def bench_fetch_materials_cached(n: int) -> Prepared:
+        _seed_materials(backend, n)
+        db.fetch_materials()
+        return db.fetch_materials, None
+
+    @case(f"db.{backend}.apply_material_changes", sizes=(1, 10, 100, 1000), unit="rows")
+    def bench_apply_material_changes(n: int) -> Prepared:
+        ids = _seed_materials(backend, n)
+        flip = [0]
+
+        def run():
+            flip[0] += 1
+            return db.apply_material_changes([(i, {'cost_per_m2': 10.0 + flip[0] % 2}) for i in ids])
+        return run, None
+
+    @case(f"db.{backend}.save_job", sizes=(1, 10, 100, 1000), unit="items")
+    def bench_save_job(n: int) -> Prepared:
+        use_backend(backend)
+        job = gen.make_job(n, _MATERIALS)
+        job['results'] = _engine().calculate_job(gen.material_items(job['items']), **_job_args(job['items']))
+        return (lambda: db.save_job(dict(job))), db.MOCK_JOBS.clear
+
+    @case(f"db.{backend}.fetch_jobs_page", sizes=(100, 1000, 10000), unit="jobs")
+    def bench_fetch_jobs_page(n: int) -> Prepared:
+        use_backend(backend)
+        for seed in range(n):
+            db.save_job(gen.make_job(1, _MATERIALS, seed=seed))
+
+        def run():
+            # Walk the whole history a page at a time, as the History tab does
+            cursor = None
+            while True:
+                page = db.fetch_jobs_page(db.JOBS_PAGE_SIZE, start_after=cursor)
+                if not page['has_more']:
+                    return
+                cursor = page['next_cursor']
+        return run, None
+
+
+for _backend in ("mock", "sqlite"):
+    _db_cases(_backend)
@@ -1,9 +1,78 @@
+import math
+import pandas as pd
 import streamlit as st
 from datetime import datetime
-from utils.db import fetch_materials, save_job
-from utils.logic_engine import PricingEngine
+from utils.db import fetch_materials, materials_version, save_job
+from utils.logic_engine import PricingEngine, JobAccumulator
 from utils.nesting_optimizer import NestingOptimizer
-from utils.pdf_gen import generate_quote_pdf
+from utils.mixed_nesting import MixedNestingOptimizer
+from utils.rate_index import MaterialRateIndex
+from utils.stock_selector import StockCatalog, catalog_signature
+from utils.pdf_gen import cached_quote_pdf, quote_fingerprint, render_quote_pdf, write_quote_pdf
+from utils import perf
+
+
+try:
+    # st.download_button accepts a callable (run on click) in newer Streamlit
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    _DEFERRED_DOWNLOADS = hasattr(MediaFileManager, 'add_deferred')
+except ImportError:
+    _DEFERRED_DOWNLOADS = False
+
+
+def _set_markup(value):
+    # Runs before the next rerun renders the markup slider
+    st.session_state.markup_v5 = value
+
+
+def _nest_job_together(job_totals):
+    """
+    Re-nest items that share materials, material width, bleed and gutter as one
+    mixed layout, and give each item its share of the combined area. Each
+    item's description is rewritten for the combined layout; its
+    nesting_result is kept as the single-item layout it replaced.
+    Returns the number of groups combined.
+    """
+    groups = {}
+    for item in job_totals.material_items():
+        params = item.get('nesting_params')
+        if params:
+            key = (tuple(item['materials']), params['material_width_cm'], params.get('material_length_cm'),
+                   params['bleed_mm'], params['gutter_mm'])
+            groups.setdefault(key, []).append(item)
+
+    combined = 0
+    for (_, mat_w, mat_l, bleed, gutter), members in groups.items():
+        if len(members) < 2:
+            continue
+        packed = MixedNestingOptimizer.pack(
+            [{'width_cm': i['nesting_params']['width_cm'],
+              'height_cm': i['nesting_params']['height_cm'],
+              'qty': i['qty']} for i in members],
+            mat_w, mat_l, bleed_mm=bleed, gutter_mm=gutter
+        )
+        for item, share in zip(members, packed['per_item']):
+            item['nesting_area_m2'] = share['share_area_m2']
+            item['mixed_nesting'] = {
+                'group_items': len(members),
+                'total_area_m2': packed['total_area_m2'],
+                'material_length_cm': packed['material_length_cm'],
+                'efficiency_percent': packed['efficiency_percent']
+            }
+            # Swap the single-item layout text (everything from "NESTED") for the combined one
+            head = item.get('description', '').split(' | NESTED', 1)[0]
+            item['description'] = (
+                f"{head} | NESTED (combined, {len(members)} items): "
+                f"{packed['material_length_cm']:.1f}cm run | "
+                f"{share['share_area_m2']:.4f}m² share | "
+                f"Eff: {packed['efficiency_percent']:.1f}%"
+            )
+        combined += 1
+
+    if combined:
+        job_totals.rebuild()
+    return combined
+
 
 # VERSION 5.0 - Nesting Optimizer Edition
 def show_calculator(hourly_rate, client_info=None):
@@ -20,15 +89,44 @@ def show_calculator(hourly_rate, client_info=None):
     if 'design_hours' not in st.session_state:
         st.session_state.design_hours = 0.0
 
-    # Init Engine
-    materials_dict = {m.get('name', 'Unknown'): m.get('cost_per_m2', 0.0) for m in fetch_materials()}
-    engine = PricingEngine(
-        materials_dict, 
-        overhead_rate=st.session_state.hourly_rate,
-        workshop_rate=st.session_state.workshop_rate,
-        fitting_rate=st.session_state.fitting_rate,
-        travel_rate=st.session_state.travel_rate
-    )
+    # Init Engine - the rate index persists across reruns and is reconciled in
+    # place, so unchanged prices keep their slots and interned combinations.
+    # Nothing is reconciled unless the shared materials cache has moved on.
+    with perf.stage("calc.materials"):
+        materials = fetch_materials()
+        mat_version = materials_version()
+        materials_changed = st.session_state.get('materials_version') != mat_version
+        if 'rate_index' not in st.session_state:
+            st.session_state.rate_index = MaterialRateIndex.from_materials(materials)
+        elif materials_changed:
+            st.session_state.rate_index.sync(materials)
+        rate_index = st.session_state.rate_index
+
+        # Roll/sheet stock catalogue for cheapest-stock nesting (rebuilt only when
+        # a width, price or category in the materials list changes)
+        stock_catalog = st.session_state.get('stock_catalog')
+        if stock_catalog is None or (materials_changed and stock_catalog.signature != catalog_signature(materials)):
+            stock_catalog = st.session_state.stock_catalog = StockCatalog(materials)
+        st.session_state.materials_version = mat_version
+
+    # The engine is kept across reruns with the rate index it is bound to. The
+    # live summary below prices JobAccumulator's running totals through
+    # engine.price_totals() (constant time), so calculate_job()'s result cache
+    # is not used on this path; it serves callers that price whole item lists
+    engine = st.session_state.get('pricing_engine')
+    if engine is None or engine.rate_index is not rate_index:
+        engine = st.session_state.pricing_engine = PricingEngine(rate_index)
+    engine.overhead_rate = st.session_state.hourly_rate
+    engine.workshop_rate = st.session_state.workshop_rate
+    engine.fitting_rate = st.session_state.fitting_rate
+    engine.travel_rate = st.session_state.travel_rate
+
+    # Running job totals - rebuilt only if job_items was replaced elsewhere
+    # (e.g. the sidebar reset) or edited behind its back
+    job_totals = st.session_state.get('job_totals')
+    if (job_totals is None or job_totals.items is not st.session_state.job_items
+            or job_totals.rate_index is not rate_index or len(job_totals) != len(st.session_state.job_items)):
+        job_totals = st.session_state.job_totals = JobAccumulator(st.session_state.job_items, rate_index)
 
     # --- TWO COLUMN GRID ---
     col_input, col_view = st.columns([1, 1], gap="medium")
@@ -46,8 +144,10 @@ def show_calculator(hourly_rate, client_info=None):
             st.session_state.use_nesting = use_nesting
             
             with st.form("add_material_form_v5", clear_on_submit=True):
-                m_sel = st.multiselect("Select Materials", options=list(materials_dict.keys()), 
+                m_sel = st.multiselect("Select Materials", options=rate_index.names(), 
                                       placeholder="Choose stock...")
+                item_label = st.text_input("Item Description", placeholder="e.g. Shop fascia sign",
+                                           help="Shown to the client on the quote (materials are not)")
                 
                 # Dimensions
                 r_w1, r_w2 = st.columns(2)
@@ -69,6 +169,9 @@ def show_calculator(hourly_rate, client_info=None):
                     
                     mat_w_val = st.number_input("Material Width (cm)", min_value=10.0, value=155.0, step=1.0,
                                               help="Available material width (max 160cm for vinyl)")
+                    auto_stock = st.checkbox("💷 Auto-select cheapest stock",
+                                             help="Ignore the width above: try every roll width / sheet size in "
+                                                  "the first material's category and use the cheapest overall")
                     
                     col_b1, col_b2 = st.columns(2)
                     bleed = col_b1.number_input("Bleed (mm)", min_value=0.0, value=3.0, step=0.5)
@@ -87,15 +190,42 @@ def show_calculator(hourly_rate, client_info=None):
                             "qty": qty,
                             "materials": m_sel
                         }
+                        if item_label.strip():
+                            item_data['label'] = item_label.strip()
                         
                         # Run nesting optimization if enabled
                         if use_nesting:
                             w_cm = NestingOptimizer.convert_to_cm(w_in, w_u)
                             h_cm = NestingOptimizer.convert_to_cm(h_in, h_u)
+                            mat_l_val = None
+                            orientation = None
+
+                            if auto_stock:
+                                primary_cat = next((m.get('category') or 'Vinyl' for m in materials
+                                                    if m.get('name') == m_sel[0]), None)
+                                choice = stock_catalog.select(w_cm, h_cm, qty, bleed, gutter, category=primary_cat,
+                                                              exclude=m_sel[1:])
+                                if choice is None:
+                                    st.warning(f"No {primary_cat or ''} stock fits this item - using {mat_w_val:.0f}cm.")
+                                else:
+                                    # The chosen stock becomes the primary material
+                                    m_sel = [choice['name']] + [m for m in m_sel[1:] if m != choice['name']]
+                                    item_data['materials'] = m_sel
+                                    mat_w_val = choice['width_cm']
+                                    mat_l_val = choice['length_cm']
+                                    # Lay out the stock the way it was priced
+                                    orientation = choice['orientation']
+                                    item_data['stock_selection'] = {
+                                        k: choice[k] for k in (
+                                            'material_id', 'name', 'category', 'width_cm', 'length_cm',
+                                            'orientation', 'total_area_m2', 'material_cost',
+                                            'candidates_evaluated', 'candidates_total'
+                                        )
+                                    }
                             
                             nesting_result = NestingOptimizer.calculate_nesting(
-                                w_cm, h_cm, qty, mat_w_val, 
-                                bleed_mm=bleed, gutter_mm=gutter
+                                w_cm, h_cm, qty, mat_w_val, mat_l_val,
+                                bleed_mm=bleed, gutter_mm=gutter, orientation=orientation
                             )
                             
                             best = nesting_result['best_layout']
@@ -104,6 +234,11 @@ def show_calculator(hourly_rate, client_info=None):
                             # Store optimized area instead of individual calculation
                             item_data['nesting_area_m2'] = best['total_area_m2']
                             item_data['nesting_result'] = nesting_result
+                            item_data['nesting_params'] = {
+                                'width_cm': w_cm, 'height_cm': h_cm,
+                                'material_width_cm': mat_w_val, 'material_length_cm': mat_l_val,
+                                'bleed_mm': bleed, 'gutter_mm': gutter, 'orientation': orientation
+                            }
                             item_data['description'] = (
                                 f"{', '.join(m_sel)} | {qty}x {w_in}{w_u}×{h_in}{h_u} | "
                                 f"NESTED: {best['orientation']} {best['layout_description']} | "
@@ -120,7 +255,7 @@ def show_calculator(hourly_rate, client_info=None):
                                 f"{', '.join(m_sel)} | {qty}x ({w_in}{w_u}×{h_in}{h_u})"
                             )
                         
-                        st.session_state.job_items.append(item_data)
+                        job_totals.append(item_data)
                         st.rerun()
 
         # Card: Job Settings (Print Ready, Repeat Job, Design Hours)
@@ -165,7 +300,7 @@ def show_calculator(hourly_rate, client_info=None):
                 l_val = st.number_input("Hours", min_value=0.0, step=0.5, key="extra_lab_v5")
                 if st.form_submit_button("ADD ADDITIONAL LABOUR", use_container_width=True):
                     if l_val > 0:
-                        st.session_state.job_items.append({
+                        job_totals.append({
                             "type": "labor",
                             "description": f"LABOUR: {l_desc or 'Additional'} ({l_val}h)",
                             "raw_labor": {"prod": l_val, "inst": 0, "trav": 0, "fit": 1}
@@ -173,26 +308,26 @@ def show_calculator(hourly_rate, client_info=None):
                         st.rerun()
 
     with col_view:
-        # Calculate Results
-        calc_materials = [i for i in st.session_state.job_items if i["type"] == "material"]
-        tot_p = sum([i["raw_labor"]["prod"] for i in st.session_state.job_items if i["type"] == "labor"]) + p_h
-        tot_i = sum([i["raw_labor"]["inst"] for i in st.session_state.job_items if i["type"] == "labor"]) + i_h
-        tot_t = sum([i["raw_labor"]["trav"] for i in st.session_state.job_items if i["type"] == "labor"]) + t_h
-        tot_f = max([i["raw_labor"]["fit"] for i in st.session_state.job_items if i["type"] == "labor"] + [fit])
+        # Calculate Results (from the running totals - no item rescan)
+        tot_p = job_totals.prod_hours + p_h
+        tot_i = job_totals.install_hours + i_h
+        tot_t = job_totals.travel_hours + t_h
+        tot_f = max(job_totals.max_fitters, fit)
 
         markup_val = st.session_state.get('markup_v5', 1.0)
         wastage_val = st.session_state.get('wastage_v5', 15.0)
 
-        results = engine.calculate_job(
-            calc_materials, tot_p, tot_i, 
-            travel_hours=tot_t, installers=tot_f,
-            wastage_percent=wastage_val,
-            markup=markup_val,
-            print_ready=st.session_state.print_ready,
-            repeat_job=st.session_state.repeat_job,
-            design_hours=st.session_state.design_hours,
-            use_nesting=st.session_state.use_nesting
-        )
+        with perf.stage("calc.engine"):
+            results = job_totals.calculate_job(
+                engine, p_h, i_h,
+                travel_hours=t_h, installers=fit,
+                wastage_percent=wastage_val,
+                markup=markup_val,
+                print_ready=st.session_state.print_ready,
+                repeat_job=st.session_state.repeat_job,
+                design_hours=st.session_state.design_hours,
+                use_nesting=st.session_state.use_nesting
+            )
 
         # Card: Summary
         with st.container(border=True):
@@ -238,11 +373,53 @@ def show_calculator(hourly_rate, client_info=None):
             margin = (results['profit'] / results['quote_price']) * 100 if results['quote_price'] > 0 else 0
             st.progress(max(0.0, min(1.0, margin/100)), text=f"Margin: {margin:.1f}%")
 
+            # What-if: solve the markup for a target margin and show the margin
+            # surface over markup x wastage, all from one vectorized engine call
+            with st.expander("🎯 TARGET MARGIN (WHAT-IF)"):
+                mat_raw = job_totals.material_total(st.session_state.use_nesting)
+                flags = dict(
+                    print_ready=st.session_state.print_ready,
+                    repeat_job=st.session_state.repeat_job,
+                    design_hours=st.session_state.design_hours,
+                    use_nesting=st.session_state.use_nesting,
+                    material_cost=mat_raw
+                )
+                target = st.number_input("Target Margin (%)", min_value=0.0, max_value=95.0, value=40.0,
+                                         step=1.0, key="target_margin_v5")
+                with perf.stage("calc.what_if"):
+                    solved = engine.solve_markup(None, tot_p, tot_i, travel_hours=tot_t, installers=tot_f,
+                                                 wastage_percent=wastage_val, target_margin=target, **flags)
+                if solved['markup'] is None:
+                    st.caption("Add materials to solve for a markup.")
+                else:
+                    # Round up to the slider's 0.1 step so the target is still met
+                    needed = math.ceil(solved['markup'] * 10 - 1e-9) / 10
+                    st.caption(f"Markup needed: **x{solved['markup']:.2f}** → "
+                               f"Quote £{solved['results']['quote_price']:.2f}")
+                    if 1.0 <= needed <= 10.0:
+                        st.button(f"APPLY MARKUP x{needed:.1f}", key="apply_markup_v5",
+                                  on_click=_set_markup, args=(needed,), use_container_width=True)
+                    else:
+                        st.caption("Outside the markup slider range (x1.0 - x10.0).")
+
+                with perf.stage("calc.what_if"):
+                    grid = engine.sweep(None, tot_p, tot_i, travel_hours=tot_t,
+                                        markups=[1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0],
+                                        wastage_percents=[0.0, 5.0, 10.0, 15.0, 20.0],
+                                        installers=[tot_f], **flags)
+                surface = pd.DataFrame(
+                    [[f"{v:.1f}%" for v in row] for row in grid['margin_percent'][:, :, 0]],
+                    index=[f"x{m:.1f}" for m in grid['markup']],
+                    columns=[f"{w:.0f}% waste" for w in grid['wastage_percent']]
+                )
+                st.caption("Margin by markup (rows) and wastage (columns):")
+                st.dataframe(surface, use_container_width=True)
+
             st.divider()
             
             # --- UNIT ECONOMICS (PER ITEM) ---
             # Extract total quantity from all material items
-            total_quantity = sum([i['qty'] for i in calc_materials])
+            total_quantity = job_totals.total_qty
             
             if total_quantity > 0:
                 # Use BILLABLE labour (matches the quote price breakdown)
@@ -333,24 +510,21 @@ def show_calculator(hourly_rate, client_info=None):
             
             st.divider()
             
-            # PDF Export
+            # PDF Export - only a fingerprint is taken per rerun; the report is
+            # rendered (once per distinct quote) when a download / save fires
             if results['quote_price'] > 0:
                 try:
-                    from io import BytesIO
                     import os
                     import re
 
-                    # Capture timestamp & user at click time
                     now        = datetime.now()
                     user_name  = st.session_state.get('name', 'Unknown')
-
-                    pdf_bytes  = generate_quote_pdf(
-                        client_info,
-                        st.session_state.job_items,
-                        results,
-                        markup_val,
+                    pdf_args   = dict(
+                        client_info=client_info,
+                        items=st.session_state.job_items,
+                        results=results,
+                        markup=markup_val,
                         created_by=user_name,
-                        timestamp=now,
                         labour_hours={
                             'prod':    tot_p,
                             'inst':    tot_i,
@@ -359,45 +533,102 @@ def show_calculator(hourly_rate, client_info=None):
                             'fitters': tot_f,
                         }
                     )
-                    pdf_buffer = BytesIO(pdf_bytes)
+                    pdf_key = quote_fingerprint(timestamp=now, **pdf_args)
+
+                    def _render_pdf(client=False):
+                        # Timestamp taken at click time; the cost report and client
+                        # quote are rendered together, so the other download is free
+                        with perf.stage("calc.pdf"):
+                            return render_quote_pdf(timestamp=datetime.now(), fingerprint=pdf_key,
+                                                    client=client, **pdf_args)
 
                     # Build a clean filename: DanielSigns_Quote_ClientName_YYYY-MM-DD.pdf
                     safe_client = re.sub(r'[^\w\s-]', '', client_info.get('name', 'Client') or 'Client')
                     safe_client = re.sub(r'\s+', '_', safe_client.strip()) or 'Client'
                     pdf_filename = f"DanielSigns_Quote_{safe_client}_{now.strftime('%Y-%m-%d')}.pdf"
+                    client_filename = f"DanielSigns_ClientQuote_{safe_client}_{now.strftime('%Y-%m-%d')}.pdf"
 
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.download_button(
+                    col1, col2, col3 = st.columns(3)
+                    pdf_bytes = cached_quote_pdf(pdf_key)
+                    if _DEFERRED_DOWNLOADS or pdf_bytes is not None:
+                        col1.download_button(
                             label="📄 DOWNLOAD PDF",
-                            data=pdf_buffer,
+                            data=_render_pdf if pdf_bytes is None else pdf_bytes,
                             file_name=pdf_filename,
                             mime="application/pdf",
                             use_container_width=True
                         )
-                    with col2:
+                        col2.download_button(
+                            label="🧾 CLIENT QUOTE",
+                            data=(lambda: _render_pdf(client=True)) if pdf_bytes is None
+                            else cached_quote_pdf(pdf_key, client=True),
+                            file_name=client_filename,
+                            mime="application/pdf",
+                            help="Client-facing quotation: items and selling prices only",
+                            use_container_width=True
+                        )
+                    elif col1.button("📄 PREPARE PDF", key="prepare_pdf_v5", use_container_width=True):
+                        # Streamlit without deferred downloads: render, then offer the bytes
+                        _render_pdf()
+                        st.rerun()
+                    with col3:
                         if st.button("💾 SAVE TO DESKTOP", use_container_width=True):
                             desktop_path = os.path.join(os.path.expanduser("~"), "Desktop", pdf_filename)
-                            with open(desktop_path, "wb") as f:
-                                f.write(pdf_bytes)
-                            st.success(f"✅ Saved: {pdf_filename}")
+                            cached = cached_quote_pdf(pdf_key)
+                            if cached is not None:
+                                with open(desktop_path, "wb") as f:
+                                    f.write(cached)
+                                saved_kb = len(cached) / 1024
+                            else:
+                                # Not rendered yet: stream it straight into the file
+                                with perf.stage("calc.pdf"):
+                                    saved_kb = write_quote_pdf(desktop_path, timestamp=datetime.now(),
+                                                               **pdf_args)['bytes'] / 1024
+                            st.success(f"✅ Saved: {pdf_filename} ({saved_kb:,.0f} KB)")
                 except Exception as e:
                     st.error(f"PDF Error: {str(e)}")
             else:
                 st.button("📄 DOWNLOAD PDF", disabled=True, use_container_width=True)
 
         # Card: Nesting Analysis (if enabled and materials exist)
-        if st.session_state.use_nesting and calc_materials:
+        if st.session_state.use_nesting and job_totals.total_qty:
             with st.container(border=True):
                 st.markdown('<div class="ds-card-header">🎯 NESTING ANALYSIS</div>', unsafe_allow_html=True)
-                
-                for idx, item in enumerate(calc_materials):
+
+                if st.button("🧩 NEST SAME-MATERIAL ITEMS TOGETHER", key="nest_together_v5",
+                             use_container_width=True,
+                             help="Pack mixed sizes on the same material and width onto one shared layout"):
+                    groups = _nest_job_together(job_totals)
+                    if groups:
+                        st.toast(f"✅ Nested {groups} material group(s) together.")
+                        st.rerun()
+                    else:
+                        st.info("Nothing to combine - add two or more nested items on the same material and width.")
+
+                cache = NestingOptimizer.cache_info()
+                st.caption(f"Layout cache: {cache['hit_rate']:.0%} hit rate over "
+                           f"{cache['hits'] + cache['misses']} lookups ({cache['size']} layouts stored)")
+
+                for idx, item in enumerate(job_totals.material_items()):
                     if 'nesting_result' in item:
                         with st.expander(f"📊 {item['materials'][0]} (x{item['qty']})", expanded=(idx==0)):
                             result = item['nesting_result']
                             best = result['best_layout']
                             savings = result['savings']
-                            
+
+                            if 'mixed_nesting' in item:
+                                mixed = item['mixed_nesting']
+                                col1, col2, col3 = st.columns(3)
+                                col1.metric("Orientation", "Combined")
+                                col2.metric("Efficiency", f"{mixed['efficiency_percent']:.1f}%")
+                                col3.metric("Share", f"{item['nesting_area_m2']:.4f} m²")
+                                st.caption(f"**Combined Nest:** {mixed['group_items']} items on "
+                                           f"{mixed['material_length_cm']:.1f}cm | "
+                                           f"{mixed['total_area_m2']:.4f} m² in total")
+                                st.caption(f"**Replaced single-item layout:** {best['orientation']} "
+                                           f"{best['layout_description']} | {best['total_area_m2']:.4f} m²")
+                                continue
+
                             col1, col2, col3 = st.columns(3)
                             col1.metric("Orientation", best['orientation'])
                             col2.metric("Efficiency", f"{best['efficiency_percent']:.1f}%")
@@ -435,12 +666,13 @@ def show_calculator(hourly_rate, client_info=None):
             else:
                 for idx, item in enumerate(st.session_state.job_items):
                     c1, c2 = st.columns([5, 1])
-                    c1.write(f"**{item['description']}**")
+                    c1.write(f"**{item['label']}** — {item['description']}" if item.get('label')
+                             else f"**{item['description']}**")
                     if c2.button("🗑️", key=f"del_v5_{idx}", use_container_width=True):
-                        st.session_state.job_items.pop(idx); st.rerun()
+                        job_totals.pop(idx); st.rerun()
                 
                 if st.button("🔥 CLEAR", key="clear_v5", use_container_width=True):
-                    st.session_state.job_items = []; st.rerun()
+                    job_totals.clear(); st.rerun()
 
     # Save Button
     if st.button("💾 SAVE ESTIMATE", key="save_v5", use_container_width=True):
@@ -449,6 +681,11 @@ def show_calculator(hourly_rate, client_info=None):
             "items": st.session_state.job_items, 
             "results": results, 
             "markup": markup_val,
+            "labour_hours": {
+                "prod": tot_p, "inst": tot_i, "trav": tot_t,
+                "design": st.session_state.get('design_hours', 0.0), "fitters": tot_f,
+            },
+            "created_by": st.session_state.get('name', 'Unknown'),
             "version": "v5-nesting"
         }
         if save_job(job_data):
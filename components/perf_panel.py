@@ -0,0 +1,62 @@
+import pandas as pd
+import streamlit as st
+from utils import perf
+
+
+def show_perf_panel():
+    """
+    Admin-only rerun timing panel (main.py shows it to the admin user when the
+    page is opened with ?perf=1). Figures cover every session in this process.
+    """
+    st.subheader("Rerun Performance")
+    if not perf.ENABLED:
+        st.info("Instrumentation is off (DANIEL_SIGNS_PERF=off).")
+        return
+
+    rows = perf.summary()
+    if not rows:
+        st.caption("No timings recorded yet.")
+        return
+
+    st.caption("Wall time per stage over the last "
+               f"{perf.WINDOW} samples (count / max are all-time). Slowest p95 first.")
+    st.dataframe(
+        pd.DataFrame(rows),
+        column_config={
+            'stage': 'Stage',
+            'count': st.column_config.NumberColumn('Count', format="%d"),
+            'last_ms': st.column_config.NumberColumn('Last (ms)', format="%.1f"),
+            'p50_ms': st.column_config.NumberColumn('p50 (ms)', format="%.1f"),
+            'p95_ms': st.column_config.NumberColumn('p95 (ms)', format="%.1f"),
+            'max_ms': st.column_config.NumberColumn('Max (ms)', format="%.1f"),
+            'mean_ms': st.column_config.NumberColumn('Mean (ms)', format="%.1f"),
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+
+    selected = st.selectbox("Histogram", [r['stage'] for r in rows], key="perf_stage")
+    hist = perf.histogram(selected)
+    if hist:
+        st.bar_chart(pd.Series(hist, name="reruns"))
+
+    st.caption("Recent reruns (ms per stage):")
+    recent = perf.recent_reruns(50)
+    st.dataframe(
+        pd.DataFrame([{'at': r['at'].strftime("%H:%M:%S"), 'session': r['session'],
+                       'total': round(r['total_ms'], 1),
+                       **{k: round(v, 1) for k, v in r['stages'].items()}} for r in recent]),
+        use_container_width=True,
+        hide_index=True
+    )
+
+    c1, c2 = st.columns(2)
+    if c1.button("💾 Dump to JSONL", key="perf_dump", use_container_width=True):
+        try:
+            written = perf.dump_jsonl()
+            st.success(f"Appended {written} new rerun(s) to {perf.LOG_PATH}")
+        except OSError as e:
+            st.error(f"Could not write {perf.LOG_PATH}: {e}")
+    if c2.button("Reset timings", key="perf_reset", use_container_width=True):
+        perf.reset()
+        st.rerun()
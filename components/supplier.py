@@ -1,12 +1,209 @@
 import streamlit as st
 import pandas as pd
-from utils.db import fetch_materials, add_material, bulk_upload_materials, update_material, delete_material
+import math
+from utils.db import (fetch_materials, add_material, import_materials, apply_material_changes,
+                      materials_cache_info)
+from utils.bulk_import import DEFAULT_SHEET_SIZE_M, summarise
+from utils import perf
+
+
+# ── Editable material grids ─────────────────────────────────────────────────
+
+def _float(value, default=0.0):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if math.isnan(value) else value
+
+
+def _text(value):
+    return '' if value is None or (isinstance(value, float) and math.isnan(value)) else str(value)
+
+
+def _metres(value):
+    """Width/height in metres; values over 10 are taken as mm (e.g. 1370 for 1.37m)."""
+    value = _float(value)
+    return value / 1000.0 if value > 10.0 else value
+
+
+def _vinyl_updates(row, vals):
+    width = _metres(vals['roll_width'])
+    cost_lm = _float(vals['unit_cost'])
+    return {
+        'name': _text(vals['name']),
+        'unit_cost': cost_lm,
+        'roll_width': width,
+        'supplier': _text(vals['supplier']),
+        'cost_per_m2': cost_lm / width if width > 0 else 0
+    }
+
+
+def _sheet_height(row):
+    """Sheet length (m) from the stored area, unit_cost / cost_per_m2, over the width."""
+    unit_cost, rate, width = _float(row.get('unit_cost')), _float(row.get('cost_per_m2')), _float(row.get('roll_width'))
+    if unit_cost > 0 and rate > 0 and width > 0:
+        return unit_cost / rate / width
+    return DEFAULT_SHEET_SIZE_M[1]
+
+
+def _sheet_updates(row, vals):
+    width, height = _metres(vals['roll_width']), _metres(vals['height'])
+    cost_sheet = _float(vals['unit_cost'])
+    area = width * height
+    return {
+        'name': _text(vals['name']),
+        'unit_cost': cost_sheet,
+        'roll_width': width,
+        'supplier': _text(vals['supplier']),
+        'cost_per_m2': cost_sheet / area if area > 0 else 0
+    }
+
+
+def _misc_updates(row, vals):
+    cost = _float(vals['unit_cost'])
+    return {'name': _text(vals['name']), 'unit_cost': cost, 'supplier': _text(vals['supplier']), 'cost_per_m2': cost}
+
+
+def _unchanged(row, updates):
+    """True if saving `updates` would leave the row as it is (e.g. an edit already applied)."""
+    for field, new in updates.items():
+        old = row.get(field)
+        if isinstance(new, float):
+            old = _float(old, None)
+            if old is None or not math.isclose(old, new, rel_tol=1e-9, abs_tol=1e-9):
+                return False
+        elif old != new:
+            return False
+    return True
+
+
+def _show_grid_result(key):
+    """Report the last submission of a grid (kept across the rerun that refreshes it)."""
+    result = st.session_state.pop(f"{key}_result", None)
+    if not result:
+        return
+    ok = [r for r in result['results'] if r['ok']]
+    failed = [r for r in result['results'] if not r['ok']]
+    updated = sum(r['action'] == 'update' for r in ok)
+    deleted = sum(r['action'] == 'delete' for r in ok)
+    if ok:
+        parts = [f"updated {updated}"] * bool(updated) + [f"deleted {deleted}"] * bool(deleted)
+        st.success(f"Materials saved: {', '.join(parts)}.")
+    if failed:
+        st.error(f"{len(failed)} change(s) could not be saved:")
+        st.dataframe(pd.DataFrame([{
+            'material': result['names'].get(r['id'], r['id']),
+            'action': r['action'],
+            'error': r['error'] or 'failed',
+        } for r in failed]), use_container_width=True, hide_index=True)
+
+
+def _material_grid(df, key, columns, column_config, build_updates):
+    """
+    Editable grid for one category. Every edited row and every row ticked for
+    deletion is saved with a single apply_material_changes() call, and the
+    calculator's rate index is patched for each row that succeeded.
+
+    Args:
+        df: The category's materials, index reset to 0..N
+        key: st.data_editor key
+        columns: Columns shown (the id is hidden, a Delete tick is added)
+        column_config: st.data_editor column_config for `columns`
+        build_updates: f(original row, merged row values) -> fields to save
+    """
+    with perf.stage("supplier.grids"):
+        _edit_grid(df, key, columns, column_config, build_updates)
+
+
+def _edit_grid(df, key, columns, column_config, build_updates):
+    _show_grid_result(key)
+
+    df_disp = df[['id'] + columns].copy()
+    df_disp['Delete'] = False
+    edited_df = st.data_editor(
+        df_disp,
+        key=key,
+        column_config={
+            'id': None, # Hide ID
+            'Delete': st.column_config.CheckboxColumn("Delete?", width="small"),
+            **column_config
+        },
+        use_container_width=True,
+        hide_index=True,
+        disabled=["id"]
+    )
+
+    # 1. Deletions (only once confirmed)
+    deletes = []
+    to_delete = edited_df[edited_df["Delete"] == True]
+    if not to_delete.empty:
+        st.warning(f"Deleting {len(to_delete)} material(s)...")
+        if st.button("🗑️ Confirm Material Delete", key=f"{key}_delete"):
+            deletes = to_delete['id'].tolist()
+
+    # 2. Edits
+    updates = []
+    for idx, new_vals in (st.session_state.get(key) or {}).get("edited_rows", {}).items():
+        # Skip if this is just a Delete toggle
+        if not any(col != 'Delete' for col in new_vals):
+            continue
+        row_idx = int(idx)
+        # Safety check
+        if row_idx >= len(df):
+            continue
+        original_row = df.iloc[row_idx]
+        fields = build_updates(original_row, {col: new_vals.get(col, original_row[col]) for col in columns})
+        if not _unchanged(original_row, fields):
+            updates.append((original_row['id'], fields))
+
+    if not updates and not deletes:
+        return
+
+    results = apply_material_changes(updates, deletes)
+    if 'rate_index' in st.session_state:
+        # Patch the calculator's rate index in place
+        fields_by_id = dict(updates)
+        for r in results:
+            if not r['ok']:
+                continue
+            if r['action'] == 'update':
+                st.session_state.rate_index.update_material(r['id'], fields_by_id[r['id']])
+            else:
+                st.session_state.rate_index.remove_material(r['id'])
+
+    st.session_state[f"{key}_result"] = {'results': results, 'names': dict(zip(df['id'], df['name']))}
+    if any(r['ok'] for r in results):
+        # edited_rows is keyed by row position; once rows are deleted or the
+        # list re-read, those positions point at other materials, so start
+        # the editor afresh rather than replay the edits onto shifted rows
+        st.session_state.pop(key, None)
+        st.rerun()
+    _show_grid_result(key)
+
 
 def show_supplier_manager():
     st.header("Supplier Manager")
     
-    # Fetch all materials once
-    all_materials = fetch_materials()
+    # Fetch all materials once (served from the shared cache between refreshes)
+    col_info, col_refresh = st.columns([4, 1])
+    force = col_refresh.button("🔄 Refresh", help="Re-read the materials list from the database now")
+    with perf.stage("supplier.fetch_materials"):
+        all_materials = fetch_materials(force_refresh=force)
+    cache = materials_cache_info()
+    if cache['refreshed_at'] is not None:
+        replica = cache['replica']
+        if replica is None:
+            source = f"refreshes every {cache['ttl_seconds']:.0f}s"
+        elif replica['mode'] == 'listen':
+            source = "live replica"
+        else:
+            source = "replica, polled"
+        col_info.caption(
+            f"Materials last refreshed {cache['refreshed_at']:%H:%M:%S} "
+            f"({cache['age_seconds']:.0f}s ago, {source}) · "
+            f"cache hits {cache['hits']} / misses {cache['misses']}"
+        )
     df_all = pd.DataFrame(all_materials) if all_materials else pd.DataFrame()
     
     # Ensure 'category' column exists
@@ -33,91 +230,18 @@ def show_supplier_manager():
                 if 'unit_cost' not in df_vinyl.columns:
                     df_vinyl['unit_cost'] = df_vinyl['cost_per_m2'] * df_vinyl['roll_width']
                 
-                # Display config
-                df_vinyl_disp = df_vinyl[['id', 'name', 'unit_cost', 'roll_width', 'supplier']].copy()
-                df_vinyl_disp['Delete'] = False
-                
-                edited_df = st.data_editor(
-                    df_vinyl_disp,
-                    key="vinyl_editor",
-                    column_config={
-                        'id': None, # Hide ID
-                        'Delete': st.column_config.CheckboxColumn("Delete?", width="small"),
+                _material_grid(
+                    df_vinyl, "vinyl_editor", ['name', 'unit_cost', 'roll_width', 'supplier'],
+                    {
                         'name': 'Product Name',
                         'unit_cost': st.column_config.NumberColumn('Cost (Linear £)', format="£%.2f", min_value=0.0, step=0.01, required=True),
-                        'roll_width': st.column_config.NumberColumn('Width (m)', format="%.2f m", min_value=0.0, step=0.01, required=True),
+                        'roll_width': st.column_config.NumberColumn('Width (m)', format="%.2f m", min_value=0.0, step=0.01, required=True,
+                                                                    help="Values over 10 are read as mm"),
                         'supplier': 'Supplier'
                     },
-                    use_container_width=True,
-                    hide_index=True,
-                    disabled=["id"]
+                    _vinyl_updates
                 )
 
-                # 1. Handle Deletions
-                to_delete = edited_df[edited_df["Delete"] == True]
-                if not to_delete.empty:
-                    st.warning(f"Deleting {len(to_delete)} material(s)...")
-                    if st.button("🗑️ Confirm Material Delete"):
-                        del_count = 0
-                        for idx, row in to_delete.iterrows():
-                            if delete_material(row['id']):
-                                del_count += 1
-                        
-                        if del_count > 0:
-                            st.success(f"Deleted {del_count} materials.")
-                            st.rerun()
-
-                # 2. Handle Edits
-                if st.session_state.get("vinyl_editor"):
-                    changes = st.session_state["vinyl_editor"].get("edited_rows", {})
-                    
-                    if changes:
-                        updated = False
-                        for idx, new_vals in changes.items():
-                            # Skip if this is just a Delete toggle
-                            if 'Delete' in new_vals and len(new_vals) == 1:
-                                continue
-                                
-                            row_idx = int(idx)
-                            # Safety check
-                            if row_idx >= len(df_vinyl): 
-                                continue
-
-                            original_row = df_vinyl.iloc[row_idx]
-                            mat_id = original_row['id']
-                            
-                            # Merge new values
-                            new_cost_lm = new_vals.get('unit_cost', original_row['unit_cost'])
-                            new_width = new_vals.get('roll_width', original_row['roll_width'])
-                            new_name = new_vals.get('name', original_row['name'])
-                            new_supp = new_vals.get('supplier', original_row['supplier'])
-
-                            # Auto-convert Width (mm -> m)
-                            if new_width > 10.0:
-                                new_width = new_width / 1000.0
-                                st.toast(f"Converted width for {new_name} to {new_width}m")
-
-                            # Recalculate m2 cost
-                            if new_width > 0:
-                                new_cost_m2 = new_cost_lm / new_width
-                            else:
-                                new_cost_m2 = 0
-
-                            # Update DB
-                            success = update_material(mat_id, {
-                                'name': new_name,
-                                'unit_cost': new_cost_lm,
-                                'roll_width': new_width,
-                                'supplier': new_supp,
-                                'cost_per_m2': new_cost_m2
-                            })
-                            if success:
-                                updated = True
-                        
-                        if updated:
-                            st.success("Material updated successfully!")
-                            st.rerun()
-
             else:
                 st.info("No Vinyl materials found.")
         else:
@@ -153,24 +277,33 @@ def show_supplier_manager():
     with tab_sheet:
         st.subheader("Rigid Sheets (Dibond, Acrylic, etc)")
         
-        # View
+        # View & Edit
         if not df_all.empty:
             df_sheet = df_all[df_all['category'] == 'Sheet'].copy()
             
             if not df_sheet.empty:
-                # Show Price per Sheet
-                # Logic: We likely stored the sheet price in 'unit_cost'
+                df_sheet = df_sheet.reset_index(drop=True)
+                if 'unit_cost' not in df_sheet.columns:
+                    df_sheet['unit_cost'] = float('nan')
+
+                # Sheet length isn't stored: recover it from the sheet area (unit_cost / cost_per_m2)
+                df_sheet['height'] = df_sheet.apply(_sheet_height, axis=1)
+                df_sheet['unit_cost'] = df_sheet['unit_cost'].fillna(
+                    df_sheet['cost_per_m2'] * df_sheet['roll_width'] * df_sheet['height']
+                )
                 
-                st.dataframe(
-                    df_sheet[['name', 'unit_cost', 'roll_width', 'supplier']], # reusing roll_width as width, maybe we don't show height in simple table or we add it?
-                    column_config={
+                _material_grid(
+                    df_sheet, "sheet_editor", ['name', 'unit_cost', 'roll_width', 'height', 'supplier'],
+                    {
                         'name': 'Product Name',
-                        'unit_cost': st.column_config.NumberColumn('Cost (Sheet £)', format="£%.2f"),
-                        'roll_width': st.column_config.NumberColumn('Width (m)', format="%.2f m"),
+                        'unit_cost': st.column_config.NumberColumn('Cost (Sheet £)', format="£%.2f", min_value=0.0, step=0.01, required=True),
+                        'roll_width': st.column_config.NumberColumn('Width (m)', format="%.2f m", min_value=0.0, step=0.01, required=True,
+                                                                    help="Values over 10 are read as mm"),
+                        'height': st.column_config.NumberColumn('Height (m)', format="%.2f m", min_value=0.0, step=0.01, required=True,
+                                                                help="Values over 10 are read as mm"),
                         'supplier': 'Supplier'
                     },
-                    use_container_width=True,
-                    hide_index=True
+                    _sheet_updates
                 )
             else:
                 st.info("No Sheet materials found.")
@@ -221,15 +354,19 @@ def show_supplier_manager():
         if not df_all.empty:
             df_misc = df_all[df_all['category'] == 'Misc'].copy()
             if not df_misc.empty:
-                 st.dataframe(
-                    df_misc[['name', 'unit_cost', 'supplier']], 
-                    column_config={
+                df_misc = df_misc.reset_index(drop=True)
+                if 'unit_cost' not in df_misc.columns:
+                    df_misc['unit_cost'] = df_misc['cost_per_m2']
+                df_misc['unit_cost'] = df_misc['unit_cost'].fillna(df_misc['cost_per_m2'])
+
+                _material_grid(
+                    df_misc, "misc_editor", ['name', 'unit_cost', 'supplier'],
+                    {
                         'name': 'Item Name',
-                        'unit_cost': st.column_config.NumberColumn('Cost (Item £)', format="£%.2f"),
+                        'unit_cost': st.column_config.NumberColumn('Cost (Item £)', format="£%.2f", min_value=0.0, step=0.01, required=True),
                         'supplier': 'Supplier'
                     },
-                    use_container_width=True,
-                    hide_index=True
+                    _misc_updates
                 )
             else:
                 st.info("No Miscellaneous items found.")
@@ -259,34 +396,69 @@ def show_supplier_manager():
         st.subheader("Bulk Upload CSV")
         
         cat_upload = st.radio("Import as Category:", ["Vinyl", "Sheet", "Misc"], horizontal=True)
+        import_mode = st.radio(
+            "Mode:", ["Add all rows", "Update existing + add new"], horizontal=True,
+            help="Update matches each row to an existing material by SKU, or by Supplier + Product "
+                 "(ignoring case), and only writes new rows and changed prices."
+        )
+        mode = "upsert" if import_mode.startswith("Update") else "append"
         
         st.markdown(f"""
         **CSV Format Guide for {cat_upload}:**
-        - Columns: `Product`, `Price`, `Width` (optional for Misc), `Supplier`
+        - Columns: `Product`, `Price`, `Width` (optional for Misc), `Supplier`, optional `SKU`
         - `Price` should be the **Unit Cost** (e.g. per linear m, per sheet, or per item).
+        - Vinyl: cost per m² = Price ÷ `Width` (m; values over 10 are read as mm, blank = 1.37m).
+        - Sheet: add a `Height` column; cost per m² = Price ÷ (`Width` × `Height`), blank size = 8x4.
         """)
+
+        # Result of the last import/preview (kept across the rerun that refreshes the tables)
+        report = st.session_state.get('import_report')
+        if report:
+            summary = (f"{report['created']:,} new, {report['updated']:,} updated, "
+                       f"{report['unchanged']:,} unchanged of {report['rows']:,} rows")
+            if report.get('dry_run'):
+                st.info(f"Preview: {summary}. Nothing has been written yet.")
+            else:
+                st.success(f"Imported in {report['seconds']:.1f}s: {summary}.")
+            if report['changes']:
+                st.dataframe(pd.DataFrame([{
+                    'line': c['line'],
+                    'product': c['doc'].get('name'),
+                    'supplier': c['doc'].get('supplier'),
+                    'action': c['action'],
+                    'changes': ', '.join(f"{k}: {c['before'].get(k)} → {v}" for k, v in c['fields'].items())
+                               if c['action'] == 'update' else '',
+                } for c in report['changes'][:1000]]), use_container_width=True, hide_index=True)
+            if report['errors']:
+                st.warning(f"{len(report['errors']):,} row(s) were skipped:")
+                errors_df = summarise(report['errors'])
+                st.dataframe(errors_df.head(1000), use_container_width=True, hide_index=True)
+                st.download_button("Download skipped rows", errors_df.to_csv(index=False),
+                                   file_name="import_errors.csv", mime="text/csv")
+            if st.button("Dismiss", key="dismiss_import"):
+                del st.session_state['import_report']
+                st.rerun()
         
         uploaded_file = st.file_uploader("Upload Price List", type=["csv"])
         
         if uploaded_file is not None:
-            if st.button("Confirm Upload"):
+            b_prev, b_conf = st.columns(2)
+            preview = mode == "upsert" and b_prev.button("Preview Changes")
+            confirm = b_conf.button("Confirm Upload")
+            if preview or confirm:
+                bar = st.progress(0.0, text="Reading..." if preview else "Importing...")
+
+                def on_progress(rep, fraction):
+                    bar.progress(fraction if fraction is not None else 0.0,
+                                 text=f"{rep['rows']:,} rows read · {rep['created']:,} new · "
+                                      f"{rep['updated']:,} updated · {len(rep['errors']):,} skipped")
+
                 try:
-                    df = pd.read_csv(uploaded_file)
-                    # Pre-process based on category
-                    df['category'] = cat_upload
-                    
-                    # If Sheet, we need to convert Price (Sheet) -> Price (m2)
-                    # But we lack Height in CSV usually. Assuming standard? 
-                    # Let's simple-case it: Uploads for sheets might need m2 price or we assume something.
-                    # For now, let's just pass it through and rely on 'Price' = 'cost_per_m2' in bulk_upload logic exception?
-                    # NO, bulk_upload logic in db.py assumes 'Price' is mapped to cost_m2.
-                    # If we upload Sheets with Sheet Price, we get huge costs per m2 (e.g. £100/m2 instead of £100/sheet).
-                    # FIX: For this iteration, let's just warn or handle 'Vinyl' safely.
-                    # Given the ambiguity, I will just call bulk_upload and let the db function handle defaults (which converts linear).
-                    # It's a "Basic" implementation.
-                    
-                    count = bulk_upload_materials(df)
-                    st.success(f"Uploaded {count} items.")
+                    uploaded_file.seek(0)
+                    result = import_materials(uploaded_file, category=cat_upload, progress=on_progress,
+                                              mode=mode, dry_run=preview)
+                    result['dry_run'] = preview
+                    st.session_state.import_report = result
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error: {e}")
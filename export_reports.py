@@ -0,0 +1,52 @@
+"""
+Export cost reports for saved jobs without opening the app.
+
+    python export_reports.py --out reports.zip
+    python export_reports.py --out q3.pdf --combined --from 2026-07-01 --to 2026-09-30
+    python export_reports.py --out acme.zip --client "Acme Ltd" --workers 4
+
+Uses the same database settings as the app (DB_BACKEND, secrets, etc.).
+"""
+
+import argparse
+import sys
+from datetime import date
+
+from utils.pdf_batch import default_workers, export_jobs_pdf, export_jobs_zip
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export saved job cost reports to a ZIP or one PDF.")
+    parser.add_argument("--out", required=True, help="Output .zip (or .pdf with --combined)")
+    parser.add_argument("--combined", action="store_true", help="One combined PDF instead of a ZIP")
+    parser.add_argument("--client", help="Exact client name")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="First date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Last date (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Render processes")
+    args = parser.parse_args(argv)
+
+    # Imported here so the render processes (which re-import this script) skip the db stack
+    from utils.db import iter_jobs
+
+    filters = {'client_name': args.client, 'date_from': args.date_from, 'date_to': args.date_to}
+    jobs = iter_jobs(filters)
+
+    def progress(done, total, name):
+        print(f"\r{done} report(s) rendered - {name[:60]:<60}", end="", flush=True)
+
+    if args.combined:
+        report = export_jobs_pdf(jobs, args.out, max_workers=args.workers, progress=progress)
+    else:
+        report = export_jobs_zip(jobs, args.out, max_workers=args.workers, progress=progress)
+
+    print(f"\nWrote {report['written']} report(s) to {args.out} "
+          f"({report['bytes'] / 1024:,.0f} KB in {report['seconds']:.1f}s)")
+    for err in report['errors']:
+        print(f"  [FAIL] job {err['id']}: {err['error']}")
+    if report['jobs'] == 0:
+        print("No saved jobs matched.")
+    return 1 if report['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
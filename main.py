@@ -1,11 +1,16 @@
+import io
+from datetime import datetime
 import streamlit as st
 import streamlit_authenticator as stauth
 import pandas as pd
 from components.calc_v5 import show_calculator as show_calculator_v5
 from components.supplier import show_supplier_manager
-from utils.db import fetch_jobs, delete_job
+from utils.db import fetch_jobs_page, iter_jobs, delete_job, JOBS_PAGE_SIZE, write_queue, write_queue_status
+from utils.pdf_batch import export_jobs_pdf, export_jobs_zip
 from utils.settings_store import load_settings_local, save_settings_local, SETTINGS_DEFAULTS
 from utils.styles import inject_dashboard_css
+from utils import perf
+from components.perf_panel import show_perf_panel
 
 # Page Configuration
 st.set_page_config(
@@ -67,13 +72,15 @@ elif auth_status is None:
     st.stop()
 
 # ── LOGGED IN ──────────────────────────────────
+@perf.rerun("main", session=username)
 def main():
     # --- Theme Logic ---
     if 'theme' not in st.session_state:
         st.session_state.theme = 'dark'
 
     # Inject CSS
-    inject_dashboard_css()
+    with perf.stage("main.css"):
+        inject_dashboard_css()
 
     # --- Session State Init ---
     # Load rates from JSON file on EVERY fresh session.
@@ -100,7 +107,7 @@ def main():
             st.session_state[key] = val
 
     # --- Sidebar ---
-    with st.sidebar:
+    with st.sidebar, perf.stage("main.sidebar"):
         st.markdown("### 👤 CLIENT DETAILS")
         c_name    = st.text_input("Client Name",    placeholder="Start typing...")
         c_contact = st.text_input("Contact / Ref",  placeholder="e.g. email or PO#")
@@ -116,6 +123,26 @@ def main():
                 if k in st.session_state: del st.session_state[k]
             st.rerun()
 
+        # Write-behind sync status (Firestore only)
+        sync = write_queue_status()
+        if sync is not None:
+            st.divider()
+            if sync['depth'] or sync['last_error']:
+                st.caption(f"☁️ {sync['depth']} change(s) waiting to sync")
+                if sync['last_error']:
+                    st.warning(f"Sync retrying in {sync['retry_in_seconds']:.0f}s — {sync['last_error']}")
+                    if st.button("🔁 RETRY SYNC NOW", use_container_width=True):
+                        write_queue().retry_now()
+                        st.rerun()
+            else:
+                st.caption("☁️ All changes synced")
+            if sync['failed']:
+                st.error(f"{sync['failed']} change(s) could not be synced and were set aside — "
+                         f"{sync['failed_error']}")
+                if st.button("📤 REQUEUE SET-ASIDE CHANGES", use_container_width=True):
+                    write_queue().retry_failed()
+                    st.rerun()
+
         st.divider()
         # Logout button in sidebar
         authenticator.logout("🚪 Sign Out", location="sidebar")
@@ -147,15 +174,34 @@ def main():
         ["💰 Calculator", "📦 Supplier Manager", "📜 Job History", "⚙️ Settings"]
     )
 
-    with tab_calc:
+    with tab_calc, perf.stage("tab.calculator"):
         show_calculator_v5(st.session_state.hourly_rate, client_info)
 
-    with tab_supp:
+    with tab_supp, perf.stage("tab.supplier"):
         show_supplier_manager()
 
-    with tab_hist:
+    with tab_hist, perf.stage("tab.history"):
         st.header("Job History")
-        jobs = fetch_jobs()
+
+        # Filters + cursor pagination: only one page of jobs is fetched and drawn.
+        # hist_cursors[n] is the start_after cursor of page n.
+        f1, f2, f3 = st.columns([2, 2, 1])
+        hist_client = f1.text_input("Client name", key="hist_client", placeholder="Exact client name")
+        hist_dates = f2.date_input("Date range", value=(), key="hist_dates")
+        hist_size = f3.selectbox("Per page", [10, JOBS_PAGE_SIZE, 50, 100], index=1, key="hist_page_size")
+        hist_filters = {
+            'client_name': hist_client,
+            'date_from': hist_dates[0] if len(hist_dates) > 0 else None,
+            'date_to': hist_dates[1] if len(hist_dates) > 1 else None,
+        }
+        if st.session_state.get('hist_query') != (hist_filters, hist_size):
+            st.session_state.hist_query = (hist_filters, hist_size)
+            st.session_state.hist_cursors = [None]
+        page_no = len(st.session_state.hist_cursors) - 1
+        with perf.stage("history.fetch_jobs_page"):
+            page = fetch_jobs_page(limit=hist_size, start_after=st.session_state.hist_cursors[-1],
+                                   filters=hist_filters)
+        jobs = page['jobs']
         if jobs:
             st.markdown("""
                 <style>
@@ -177,6 +223,7 @@ def main():
             st.divider()
 
             for i, j in enumerate(jobs):
+                job_key   = j.get('id') or f"{page_no}_{i}"
                 c_info    = j.get('client', {}) or {}
                 res       = j.get('results', {}) or {}
                 raw_date  = j.get('created_at')
@@ -196,16 +243,16 @@ def main():
                 r6.write(f"£{profit_val:,.2f}")
 
                 with r7:
-                    if st.button("👁️", key=f"view_{i}", help="View Details"):
-                        st.session_state[f"show_details_{i}"] = not st.session_state.get(f"show_details_{i}", False)
+                    if st.button("👁️", key=f"view_{job_key}", help="View Details"):
+                        st.session_state[f"show_details_{job_key}"] = not st.session_state.get(f"show_details_{job_key}", False)
 
                 with r8:
-                    if st.button("🗑️", key=f"del_job_{i}", help="Delete Job"):
+                    if st.button("🗑️", key=f"del_job_{job_key}", help="Delete Job"):
                         if delete_job(j.get('id')):
                             st.toast(f"Deleted job for {c_info.get('name')}")
                             st.rerun()
 
-                if st.session_state.get(f"show_details_{i}", False):
+                if st.session_state.get(f"show_details_{job_key}", False):
                     with st.container(border=True):
                         st.markdown(f"#### Breakdown — {c_info.get('name')}")
                         st.markdown(f"**Markup:** {markup_val}x")
@@ -223,10 +270,56 @@ def main():
                             st.write(f"- Final Quote: £{quote_val:,.2f}")
                             st.write(f"**- Calculated Profit: £{profit_val:,.2f}**")
                 st.divider()
+
+            p1, p2, p3 = st.columns([1, 2, 1])
+            if p1.button("⬅️ Previous", key="hist_prev", disabled=page_no == 0, use_container_width=True):
+                st.session_state.hist_cursors.pop()
+                st.rerun()
+            p2.caption(f"Page {page_no + 1} · showing {len(jobs)} job(s)")
+            if p3.button("Next ➡️", key="hist_next", disabled=not page['has_more'], use_container_width=True):
+                st.session_state.hist_cursors.append(page['next_cursor'])
+                st.rerun()
+
+            # Batch export: rendered across a process pool into one ZIP (or one PDF)
+            with st.expander("📦 Export cost reports"):
+                e1, e2 = st.columns(2)
+                scope = e1.radio("Jobs", ["This page", "All matching filters"], key="export_scope", horizontal=True)
+                fmt = e2.radio("Format", ["ZIP (one PDF per job)", "Combined PDF"], key="export_format",
+                               horizontal=True)
+                if st.button("Render reports", key="export_run", use_container_width=True):
+                    source = jobs if scope == "This page" else iter_jobs(hist_filters)
+                    bar = st.progress(0.0, text="Rendering...")
+
+                    def _progress(done, total, name):
+                        bar.progress(done / total if total else 0.0,
+                                     text=f"{done} rendered" + (f" of {total}" if total else "") + f" · {name}")
+
+                    buf = io.BytesIO()
+                    with perf.stage("history.export"):
+                        if fmt == "Combined PDF":
+                            report = export_jobs_pdf(source, buf, progress=_progress)
+                        else:
+                            report = export_jobs_zip(source, buf, progress=_progress)
+                    bar.progress(1.0, text=f"{report['written']} report(s) in {report['seconds']:.1f}s")
+                    # The BytesIO itself is kept and handed to the download button (no bytes copy)
+                    st.session_state.export_file = (buf, "pdf" if fmt == "Combined PDF" else "zip")
+                    for err in report['errors']:
+                        st.error(f"Job {err['id']}: {err['error']}")
+                if st.session_state.get('export_file'):
+                    data, ext = st.session_state.export_file
+                    data.seek(0)
+                    st.download_button(f"⬇️ Download {ext.upper()} ({data.getbuffer().nbytes / 1024:,.0f} KB)", data=data,
+                                       file_name=f"DanielSigns_CostReports_{datetime.now():%Y%m%d}.{ext}",
+                                       mime="application/zip" if ext == "zip" else "application/pdf",
+                                       key="export_download", use_container_width=True)
+        elif page_no > 0:
+            # e.g. the last job on this page was deleted
+            st.session_state.hist_cursors.pop()
+            st.rerun()
         else:
             st.info("No saved jobs found.")
 
-    with tab_settings:
+    with tab_settings, perf.stage("tab.settings"):
         st.header('Settings')
         st.caption('Rates are saved locally on this machine and persist across all logins.')
         st.divider()
@@ -261,6 +354,11 @@ def main():
             else:
                 st.error('Could not save settings file. Check folder permissions.')
 
+        # Hidden admin panel: rerun stage timings (open the app with ?perf=1)
+        if username == "admin" and st.query_params.get("perf") == "1":
+            st.divider()
+            show_perf_panel()
+
 
 if __name__ == '__main__':
     main()
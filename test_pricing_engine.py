@@ -0,0 +1,129 @@
+"""
+Tests for PricingEngine and JobAccumulator
+Cached and batched results must stay penny-identical to pricing each job
+from scratch, and rate changes must never serve a stale cached price.
+"""
+
+import random
+
+import pytest
+
+from benchmarks import generators as gen
+from utils.logic_engine import JobAccumulator, PricingEngine
+
+ITEM = {'width': 2.0, 'height': 1.0, 'qty': 3, 'materials': ['Vinyl']}
+
+
+def test_set_material_rate_drops_cached_results():
+    rates = {'Vinyl': 10.0}
+    engine = PricingEngine(rates)
+    before = engine.calculate_job([ITEM], 1.0, 0.0)
+
+    engine.set_material_rate('Vinyl', 20.0)
+    after = engine.calculate_job([ITEM], 1.0, 0.0)
+
+    assert rates['Vinyl'] == 20.0
+    assert after['material_cost_raw'] == 2 * before['material_cost_raw']
+    assert after == PricingEngine({'Vinyl': 20.0}).calculate_job([ITEM], 1.0, 0.0)
+
+
+def test_labour_rate_change_drops_cached_results():
+    engine = PricingEngine({'Vinyl': 10.0})
+    before = engine.calculate_job([ITEM], 2.0, 0.0)
+
+    engine.workshop_rate = 90.0
+    after = engine.calculate_job([ITEM], 2.0, 0.0)
+
+    assert after != before
+    assert after == PricingEngine({'Vinyl': 10.0}, workshop_rate=90.0).calculate_job([ITEM], 2.0, 0.0)
+
+
+# ── Batch and accumulator parity ─────────────────────────────────────────────
+
+MONEY = ('material_cost_raw', 'wastage_cost', 'material_cost_total', 'shop_cost_internal',
+         'install_cost_internal', 'travel_cost_internal', 'breakeven', 'workshop_price_billed',
+         'install_price_billed', 'travel_price_billed', 'labor_total_billed', 'quote_price', 'profit')
+
+
+def _job_specs(n, materials, seed=0):
+    rng = random.Random(seed)
+    specs = []
+    for k in range(n):
+        specs.append({
+            'items': gen.material_items(gen.make_items(rng.randint(0, 12), materials, seed=seed + k)),
+            'prod_hours': rng.choice([0.0, 0.25, 1.5, 3.0]),
+            'install_hours': rng.choice([0.0, 1.0, 2.5]),
+            'travel_hours': rng.choice([0.0, 0.5, 1.0]),
+            'installers': rng.choice([0, 1, 2, 3]),
+            'wastage_percent': rng.choice([0.0, 5.0, 12.5]),
+            'markup': rng.choice([1.0, 1.35, 2.0, 2.5]),
+            'print_ready': rng.random() < 0.5,
+            'repeat_job': rng.random() < 0.2,
+            'design_hours': rng.choice([0.0, 0.5, 1.0]),
+            'use_nesting': rng.random() < 0.5,
+        })
+    return specs
+
+
+def test_batch_matches_scalar_to_the_penny():
+    materials = gen.make_materials(40)
+    engine = PricingEngine(gen.rates(materials))
+    specs = _job_specs(300, materials)
+
+    batch = engine.calculate_jobs_batch(*PricingEngine.to_batch_frames(specs))
+
+    assert len(batch) == len(specs)
+    for pos, spec in enumerate(specs):
+        scalar = engine.calculate_job(**spec)
+        row = batch.iloc[pos]
+        for field in MONEY:
+            assert row[field] == scalar[field], (pos, field)
+
+
+def test_accumulator_matches_full_rescan_after_pops_and_price_changes():
+    materials = gen.make_materials(40)
+    engine = PricingEngine(gen.rates(materials))
+    rng = random.Random(1)
+    acc = JobAccumulator(rate_index=engine.rate_index)
+    for item in gen.make_items(60, materials, seed=1):
+        acc.append(item)
+
+    def check():
+        mats = acc.material_items()
+        extra = {
+            'prod': sum(i['raw_labor']['prod'] for i in acc.items if i.get('type') == 'labor'),
+            'fit': max([i['raw_labor']['fit'] for i in acc.items if i.get('type') == 'labor'] or [0]),
+        }
+        for use_nesting in (False, True):
+            assert acc.material_total(use_nesting) == pytest.approx(engine.material_cost(mats, use_nesting),
+                                                                    rel=1e-12, abs=1e-9)
+            got = acc.calculate_job(engine, prod_hours=1.0, install_hours=2.0, installers=1,
+                                    wastage_percent=5.0, markup=1.5, use_nesting=use_nesting)
+            want = engine.calculate_job(mats, 1.0 + extra['prod'], 2.0, installers=max(1, extra['fit']),
+                                        wastage_percent=5.0, markup=1.5, use_nesting=use_nesting)
+            for field in MONEY:
+                assert got[field] == want[field], field
+        assert acc.total_qty == sum(i['qty'] for i in mats)
+
+    check()
+    while acc.items:
+        acc.pop(rng.randrange(len(acc.items)))
+        if rng.random() < 0.2:
+            engine.set_material_rate(rng.choice(materials)['name'], rng.choice([2.5, 7.25, 13.0]))
+        check()
+
+    # Emptied by pops: totals are exactly zero again, not float dust
+    assert acc.material_total() == 0 and acc.area_m2 == 0.0
+
+
+def test_accumulator_rebuild_picks_up_external_edits():
+    materials = gen.make_materials(20)
+    engine = PricingEngine(gen.rates(materials))
+    items = gen.make_items(30, materials, seed=2)
+    acc = JobAccumulator(items, rate_index=engine.rate_index)
+
+    for item in gen.material_items(items)[::3]:
+        item['qty'] += 1
+    acc.rebuild()
+
+    assert acc.material_total() == pytest.approx(engine.material_cost(gen.material_items(items)), rel=1e-12)
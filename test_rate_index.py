@@ -0,0 +1,111 @@
+"""
+Tests for MaterialRateIndex
+Edits, renames, removals and syncs must price exactly like the old
+name-keyed {name: cost_per_m2} dict, duplicate names included.
+"""
+
+import random
+
+from utils.rate_index import MaterialRateIndex
+
+
+def _dict_rates(materials):
+    """The old semantics: the last document seen with a name wins."""
+    rates = {}
+    for m in materials:
+        rates[m['name']] = m['cost_per_m2']
+    return rates
+
+
+def _index(*docs):
+    return MaterialRateIndex.from_materials(
+        [{'id': mat_id, 'name': name, 'cost_per_m2': rate} for mat_id, name, rate in docs]
+    )
+
+
+def test_price_edit_reprices_interned_combinations():
+    index = _index(('v', 'Vinyl', 4.0), ('g', 'Gloss', 1.5))
+    combo = index.intern(['Vinyl', 'Gloss'])
+    assert index.combo_rates_array()[combo] == 5.5
+    version = index.version
+
+    assert index.update_material('v', {'cost_per_m2': 6.0})
+    assert index.combo_rate(['Vinyl', 'Gloss']) == 7.5
+    assert index.combo_rates_array()[combo] == 7.5
+    assert index.version > version
+
+    version = index.version
+    assert index.update_material('v', {'cost_per_m2': 6.0, 'supplier': 'S'})
+    assert index.version == version
+    assert not index.update_material('missing', {'cost_per_m2': 1.0})
+
+
+def test_rename_onto_existing_name_takes_it_over():
+    index = _index(('v', 'Vinyl', 4.0), ('g', 'Gloss', 1.5))
+    assert index.combo_rate(['Gloss', 'Vinyl']) == 5.5
+
+    index.update_material('g', {'name': 'Vinyl'})
+
+    assert index.names() == ['Vinyl']
+    assert index.combo_rate(['Vinyl']) == 1.5
+    assert index.combo_rate(['Gloss']) == 0
+    assert index.combo_rate(['Gloss', 'Vinyl']) == 1.5
+
+
+def test_remove_duplicate_falls_back_then_prices_at_zero():
+    index = _index(('a', 'Vinyl', 1.0), ('b', 'Vinyl', 2.0), ('g', 'Gloss', 0.5))
+    assert index.combo_rate(['Vinyl', 'Gloss']) == 2.5
+
+    assert index.remove_material('b')
+    assert index.combo_rate(['Vinyl', 'Gloss']) == 1.5
+
+    assert index.remove_material('Vinyl')
+    assert index.combo_rate(['Vinyl', 'Gloss']) == 0.5
+    assert 'Vinyl' not in index.names()
+    assert not index.remove_material('b')
+
+
+def test_sync_touches_only_changed_documents():
+    docs = [{'id': 'v', 'name': 'Vinyl', 'cost_per_m2': 4.0}, {'id': 'g', 'name': 'Gloss', 'cost_per_m2': 1.5}]
+    index = MaterialRateIndex.from_materials(docs)
+    assert not index.sync(docs)
+    assert index.version == 0
+
+    docs[1] = dict(docs[1], cost_per_m2=2.0)
+    assert index.sync(docs)
+    assert index.combo_rate(['Vinyl', 'Gloss']) == 6.0
+
+    assert index.sync(docs[:1])
+    assert index.names() == ['Vinyl']
+
+
+def test_rename_of_duplicate_falls_back_to_remaining_document():
+    index = MaterialRateIndex.from_materials([
+        {'id': 'id0', 'name': 'Vinyl', 'cost_per_m2': 1.0},
+        {'id': 'id1', 'name': 'Vinyl', 'cost_per_m2': 2.0},
+    ])
+    assert index.combo_rate(['Vinyl']) == 2.0
+    version = index.version
+
+    index.update_material('id1', {'name': 'Vinyl Old'})
+
+    assert sorted(index.names()) == ['Vinyl', 'Vinyl Old']
+    assert index.combo_rate(['Vinyl']) == 1.0
+    assert index.combo_rate(['Vinyl Old']) == 2.0
+    assert index.version > version
+
+
+def test_sync_matches_dict_semantics_with_duplicate_names():
+    rng = random.Random(0)
+    names = ['A', 'B', 'C', 'D']
+    for _ in range(300):
+        index = MaterialRateIndex()
+        for _ in range(6):
+            materials = [{'id': f'id{k}', 'name': rng.choice(names), 'cost_per_m2': float(rng.randint(0, 4))}
+                         for k in rng.sample(range(8), rng.randint(0, 8))]
+            index.sync(materials)
+            expected = _dict_rates(materials)
+            assert set(index.names()) == set(expected)
+            for name in names:
+                assert index.combo_rate([name]) == expected.get(name, 0)
+                assert index.combo_rate([name, 'A']) == expected.get(name, 0) + expected.get('A', 0)
@@ -0,0 +1,126 @@
+"""
+Tests for SQLiteStore
+Connection handling and the keyset-paged job history.
+"""
+
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.suite import use_backend
+from utils import db
+from utils.sqlite_store import SQLiteStore
+from utils.write_queue import WriteBehindQueue
+
+
+def test_close_closes_every_threads_connection(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'store.db'))
+    conns = [store._conn()]
+    opened = threading.Barrier(4)
+    release = threading.Event()
+
+    def worker():
+        conns.append(store._conn())
+        opened.wait()
+        release.wait()
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    opened.wait()
+
+    store.close()
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(set(map(id, conns))) == 4
+    for conn in conns:
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            conn.execute("SELECT 1")
+    # The store reconnects on next use
+    assert store.fetch_materials() == []
+    store.close()
+
+
+# ── Keyset paging ────────────────────────────────────────────────────────────
+
+def _seed_jobs(store, n=23):
+    """Jobs with repeated created_at values, so pages split inside a tie."""
+    base = datetime(2024, 5, 1, 9, 0)
+    for k in range(n):
+        store.save_job({
+            'id': f'job{k:03d}',
+            'created_at': base + timedelta(minutes=k // 3),
+            'client': {'name': 'Acme' if k % 2 else 'Harbour'},
+            'rank': k % 5,
+        })
+
+
+def _walk(store, limit, **kwargs):
+    """Follow next cursors the way db.fetch_jobs_page does (limit + 1 to detect more)."""
+    ids, cursor = [], None
+    while True:
+        page = store.fetch_jobs_page(limit + 1, cursor, **kwargs)
+        ids += [j['id'] for j in page[:limit]]
+        if len(page) <= limit:
+            return ids
+        cursor = page[limit - 1]['id']
+
+
+@pytest.mark.parametrize('limit', [1, 4, 7, 30])
+@pytest.mark.parametrize('descending', [True, False])
+def test_cursor_pages_cover_every_job_once_in_order(tmp_path, limit, descending):
+    store = SQLiteStore(str(tmp_path / 'store.db'))
+    _seed_jobs(store)
+    everything = sorted(store.fetch_jobs(), key=lambda j: (j['created_at'], j['id']), reverse=descending)
+
+    assert _walk(store, limit, descending=descending) == [j['id'] for j in everything]
+
+
+def test_cursor_pages_on_a_json_field_with_filters(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'store.db'))
+    _seed_jobs(store)
+    acme = [j for j in store.fetch_jobs() if j['client']['name'] == 'Acme']
+    expected = [j['id'] for j in sorted(acme, key=lambda j: (j['rank'], j['id']), reverse=True)]
+
+    assert _walk(store, 3, order_by='rank', client_name='Acme') == expected
+    with pytest.raises(ValueError):
+        store.fetch_jobs_page(5, order_by='rank; DROP TABLE jobs')
+
+
+def test_cursor_of_deleted_job_gives_empty_page(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'store.db'))
+    _seed_jobs(store)
+    cursor = store.fetch_jobs_page(5)[4]['id']
+    store.delete_job(cursor)
+
+    assert store.fetch_jobs_page(5, cursor) == []
+
+
+def test_history_pages_skip_queued_deletes(tmp_path):
+    use_backend('sqlite')
+    try:
+        store = db.get_store()
+        _seed_jobs(store, 9)
+        newest_first = [j['id'] for j in db.fetch_jobs_page(limit=20)['jobs']]
+        db._write_queue = WriteBehindQueue(str(tmp_path / 'queue.db'), lambda ops: None)
+        for job_id in newest_first[:4]:
+            db._write_queue.enqueue('delete_job', {'id': job_id})
+
+        seen, cursor = [], None
+        while True:
+            page = db.fetch_jobs_page(limit=2, start_after=cursor)
+            assert len(page['jobs']) == 2 or not page['has_more']
+            seen += [j['id'] for j in page['jobs']]
+            if not page['has_more']:
+                break
+            assert page['next_cursor'] == page['jobs'][-1]['id']
+            cursor = page['next_cursor']
+
+        assert seen == newest_first[4:]
+    finally:
+        db._write_queue = None
+        use_backend('mock')
@@ -0,0 +1,115 @@
+"""
+Tests for WriteBehindQueue
+Transient failures are retried in order; a write the backend rejects outright
+is parked without holding up the rest, and can be requeued later.
+"""
+
+import pytest
+
+from utils.write_queue import WriteBehindQueue
+
+
+class NotFound(Exception):
+    """Named like google.api_core's permanent error."""
+
+
+class ServiceUnavailable(Exception):
+    """Named like google.api_core's transient error."""
+
+
+class Backend:
+    def __init__(self):
+        self.applied = []
+        self.down = False
+        self.missing = set()
+
+    def apply(self, ops):
+        if self.down:
+            raise ServiceUnavailable("503")
+        for op in ops:
+            if op['payload']['n'] in self.missing:
+                raise NotFound(f"no document {op['payload']['n']}")
+        self.applied += [op['payload']['n'] for op in ops]
+
+
+@pytest.fixture
+def backend():
+    return Backend()
+
+
+@pytest.fixture
+def queue(tmp_path, backend):
+    return WriteBehindQueue(str(tmp_path / 'queue.db'), backend.apply, batch_size=4,
+                            base_delay=0.0, max_delay=0.0)
+
+
+def test_permanent_error_is_parked_and_the_rest_flush_in_order(queue, backend):
+    backend.missing = {3, 6}
+    queue.enqueue_many([('update', {'n': n}) for n in range(10)])
+
+    assert queue.flush(timeout=5)
+
+    assert backend.applied == [0, 1, 2, 4, 5, 7, 8, 9]
+    parked = queue.failed()
+    assert [p['payload']['n'] for p in parked] == [3, 6]
+    assert all(p['attempts'] == 1 and p['last_error'].startswith('NotFound') for p in parked)
+    status = queue.status()
+    assert status['depth'] == 0 and status['failed'] == 2
+    assert status['failed_error'].startswith('NotFound')
+    assert status['last_error'] is None
+
+
+def test_transient_error_keeps_the_write_queued(queue, backend):
+    backend.down = True
+    queue.enqueue('update', {'n': 1})
+
+    assert queue.flush_once() == 0
+    assert queue.flush_once() == 0
+    assert queue.status()['depth'] == 1
+    assert queue.status()['consecutive_failures'] == 2
+    assert queue.failed() == []
+
+    backend.down = False
+    assert queue.flush(timeout=5)
+    assert backend.applied == [1]
+    assert queue.status()['consecutive_failures'] == 0
+
+
+def test_retry_failed_requeues_parked_writes_at_the_back(queue, backend):
+    backend.missing = {1, 2}
+    queue.enqueue_many([('update', {'n': n}) for n in range(4)])
+    queue.flush(timeout=5)
+    first, second = queue.failed()
+
+    backend.missing = set()
+    queue.enqueue('update', {'n': 9})
+    assert queue.retry_failed([second['seq']]) == 1
+    assert queue.retry_failed([]) == 0
+    assert [p['payload']['n'] for p in queue.pending()] == [9, 2]
+
+    assert queue.flush(timeout=5)
+    assert backend.applied == [0, 3, 9, 2]
+    assert [p['seq'] for p in queue.failed()] == [first['seq']]
+
+    assert queue.retry_failed() == 1
+    assert queue.flush(timeout=5)
+    assert backend.applied[-1] == 1
+    assert queue.failed() == [] and queue.status()['failed'] == 0
+
+
+def test_parked_and_pending_writes_survive_a_restart(tmp_path, backend):
+    path = str(tmp_path / 'queue.db')
+    backend.missing = {0}
+    queue = WriteBehindQueue(path, backend.apply)
+    queue.enqueue('update', {'n': 0})
+    queue.flush_once()
+    backend.down = True
+    queue.enqueue('update', {'n': 1})
+    queue.flush_once()
+
+    reopened = WriteBehindQueue(path, backend.apply, base_delay=0.0, max_delay=0.0)
+    assert [p['payload']['n'] for p in reopened.failed()] == [0]
+    assert [p['payload']['n'] for p in reopened.pending()] == [1]
+    backend.down = False
+    assert reopened.flush(timeout=5)
+    assert backend.applied == [1]
@@ -0,0 +1,224 @@
+"""
+Streaming Price-List Import
+Reads supplier CSVs in chunks and turns each chunk into material documents
+with vectorized validation and unit conversion (no per-row Python loops over
+the numbers).
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 5000
+DEFAULT_ROLL_WIDTH_M = 1.37
+DEFAULT_SHEET_SIZE_M = (2.44, 1.22)  # 8x4
+
+# Accepted header spellings (case/space-insensitive) -> canonical column
+COLUMN_ALIASES = {
+    'product': 'Product', 'name': 'Product', 'product name': 'Product',
+    'price': 'Price', 'cost': 'Price', 'unit cost': 'Price',
+    'width': 'Width', 'roll width': 'Width',
+    'height': 'Height', 'length': 'Height',
+    'supplier': 'Supplier',
+    'sku': 'SKU', 'code': 'SKU', 'product code': 'SKU',
+}
+
+UNIT_TYPES = {'Vinyl': 'linear_m', 'Sheet': 'sheet', 'Misc': 'item'}
+
+
+def iter_csv_chunks(source, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Yield DataFrame chunks of a CSV (path, file object or upload), all columns as text.
+    A DataFrame source is yielded in slices, so callers can treat both alike.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+        return
+    yield from pd.read_csv(source, chunksize=chunk_rows, dtype=str, keep_default_na=False,
+                           skipinitialspace=True)
+
+
+def normalise_columns(df: pd.DataFrame) -> pd.DataFrame:
+    return df.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().lower(), str(c).strip()))
+
+
+def _metres(values: pd.Series) -> np.ndarray:
+    """Widths/heights in metres; values over 10 are taken as mm (as in the Add Vinyl form)."""
+    m = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+    return np.where(m > 10, m / 1000.0, m)
+
+
+def _text(df: pd.DataFrame, column: str, default: str = '') -> pd.Series:
+    if column not in df.columns:
+        return pd.Series(default, index=df.index, dtype=object)
+    return df[column].fillna('').astype(str).str.strip()
+
+
+def prepare_chunk(df: pd.DataFrame, category: str = 'Vinyl',
+                  first_line: int = 2) -> Tuple[List[Dict], List[int], List[Dict]]:
+    """
+    Validate one chunk and convert it to material documents.
+
+    `Price` is the supplier's unit cost: per linear metre (Vinyl, divided by
+    `Width` to give cost_per_m2), per sheet (Sheet, divided by Width x Height)
+    or per item (Misc).
+
+    Args:
+        df: Raw chunk (any header spelling in COLUMN_ALIASES)
+        category: 'Vinyl', 'Sheet' or 'Misc'
+        first_line: CSV line number of the chunk's first row, for error messages
+
+    Returns:
+        (documents, their CSV line numbers, errors) where each error is
+        {'line', 'product', 'error'}.
+    """
+    if category not in UNIT_TYPES:
+        raise ValueError(f"Unknown category: {category}")
+    df = normalise_columns(df).reset_index(drop=True)
+    n = len(df)
+    if n == 0:
+        return [], [], []
+
+    product = _text(df, 'Product')
+    supplier = _text(df, 'Supplier', 'Unknown').replace('', 'Unknown')
+    sku = _text(df, 'SKU')
+    price = pd.to_numeric(_text(df, 'Price').str.replace(r'[£$,\s]', '', regex=True),
+                          errors='coerce').to_numpy(dtype=float)
+
+    error = np.full(n, None, dtype=object)
+
+    def flag(mask, message):
+        # Keep the first problem found for each row
+        error[mask & (error == None)] = message  # noqa: E711 (elementwise)
+
+    flag(product.eq('').to_numpy(), "missing Product")
+    flag(np.isnan(price), "Price is not a number")
+    flag(~np.isnan(price) & (price <= 0), "Price must be greater than 0")
+
+    if category == 'Vinyl':
+        width_text = _text(df, 'Width')
+        width = np.where(width_text.eq('').to_numpy(), DEFAULT_ROLL_WIDTH_M, _metres(width_text))
+        flag(np.isnan(width), "Width is not a number")
+        flag(~np.isnan(width) & (width <= 0), "Width must be greater than 0")
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cost_m2 = price / width
+        roll_width = width
+    elif category == 'Sheet':
+        width_text, height_text = _text(df, 'Width'), _text(df, 'Height')
+        width, height = _metres(width_text), _metres(height_text)
+        neither = (width_text.eq('') & height_text.eq('')).to_numpy()
+        width = np.where(neither, DEFAULT_SHEET_SIZE_M[0], width)
+        height = np.where(neither, DEFAULT_SHEET_SIZE_M[1], height)
+        flag(np.isnan(width) | np.isnan(height), "Sheet needs both Width and Height")
+        flag((width <= 0) | (height <= 0), "Sheet size must be greater than 0")
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cost_m2 = price / (width * height)
+        roll_width = width
+    else:
+        cost_m2 = price
+        roll_width = np.zeros(n)
+
+    ok = np.flatnonzero(error == None)  # noqa: E711
+    docs = []
+    unit_type = UNIT_TYPES[category]
+    has_sku = 'SKU' in df.columns
+    for name, supp, code, c_m2, width_m, unit in zip(
+        product.to_numpy()[ok], supplier.to_numpy()[ok], sku.to_numpy()[ok],
+        cost_m2[ok].tolist(), roll_width[ok].tolist(), price[ok].tolist()
+    ):
+        doc = {
+            'name': name,
+            'cost_per_m2': c_m2,
+            'roll_width': width_m,
+            'supplier': supp,
+            'category': category,
+            'unit_cost': unit,
+            'unit_type': unit_type,
+        }
+        if has_sku and code:
+            doc['sku'] = code
+        docs.append(doc)
+
+    bad = np.flatnonzero(error != None)  # noqa: E711
+    errors = [{'line': first_line + int(i), 'product': product.iat[i], 'error': error[i]} for i in bad]
+    return docs, (first_line + ok).tolist(), errors
+
+
+def summarise(errors: List[Dict], limit: Optional[int] = None) -> pd.DataFrame:
+    """Per-row errors as a DataFrame for display."""
+    rows = errors if limit is None else errors[:limit]
+    return pd.DataFrame(rows, columns=['line', 'product', 'error'])
+
+
+# ── Upsert (diff against existing materials) ────────────────────────────────
+
+def _norm(text) -> str:
+    return ' '.join(str(text or '').split()).casefold()
+
+
+class MaterialKeyIndex:
+    """
+    Lookup of existing materials by SKU and by (supplier, product name), both
+    case- and whitespace-insensitive, used to turn an upload into a minimal
+    set of creates and updates.
+    """
+
+    def __init__(self, materials):
+        self.by_sku: Dict[str, Dict] = {}
+        self.by_name: Dict[Tuple[str, str], Dict] = {}
+        for m in materials:
+            if m.get('sku'):
+                self.by_sku.setdefault(_norm(m['sku']), m)
+            self.by_name.setdefault((_norm(m.get('supplier')), _norm(m.get('name'))), m)
+        self._seen: Dict[tuple, int] = {}  # upload key -> first line, to catch repeats
+
+    @staticmethod
+    def upload_key(doc: Dict) -> tuple:
+        if doc.get('sku'):
+            return ('sku', _norm(doc['sku']))
+        return ('name', _norm(doc.get('supplier')), _norm(doc.get('name')))
+
+    def match(self, doc: Dict) -> Optional[Dict]:
+        """Existing material for an upload row: by SKU first, then supplier + name."""
+        if doc.get('sku'):
+            found = self.by_sku.get(_norm(doc['sku']))
+            if found is not None:
+                return found
+        return self.by_name.get((_norm(doc.get('supplier')), _norm(doc.get('name'))))
+
+    def diff(self, docs: List[Dict], lines: List[int]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Compare prepared rows with the index.
+
+        Returns:
+            (changes, errors). Each change is {'action': 'create'|'update'|'unchanged',
+            'line', 'id', 'doc', 'fields'}, where 'fields' holds only the values
+            that differ (the whole document for creates). Rows repeating a key
+            seen earlier in the upload are returned as errors.
+        """
+        changes, errors = [], []
+        for doc, line in zip(docs, lines):
+            key = self.upload_key(doc)
+            first = self._seen.get(key)
+            if first is not None:
+                errors.append({'line': line, 'product': doc.get('name'),
+                               'error': f"duplicate of line {first}, skipped"})
+                continue
+            self._seen[key] = line
+            existing = self.match(doc)
+            if existing is None:
+                changes.append({'action': 'create', 'line': line, 'id': None, 'doc': doc, 'fields': doc})
+                continue
+            fields = {k: v for k, v in doc.items() if not _same(existing.get(k), v)}
+            changes.append({'action': 'update' if fields else 'unchanged', 'line': line,
+                            'id': existing.get('id'), 'doc': doc, 'fields': fields,
+                            'before': {k: existing.get(k) for k in fields}})
+        return changes, errors
+
+
+def _same(old, new) -> bool:
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+        return abs(float(old) - float(new)) <= 1e-9 * max(1.0, abs(float(old)), abs(float(new)))
+    return old == new
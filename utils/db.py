@@ -4,7 +4,16 @@ import pandas as pd
 import streamlit as st
 import json
 import os
-from datetime import datetime
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, time as dt_time
+
+from utils.bulk_import import CHUNK_ROWS, MaterialKeyIndex, iter_csv_chunks, prepare_chunk
+from utils.materials_replica import MaterialsReplica
+from utils.sqlite_store import SQLiteStore
+from utils.write_queue import WriteBehindQueue
 
 # Placeholder for mock data if DB is not available
 MOCK_MATERIALS = [
@@ -14,11 +23,219 @@ MOCK_MATERIALS = [
     {"name": "Laminate Matte", "cost_per_m2": 12.0, "roll_width": 1.37, "supplier": "Supplier C", "category": "Vinyl"},
 ]
 
+# ── Backend selection ────────────────────────────────────────────────────────
+# 'auto' uses Firestore when credentials are found and the mock lists
+# otherwise; 'firestore', 'sqlite' and 'mock' force a backend.
+
+DB_BACKEND = os.environ.get("DANIEL_SIGNS_DB_BACKEND", "auto").lower()
+DB_PATH = os.environ.get(
+    "DANIEL_SIGNS_DB_PATH",
+    os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'daniel_signs.db'))
+)
+
+# Firestore writes from save_job / update_material / delete_job go through a
+# durable write-behind queue ('auto'), or straight to Firestore ('off').
+WRITE_BEHIND = os.environ.get("DANIEL_SIGNS_WRITE_BEHIND", "auto").lower()
+QUEUE_PATH = os.environ.get(
+    "DANIEL_SIGNS_QUEUE_PATH",
+    os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'write_queue.db'))
+)
+
+# ── Process-level caches ─────────────────────────────────────────────────────
+# Shared by every Streamlit session in the process. Materials are read from a
+# live replica (Firestore listener, or polling in mock mode) when enabled;
+# otherwise from a cache refreshed after MATERIALS_TTL_SECONDS. Both are
+# refreshed straight away when this module writes to materials.
+
+MATERIALS_TTL_SECONDS = float(os.environ.get("DANIEL_SIGNS_MATERIALS_TTL", 60))
+# 'auto' (listen to Firestore, poll in mock mode), 'listen', 'poll' or 'off'
+REPLICA_MODE = os.environ.get("DANIEL_SIGNS_MATERIALS_REPLICA", "auto").lower()
+REPLICA_POLL_SECONDS = float(os.environ.get("DANIEL_SIGNS_REPLICA_POLL", 30))
+REPLICA_READY_TIMEOUT = 10.0
+
+_UNSET = object()
+_db_client = _UNSET
+_store = _UNSET
+_replica = _UNSET
+_write_queue = _UNSET
+_cache_lock = threading.Lock()
+_materials_cache = {
+    "data": None,          # list of material dicts (never handed out directly)
+    "expires": 0.0,        # time.monotonic() deadline
+    "refreshed_at": None,  # datetime of the last successful fetch
+    "version": 0,          # bumped when a refresh changes the data, or on invalidation
+    "hits": 0,
+    "misses": 0,
+    "invalidations": 0,
+}
+
+
+def reset_db_client():
+    """Forget the cached Firestore client / SQLite store so the next call reconnects."""
+    global _db_client, _store
+    if isinstance(_store, SQLiteStore):
+        _store.close()
+    _db_client = _UNSET
+    _store = _UNSET
+
+
+def get_store():
+    """The SQLiteStore when the 'sqlite' backend is configured, else None."""
+    global _store
+    if _store is _UNSET:
+        _store = SQLiteStore(DB_PATH) if DB_BACKEND == "sqlite" else None
+    return _store
+
+
+def materials_replica():
+    """The process-wide MaterialsReplica, started on first use (None when disabled)."""
+    global _replica
+    if _replica is _UNSET:
+        with _cache_lock:
+            if _replica is _UNSET:
+                _replica = _start_replica()
+    return _replica
+
+
+def _start_replica():
+    if REPLICA_MODE == "off":
+        return None
+    db = get_db()
+    listen = db is not None and REPLICA_MODE in ("auto", "listen")
+    replica = MaterialsReplica(
+        _read_materials,
+        collection=db.collection('materials') if listen else None,
+        poll_interval=REPLICA_POLL_SECONDS
+    )
+    replica.on_change(_bump_materials_version)
+    return replica.start()
+
+
+def _bump_materials_version(_replica_version=None):
+    with _cache_lock:
+        _materials_cache["version"] += 1
+
+
+def write_queue():
+    """The process-wide write-behind queue (None unless writing to Firestore with it enabled)."""
+    global _write_queue
+    if _write_queue is _UNSET:
+        with _cache_lock:
+            if _write_queue is _UNSET:
+                if WRITE_BEHIND == "off" or not get_db():
+                    _write_queue = None
+                else:
+                    _write_queue = WriteBehindQueue(QUEUE_PATH, _apply_writes,
+                                                    on_flushed=_writes_flushed).start()
+    return _write_queue
+
+
+def write_queue_status():
+    """Depth / last error of the write-behind queue for the UI (None if not in use)."""
+    queue = write_queue()
+    return queue.status() if queue is not None else None
+
+
+def _apply_writes(ops):
+    """Flush a batch of queued operations to Firestore in one atomic batch."""
+    db = get_db()
+    batch = db.batch()
+    for op in ops:
+        payload = op['payload']
+        if op['op'] == 'save_job':
+            batch.set(db.collection('jobs').document(payload['id']), payload['data'])
+        elif op['op'] == 'update_material':
+            batch.update(db.collection('materials').document(payload['id']), payload['updates'])
+        elif op['op'] == 'delete_material':
+            batch.delete(db.collection('materials').document(payload['id']))
+        elif op['op'] == 'delete_job':
+            batch.delete(db.collection('jobs').document(payload['id']))
+        else:
+            raise ValueError(f"Unknown queued operation: {op['op']}")
+    batch.commit()
+
+
+def _writes_flushed(ops):
+    if any(op['op'] in ('update_material', 'delete_material') for op in ops):
+        # Re-read so the cache/replica reflect what Firestore now holds
+        invalidate_materials_cache()
+
+
+def _patch_cached_material(mat_id, updates):
+    """Show a queued material edit straight away in the cache and replica."""
+    with _cache_lock:
+        for m in _materials_cache["data"] or []:
+            if m.get('id') == mat_id:
+                m.update(updates)
+        _materials_cache["version"] += 1
+    if isinstance(_replica, MaterialsReplica):
+        doc = _replica.get(mat_id)
+        if doc is not None:
+            doc.update(updates)
+            _replica.apply([("MODIFIED", mat_id, doc)])
+
+
+def _drop_cached_material(mat_id):
+    """Hide a queued material delete straight away in the cache and replica."""
+    with _cache_lock:
+        if _materials_cache["data"] is not None:
+            _materials_cache["data"] = [m for m in _materials_cache["data"] if m.get('id') != mat_id]
+        _materials_cache["version"] += 1
+    if isinstance(_replica, MaterialsReplica):
+        _replica.apply([("REMOVED", mat_id, None)])
+
+
+def invalidate_materials_cache():
+    """Drop the cached materials list; the next fetch_materials() re-reads it."""
+    with _cache_lock:
+        _materials_cache["data"] = None
+        _materials_cache["expires"] = 0.0
+        _materials_cache["version"] += 1
+        _materials_cache["invalidations"] += 1
+    if isinstance(_replica, MaterialsReplica):
+        # Apply our own write now rather than waiting for the listener / next poll
+        _replica.resync()
+
+
+def materials_version():
+    """Counter that changes whenever the cached materials list may have changed."""
+    return _materials_cache["version"]
+
+
+def materials_cache_info():
+    """Last-refreshed time, age and hit/miss counters of the materials cache."""
+    with _cache_lock:
+        info = {k: v for k, v in _materials_cache.items() if k not in ("data", "expires")}
+        info["size"] = len(_materials_cache["data"]) if _materials_cache["data"] is not None else 0
+    refreshed = info["refreshed_at"]
+    info["age_seconds"] = (datetime.now() - refreshed).total_seconds() if refreshed else None
+    info["ttl_seconds"] = MATERIALS_TTL_SECONDS
+    info["backend"] = "sqlite" if get_store() else ("firestore" if get_db() else "mock")
+    info["mock_mode"] = info["backend"] == "mock"
+    info["replica"] = _replica.info() if isinstance(_replica, MaterialsReplica) else None
+    if info["replica"] is not None and info["replica"]["last_sync_at"] is not None:
+        info["refreshed_at"] = info["replica"]["last_sync_at"]
+        info["size"] = info["replica"]["size"]
+        info["age_seconds"] = (datetime.now() - info["refreshed_at"]).total_seconds()
+    return info
+
+
 def get_db():
     """
     Initializes and returns the Firestore client.
     Supports both local 'serviceAccountKey.json' and Streamlit Cloud 'st.secrets'.
+    The client (or None in mock / SQLite mode) is resolved once per process.
     """
+    global _db_client
+    if _db_client is _UNSET:
+        _db_client = _connect()
+    return _db_client
+
+
+def _connect():
+    if DB_BACKEND in ("sqlite", "mock"):
+        return None
+
     # Check if app is already initialized
     try:
         app = firebase_admin.get_app()
@@ -43,41 +260,100 @@ def get_db():
     
     return None
 
-def fetch_materials():
+def fetch_materials(force_refresh=False):
     """
     Fetches materials from Firestore 'materials' collection.
-    Returns a list of dicts.
+    Returns a list of dicts (copies, safe to modify).
+    Served from the live replica when it is running, otherwise from the
+    process-level cache until it expires or is invalidated.
     """
+    replica = materials_replica()
+    if replica is not None:
+        if force_refresh:
+            replica.resync()
+        if replica.wait_ready(REPLICA_READY_TIMEOUT):
+            with _cache_lock:
+                _materials_cache["hits"] += 1
+            return replica.snapshot()
+        # Listener has not delivered yet: fall back to a direct read
+
+    with _cache_lock:
+        cached = _materials_cache["data"]
+        if cached is not None and not force_refresh and time.monotonic() < _materials_cache["expires"]:
+            _materials_cache["hits"] += 1
+            return [dict(m) for m in cached]
+        _materials_cache["misses"] += 1
+
+    materials = _load_materials()
+    if materials is not None:
+        with _cache_lock:
+            if materials != _materials_cache["data"]:
+                _materials_cache["version"] += 1
+            _materials_cache["data"] = [dict(m) for m in materials]
+            _materials_cache["expires"] = time.monotonic() + MATERIALS_TTL_SECONDS
+            _materials_cache["refreshed_at"] = datetime.now()
+        return [dict(m) for m in materials]
+    # Read failed: fall back to the mock list, as before (not cached)
+    return [dict(m) for m in MOCK_MATERIALS]
+
+
+def _load_materials():
+    """Uncached read of the materials collection; None if the read failed."""
+    try:
+        return _read_materials()
+    except Exception as e:
+        st.error(f"Error fetching from DB: {e}")
+        return None
+
+
+def _read_materials():
+    """Full read of the materials collection (Firestore, SQLite or mock); raises on failure."""
+    store = get_store()
+    if store:
+        return store.fetch_materials()
     db = get_db()
     materials = []
     
     if db:
-        try:
-            docs = db.collection('materials').stream()
-            for doc in docs:
-                data = doc.to_dict()
-                data['id'] = doc.id
-                materials.append(data)
-        except Exception as e:
-            st.error(f"Error fetching from DB: {e}")
-            return MOCK_MATERIALS
+        docs = db.collection('materials').stream()
+        for doc in docs:
+            data = doc.to_dict()
+            data['id'] = doc.id
+            materials.append(data)
     else:
         # Return mock data if no DB connection
         for i, m in enumerate(MOCK_MATERIALS):
             if 'id' not in m:
                 m['id'] = str(i)
-        materials = MOCK_MATERIALS
+        materials = [dict(m) for m in MOCK_MATERIALS]
         
     return materials
 
 def update_material(mat_id, updates):
     """
-    Updates a material in Firestore or Mock list.
+    Updates a material in Firestore, SQLite or Mock list.
+    With write-behind enabled the Firestore update is queued and True returned at once.
     """
+    store = get_store()
+    if store:
+        try:
+            ok = store.update_material(mat_id, updates)
+        except Exception as e:
+            st.error(f"Error updating DB: {e}")
+            return False
+        if ok:
+            invalidate_materials_cache()
+        return ok
     db = get_db()
+    queue = write_queue()
+    if queue is not None:
+        queue.enqueue('update_material', {'id': mat_id, 'updates': dict(updates)})
+        _patch_cached_material(mat_id, updates)
+        return True
     if db:
         try:
             db.collection('materials').document(mat_id).update(updates)
+            invalidate_materials_cache()
             return True
         except Exception as e:
             st.error(f"Error updating DB: {e}")
@@ -87,6 +363,7 @@ def update_material(mat_id, updates):
         for m in MOCK_MATERIALS:
             if m.get('id') == mat_id:
                 m.update(updates)
+                invalidate_materials_cache()
                 return True
         return False
 
@@ -109,9 +386,19 @@ def add_material(name, cost_m2, width, supplier, category="Vinyl", unit_cost=Non
         'unit_type': unit_type
     }
 
-    if db:
+    store = get_store()
+    if store:
+        try:
+            store.add_material(data)
+            invalidate_materials_cache()
+            return True
+        except Exception as e:
+            st.error(f"Error adding to DB: {e}")
+            return False
+    elif db:
         try:
             db.collection('materials').add(data)
+            invalidate_materials_cache()
             return True
         except Exception as e:
             st.error(f"Error adding to DB: {e}")
@@ -119,6 +406,7 @@ def add_material(name, cost_m2, width, supplier, category="Vinyl", unit_cost=Non
     else:
         # Mock Mode: Add to local list
         MOCK_MATERIALS.append(data)
+        invalidate_materials_cache()
         st.success(f"Added {name} to local session (Mock Mode).")
         return True
 
@@ -132,6 +420,19 @@ def bulk_upload_materials(df):
     count = 0
     # In bulk upload, we assume 'Vinyl' / 'Linear Meter' pricing for now unless specified
     # Or, we can update this later to handle columns for Category.
+
+    store = get_store()
+    if store:
+        count = len(store.add_materials({
+            'name': row.get('Product', 'Unknown'),
+            'cost_per_m2': float(row.get('Price', 0.0)),
+            'roll_width': float(row.get('Width', 1.37)),
+            'supplier': row.get('Supplier', 'Unknown'),
+            'category': 'Vinyl',
+            'unit_type': 'linear_m'
+        } for index, row in df.iterrows()))
+        invalidate_materials_cache()
+        return count
     
     if not db:
         # Mock Mode: Bulk add to local list
@@ -146,6 +447,7 @@ def bulk_upload_materials(df):
                 'unit_type': 'linear_m'
             })
             count += 1
+        invalidate_materials_cache()
         return count
     
     batch = db.batch()
@@ -172,9 +474,142 @@ def bulk_upload_materials(df):
             
     if count % 400 != 0:
         batch.commit()
+    invalidate_materials_cache()
     
     return count
 
+FIRESTORE_BATCH_LIMIT = 500   # Firestore's maximum writes per batch
+IMPORT_WORKERS = 4
+
+
+def import_materials(source, category="Vinyl", chunk_rows=CHUNK_ROWS, progress=None, max_workers=IMPORT_WORKERS,
+                     mode="append", dry_run=False):
+    """
+    Streams a supplier price list (CSV path/file/upload, or a DataFrame) into materials.
+    Rows are validated and unit-converted a chunk at a time (see utils.bulk_import);
+    Firestore writes go out as concurrent batches of up to 500 from a small thread pool.
+
+    mode: 'append' creates every valid row; 'upsert' matches rows to existing
+          materials by SKU or (supplier, product name) and writes only new rows
+          and the fields that changed.
+    dry_run: Work out the changes without writing anything (upsert preview).
+    progress: Optional callback(report, fraction) after each chunk; fraction is the
+              share of the file read so far (None when unknown).
+
+    Returns a report dict: rows, imported (documents written), created, updated,
+    unchanged, changes (upsert diff, creates/updates only), errors (list of
+    {'line', 'product', 'error'}), seconds.
+    """
+    if mode not in ("append", "upsert"):
+        raise ValueError(f"Unknown import mode: {mode}")
+    started = time.perf_counter()
+    report = {'rows': 0, 'imported': 0, 'created': 0, 'updated': 0, 'unchanged': 0,
+              'changes': [], 'errors': [], 'seconds': 0.0}
+    size = getattr(source, 'size', None)
+    if size is None and isinstance(source, str) and os.path.exists(source):
+        size = os.path.getsize(source)
+
+    store = get_store()
+    db = get_db()
+    index = MaterialKeyIndex(fetch_materials()) if mode == "upsert" else None
+    executor = ThreadPoolExecutor(max_workers=max_workers) if (db and not store and not dry_run) else None
+    in_flight = {}
+
+    def collect(done):
+        for future in done:
+            ops = in_flight.pop(future)
+            try:
+                future.result()
+                _count_written(report, ops)
+            except Exception as e:
+                report['errors'].extend({'line': op['line'], 'product': op['doc'].get('name'),
+                                         'error': f"write failed: {e}"} for op in ops)
+
+    try:
+        line = 2  # first data row, after the header
+        for chunk in iter_csv_chunks(source, chunk_rows):
+            docs, lines, errors = prepare_chunk(chunk, category, first_line=line)
+            line += len(chunk)
+            report['rows'] += len(chunk)
+            report['errors'].extend(errors)
+
+            if index is None:
+                ops = [{'action': 'create', 'line': ln, 'id': None, 'doc': d, 'fields': d}
+                       for d, ln in zip(docs, lines)]
+            else:
+                ops, dup_errors = index.diff(docs, lines)
+                report['errors'].extend(dup_errors)
+                report['unchanged'] += sum(op['action'] == 'unchanged' for op in ops)
+                ops = [op for op in ops if op['action'] != 'unchanged']
+                report['changes'].extend(ops)
+
+            if dry_run or not ops:
+                pass
+            elif store:
+                store.add_materials(op['fields'] for op in ops if op['action'] == 'create')
+                found = store.update_materials((op['id'], op['fields']) for op in ops if op['action'] == 'update')
+                missing = [op for op, ok in zip([o for o in ops if o['action'] == 'update'], found) if not ok]
+                report['errors'].extend({'line': op['line'], 'product': op['doc'].get('name'),
+                                         'error': "material no longer exists"} for op in missing)
+                _count_written(report, [op for op in ops if op not in missing])
+            elif executor is not None:
+                for start in range(0, len(ops), FIRESTORE_BATCH_LIMIT):
+                    part = ops[start:start + FIRESTORE_BATCH_LIMIT]
+                    in_flight[executor.submit(_commit_material_batch, db, part)] = part
+                    # Bound memory: keep at most two batches per worker outstanding
+                    while len(in_flight) >= 2 * max_workers:
+                        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                        collect(done)
+            else:
+                # Mock Mode
+                by_id = {m.get('id'): m for m in MOCK_MATERIALS}
+                for op in ops:
+                    if op['action'] == 'create':
+                        MOCK_MATERIALS.append(dict(op['fields']))
+                    elif op['id'] in by_id:
+                        by_id[op['id']].update(op['fields'])
+                _count_written(report, ops)
+
+            if progress is not None:
+                position = source.tell() if hasattr(source, 'tell') else None
+                progress(report, min(1.0, position / size) if position is not None and size else None)
+
+        if in_flight:
+            done, _ = wait(list(in_flight))
+            collect(done)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if report['imported']:
+            invalidate_materials_cache()
+
+    if dry_run:
+        report['created'] = sum(op['action'] == 'create' for op in report['changes'])
+        report['updated'] = sum(op['action'] == 'update' for op in report['changes'])
+    report['errors'].sort(key=lambda e: e['line'])
+    report['seconds'] = time.perf_counter() - started
+    return report
+
+
+def _count_written(report, ops):
+    for op in ops:
+        report['created' if op['action'] == 'create' else 'updated'] += 1
+    report['imported'] += len(ops)
+
+
+def _commit_material_batch(db, ops):
+    batch = db.batch()
+    collection = db.collection('materials')
+    for op in ops:
+        if op['action'] == 'create':
+            batch.set(collection.document(), op['fields'])
+        elif op['action'] == 'delete':
+            batch.delete(collection.document(op['id']))
+        else:
+            batch.update(collection.document(op['id']), op['fields'])
+    batch.commit()
+
+
 # Placeholder for mock jobs
 MOCK_JOBS = []
 
@@ -182,11 +617,29 @@ def save_job(job_data):
     """
     Saves a job estimate to Firestore 'jobs' collection.
     job_data: Dict containing client info, description, items, and totals.
+    With write-behind enabled the save is queued and True returned at once.
     """
     db = get_db()
     
     # Add timestamp
     job_data['created_at'] = datetime.now()
+
+    store = get_store()
+    if store:
+        try:
+            job_data['id'] = store.save_job(job_data)
+            return True
+        except Exception as e:
+            st.error(f"Error adding job to DB: {e}")
+            return False
+
+    queue = write_queue()
+    if queue is not None:
+        # Firestore ids are generated client-side, so the id is known before the write lands
+        job_data['id'] = db.collection('jobs').document().id
+        queue.enqueue('save_job', {'id': job_data['id'],
+                                   'data': {k: v for k, v in job_data.items() if k != 'id'}})
+        return True
     
     if db:
         try:
@@ -197,6 +650,7 @@ def save_job(job_data):
             return False
     else:
         # Mock Mode
+        job_data.setdefault('id', uuid.uuid4().hex)
         MOCK_JOBS.append(job_data)
         st.success("Job saved to local session (Mock Mode).")
         return True
@@ -208,6 +662,14 @@ def fetch_jobs():
     """
     db = get_db()
     jobs = []
+
+    store = get_store()
+    if store:
+        try:
+            return store.fetch_jobs()
+        except Exception as e:
+            st.error(f"Error fetching jobs from DB: {e}")
+            return []
     
     if db:
         try:
@@ -226,11 +688,134 @@ def fetch_jobs():
         
     return jobs
 
+JOBS_PAGE_SIZE = 20
+
+
+def _as_datetime(value, end_of_day=False):
+    """Dates become the start (or end) of that day; datetimes pass through."""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, dt_time.max if end_of_day else dt_time.min)
+    return value
+
+
+def fetch_jobs_page(limit=JOBS_PAGE_SIZE, start_after=None, order_by='created_at', filters=None, descending=True):
+    """
+    Fetches one page of job history, ordered server-side.
+
+    limit: Page size.
+    start_after: Cursor from the previous page's 'next_cursor' (None for the first page).
+                 If that job has since been deleted the page is empty, with has_more
+                 False, on every backend (rather than silently starting over).
+    order_by: Job field to sort on (newest first unless descending=False).
+    filters: Optional dict with 'client_name' (exact match on client.name) and
+             'date_from' / 'date_to' (dates or datetimes, inclusive) on created_at.
+
+    Returns a dict: {'jobs': [...], 'next_cursor': id or None, 'has_more': bool}.
+    """
+    filters = filters or {}
+    client_name = (filters.get('client_name') or '').strip()
+    date_from = _as_datetime(filters.get('date_from'))
+    date_to = _as_datetime(filters.get('date_to'), end_of_day=True)
+
+    # Jobs whose delete is still waiting in the write-behind queue are hidden;
+    # fetch that many extra (plus one, to tell whether there is another page)
+    queue = write_queue()
+    deleting = {op['payload']['id'] for op in queue.pending('delete_job')} if queue is not None else set()
+    fetch = limit + 1 + len(deleting)
+
+    store = get_store()
+    db = get_db()
+    if store:
+        try:
+            jobs = store.fetch_jobs_page(fetch, start_after, order_by, client_name or None,
+                                         date_from, date_to, descending)
+        except Exception as e:
+            st.error(f"Error fetching jobs from DB: {e}")
+            return {'jobs': [], 'next_cursor': None, 'has_more': False}
+    elif db:
+        try:
+            query = db.collection('jobs')
+            if client_name:
+                query = query.where(filter=firestore.FieldFilter('client.name', '==', client_name))
+            if date_from is not None:
+                query = query.where(filter=firestore.FieldFilter('created_at', '>=', date_from))
+            if date_to is not None:
+                query = query.where(filter=firestore.FieldFilter('created_at', '<=', date_to))
+            direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+            query = query.order_by(order_by, direction=direction)
+            cursor_doc = db.collection('jobs').document(start_after).get() if start_after else None
+            jobs = []
+            if cursor_doc is None or cursor_doc.exists:
+                if cursor_doc is not None:
+                    query = query.start_after(cursor_doc)
+                for doc in query.limit(fetch).stream():
+                    data = doc.to_dict()
+                    data['id'] = doc.id
+                    jobs.append(data)
+        except Exception as e:
+            st.error(f"Error fetching jobs from DB: {e}")
+            return {'jobs': [], 'next_cursor': None, 'has_more': False}
+    else:
+        # Mock Mode: same ordering, filtering and cursor semantics in memory
+        jobs = list(MOCK_JOBS)
+        if client_name:
+            jobs = [j for j in jobs if (j.get('client') or {}).get('name') == client_name]
+        if date_from is not None:
+            jobs = [j for j in jobs if j.get('created_at') is not None and j['created_at'] >= date_from]
+        if date_to is not None:
+            jobs = [j for j in jobs if j.get('created_at') is not None and j['created_at'] <= date_to]
+        jobs = [j for j in jobs if j.get(order_by) is not None]  # Firestore skips docs missing the field
+        jobs.sort(key=lambda j: j[order_by], reverse=descending)
+        if start_after:
+            ids = [j.get('id') for j in jobs]
+            jobs = jobs[ids.index(start_after) + 1:] if start_after in ids else []
+        jobs = jobs[:fetch]
+
+    if deleting:
+        jobs = [j for j in jobs if j.get('id') not in deleting]
+    has_more = len(jobs) > limit
+    jobs = jobs[:limit]
+    next_cursor = jobs[-1].get('id') if has_more and jobs else None
+    return {
+        'jobs': jobs,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+    }
+
+def iter_jobs(filters=None, page_size=100, order_by='created_at', descending=True):
+    """
+    Yield every job matching `filters` (as for fetch_jobs_page), one page at a
+    time, so a full-history export never holds more than a page of jobs.
+    """
+    cursor = None
+    while True:
+        page = fetch_jobs_page(limit=page_size, start_after=cursor, order_by=order_by,
+                               filters=filters, descending=descending)
+        yield from page['jobs']
+        if not page['has_more']:
+            return
+        cursor = page['next_cursor']
+
+
 def delete_job(job_id):
     """
-    Deletes a job from Firestore or Mock list.
+    Deletes a job from Firestore, SQLite or Mock list.
+    With write-behind enabled the delete is queued and True returned at once.
     """
+    store = get_store()
+    if store:
+        try:
+            return store.delete_job(job_id)
+        except Exception as e:
+            st.error(f"Error deleting job: {e}")
+            return False
     db = get_db()
+    queue = write_queue()
+    if queue is not None:
+        queue.enqueue('delete_job', {'id': job_id})
+        return True
     if db:
         try:
             db.collection('jobs').document(job_id).delete()
@@ -239,29 +824,140 @@ def delete_job(job_id):
             st.error(f"Error deleting job: {e}")
             return False
     else:
-        # Mock Mode
-        global MOCK_JOBS
-        MOCK_JOBS = [j for j in MOCK_JOBS if j.get('id') != job_id]
+        # Mock Mode (filter in place so other references to the list stay valid)
+        MOCK_JOBS[:] = [j for j in MOCK_JOBS if j.get('id') != job_id]
         return True
 
 def delete_material(mat_id):
     """
-    Deletes a material from Firestore or Mock list.
+    Deletes a material from Firestore, SQLite or Mock list.
+    With write-behind enabled the delete is queued (in order with queued
+    material updates) and True returned at once.
     """
+    store = get_store()
+    if store:
+        try:
+            ok = store.delete_material(mat_id)
+        except Exception as e:
+            st.error(f"Error deleting material: {e}")
+            return False
+        if ok:
+            invalidate_materials_cache()
+        return ok
     db = get_db()
+    queue = write_queue()
+    if queue is not None:
+        queue.enqueue('delete_material', {'id': mat_id})
+        _drop_cached_material(mat_id)
+        return True
     if db:
         try:
             db.collection('materials').document(mat_id).delete()
+            invalidate_materials_cache()
             return True
         except Exception as e:
             st.error(f"Error deleting material: {e}")
             return False
     else:
-        # Mock Mode
-        global MOCK_MATERIALS
-        MOCK_MATERIALS = [m for m in MOCK_MATERIALS if m.get('id') != mat_id]
+        # Mock Mode (filter in place so other references to the list stay valid)
+        MOCK_MATERIALS[:] = [m for m in MOCK_MATERIALS if m.get('id') != mat_id]
+        invalidate_materials_cache()
         return True
 
+
+def apply_material_changes(updates=(), deletes=()):
+    """
+    Apply one Supplier Manager submission (all grid edits and deletions) at once:
+    as Firestore write batches of up to FIRESTORE_BATCH_LIMIT, one SQLite
+    transaction, or in place in Mock mode. With write-behind enabled the whole
+    submission is journaled in one transaction and reported as queued.
+    The materials cache is invalidated once, not per row.
+
+    Args:
+        updates: (material id, fields) pairs
+        deletes: Material ids to delete
+
+    Returns:
+        One {'id', 'action': 'update'|'delete', 'ok', 'error'} dict per change,
+        updates first, in the order given.
+    """
+    updates = [(mat_id, dict(fields)) for mat_id, fields in updates]
+    deletes = list(deletes)
+    results = [{'id': mat_id, 'action': 'update', 'ok': False, 'error': None} for mat_id, _ in updates] + \
+              [{'id': mat_id, 'action': 'delete', 'ok': False, 'error': None} for mat_id in deletes]
+    if not results:
+        return results
+
+    store = get_store()
+    if store:
+        try:
+            found = store.apply_material_changes(updates, deletes)
+        except Exception as e:
+            st.error(f"Error updating DB: {e}")
+            for r in results:
+                r['error'] = str(e)
+            return results
+        for r, ok in zip(results, found[0] + found[1]):
+            r['ok'] = ok
+            r['error'] = None if ok else "material no longer exists"
+        if any(r['ok'] for r in results):
+            invalidate_materials_cache()
+        return results
+
+    db = get_db()
+    queue = write_queue()
+    if queue is not None:
+        queue.enqueue_many([('update_material', {'id': mat_id, 'updates': fields}) for mat_id, fields in updates] +
+                           [('delete_material', {'id': mat_id}) for mat_id in deletes])
+        for mat_id, fields in updates:
+            _patch_cached_material(mat_id, fields)
+        for mat_id in deletes:
+            _drop_cached_material(mat_id)
+        for r in results:
+            r['ok'] = True
+        return results
+
+    if db:
+        ops = [{'action': 'update', 'id': mat_id, 'fields': fields} for mat_id, fields in updates] + \
+              [{'action': 'delete', 'id': mat_id, 'fields': None} for mat_id in deletes]
+        for start in range(0, len(ops), FIRESTORE_BATCH_LIMIT):
+            part = list(zip(ops[start:start + FIRESTORE_BATCH_LIMIT], results[start:start + FIRESTORE_BATCH_LIMIT]))
+            try:
+                _commit_material_batch(db, [op for op, _ in part])
+                for _, r in part:
+                    r['ok'] = True
+                continue
+            except Exception:
+                pass
+            # A batch is all-or-nothing (one missing document fails it): retry
+            # row by row so only the rows that really fail are reported
+            for op, r in part:
+                try:
+                    _commit_material_batch(db, [op])
+                    r['ok'] = True
+                except Exception as e:
+                    r['error'] = str(e)
+        if any(r['ok'] for r in results):
+            invalidate_materials_cache()
+        return results
+
+    # Mock Mode
+    by_id = {m.get('id'): m for m in MOCK_MATERIALS}
+    for r, (mat_id, fields) in zip(results, updates):
+        if mat_id in by_id:
+            by_id[mat_id].update(fields)
+            r['ok'] = True
+        else:
+            r['error'] = "material no longer exists"
+    gone = set(deletes)
+    for r in results[len(updates):]:
+        r['ok'] = r['id'] in by_id
+        r['error'] = None if r['ok'] else "material no longer exists"
+    MOCK_MATERIALS[:] = [m for m in MOCK_MATERIALS if m.get('id') not in gone]
+    if any(r['ok'] for r in results):
+        invalidate_materials_cache()
+    return results
+
 # ── Settings persistence ─────────────────────────────────────────────────────
 
 SETTINGS_DEFAULTS = {
@@ -276,6 +972,15 @@ def load_settings():
     Load rate settings from Firestore 'settings/rates' document.
     Returns a dict with the four rate keys, falling back to hardcoded defaults.
     """
+    store = get_store()
+    if store:
+        try:
+            data = store.load_settings('rates')
+            if data is not None:
+                return {k: float(data.get(k, v)) for k, v in SETTINGS_DEFAULTS.items()}
+        except Exception as e:
+            st.warning(f"Could not load settings from DB — using defaults. ({e})")
+        return dict(SETTINGS_DEFAULTS)
     db = get_db()
     if db:
         try:
@@ -294,6 +999,14 @@ def save_settings(rate_dict):
     Persist rate settings to Firestore 'settings/rates' document.
     rate_dict: dict with keys hourly_rate, workshop_rate, fitting_rate, travel_rate
     """
+    store = get_store()
+    if store:
+        try:
+            store.save_settings('rates', {k: float(v) for k, v in rate_dict.items()})
+            return True
+        except Exception as e:
+            st.error(f"Error saving settings: {e}")
+            return False
     db = get_db()
     if db:
         try:
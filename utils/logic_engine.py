@@ -1,17 +1,125 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from utils.lru import LRUCache
+from utils.rate_index import MaterialRateIndex
+
+
+# Every numeric field calculate_job() rounds to pennies, in output order
+MONEY_FIELDS = [
+    "material_cost_raw", "wastage_cost", "material_cost_total",
+    "shop_cost_internal", "install_cost_internal", "travel_cost_internal",
+    "breakeven", "workshop_price_billed", "install_price_billed",
+    "travel_price_billed", "labor_total_billed", "quote_price", "profit",
+]
+
+# calculate_job() keyword defaults, used to fill missing batch columns
+JOB_DEFAULTS = {
+    "travel_hours": 0.0,
+    "installers": 2,
+    "wastage_percent": 0.0,
+    "markup": 1.0,
+    "print_ready": False,
+    "repeat_job": False,
+    "design_hours": 0.0,
+    "use_nesting": False,
+}
+
+
+def _round_money(values):
+    """
+    Round an array to pennies exactly like the builtin round(x, 2).
+    np.round scales by 100 and rints, which disagrees with round() on some
+    half-penny ties, so the batch path would drift a penny from calculate_job.
+    """
+    values = np.asarray(values, dtype=float)
+    flat = np.fromiter((round(v, 2) for v in values.ravel().tolist()), dtype=float, count=values.size)
+    return flat.reshape(values.shape)
+
+
+def job_fingerprint(items, prod_hours, install_hours, travel_hours=0.0, installers=2,
+                    wastage_percent=0.0, markup=1.0, print_ready=False, repeat_job=False,
+                    design_hours=0.0, use_nesting=False, rates=()):
+    """
+    Stable hash of everything calculate_job reads: the pricing fields of each
+    item, the labour hours, job flags and the engine rates.
+    """
+    canon_items = tuple(
+        (item['width'], item['height'], item['qty'], tuple(item['materials']), item.get('nesting_area_m2'))
+        for item in items
+    )
+    key = (canon_items, prod_hours, install_hours, travel_hours, installers, wastage_percent,
+           markup, bool(print_ready), bool(repeat_job), design_hours, bool(use_nesting), tuple(rates))
+    return hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _rate_property(name):
+    """Rate attribute that drops the engine's result cache whenever it changes."""
+    attr = '_' + name
+
+    def getter(self):
+        return getattr(self, attr)
+
+    def setter(self, value):
+        if getattr(self, attr, None) != value:
+            setattr(self, attr, value)
+            self._result_cache.clear()
+
+    return property(getter, setter)
+
+
 class PricingEngine:
-    def __init__(self, db_materials, overhead_rate=66.04, workshop_rate=60.00, fitting_rate=75.0, travel_rate=75.0):
+    RESULT_CACHE_SIZE = 256
+
+    overhead_rate = _rate_property('overhead_rate')
+    workshop_rate = _rate_property('workshop_rate')
+    fitting_rate = _rate_property('fitting_rate')
+    travel_rate = _rate_property('travel_rate')
+
+    def __init__(self, db_materials, overhead_rate=66.04, workshop_rate=60.00, fitting_rate=75.0, travel_rate=75.0,
+                 cache_size=RESULT_CACHE_SIZE):
         """
-        db_materials: Dictionary of materials from Firebase 
+        db_materials: Dictionary of {name: cost_per_m2} from Firebase, or a prebuilt
+                      MaterialRateIndex (shared across reruns, updated in place).
+                      A dict is copied into a new index here, so later edits to
+                      it are not seen: change material rates with set_material_rate()
         overhead_rate: Internal cost of shop per hour (for breakeven)
         workshop_rate: Billable rate for workshop time per person
         fitting_rate: Billable rate for installation time per person
         travel_rate: Billable rate for travel time per person
+        cache_size: Max calculate_job results kept in the LRU (keep the engine alive
+                    across reruns to benefit; price_totals() is not cached)
         """
+        self._result_cache = LRUCache(cache_size)
         self.materials = db_materials
+        if isinstance(db_materials, MaterialRateIndex):
+            self.rate_index = db_materials
+        else:
+            self.rate_index = MaterialRateIndex.from_rates(db_materials)
         self.overhead_rate = overhead_rate
         self.workshop_rate = workshop_rate
         self.fitting_rate = fitting_rate
         self.travel_rate = travel_rate
+        self._cache_version = self.rate_index.version
+
+    def set_material_rate(self, name, rate):
+        """
+        Change one material's cost_per_m2 (adding it if new). Goes through the
+        rate index, so cached results priced at the old rate are dropped; the
+        labour rates have the same guarantee through their setters.
+        """
+        if isinstance(self.materials, dict):
+            self.materials[name] = rate
+        self.rate_index.set_rate(name, rate)
+
+    def cache_info(self):
+        """Hit/miss counters and size of the calculate_job result cache."""
+        return self._result_cache.info()
+
+    def clear_cache(self):
+        self._result_cache.clear()
 
     @staticmethod
     def convert_to_meters(value, unit):
@@ -53,26 +161,50 @@ class PricingEngine:
         Returns:
             Dictionary with comprehensive pricing breakdown
         """
-        total_material_cost = 0
-        
+        # Any material price edit bumps the index version and invalidates the cache
+        if self._cache_version != self.rate_index.version:
+            self._result_cache.clear()
+            self._cache_version = self.rate_index.version
+
+        key = job_fingerprint(
+            items, prod_hours, install_hours, travel_hours, installers, wastage_percent,
+            markup, print_ready, repeat_job, design_hours, use_nesting,
+            rates=(self.overhead_rate, self.workshop_rate, self.fitting_rate, self.travel_rate)
+        )
+        cached = self._result_cache.get(key)
+        if cached is None:
+            cached = self._calculate_job(
+                items, prod_hours, install_hours, travel_hours, installers, wastage_percent,
+                markup, print_ready, repeat_job, design_hours, use_nesting
+            )
+            self._result_cache.put(key, cached)
+        return dict(cached)
+
+    def _calculate_job(self, items, prod_hours, install_hours, travel_hours, installers,
+                       wastage_percent, markup, print_ready, repeat_job, design_hours, use_nesting):
+        """Uncached pricing behind calculate_job."""
+        # 1. Calculate Materials
+        total_material_cost = self.material_cost(items, use_nesting)
+
+        return self.price_totals(
+            total_material_cost, prod_hours, install_hours, travel_hours, installers,
+            wastage_percent, markup, print_ready, repeat_job, design_hours, use_nesting
+        )
+
+    def price_totals(self, total_material_cost, prod_hours, install_hours, travel_hours=0.0, installers=2,
+                     wastage_percent=0.0, markup=1.0, print_ready=False, repeat_job=False,
+                     design_hours=0.0, use_nesting=False):
+        """
+        Price a job from its pre-summed raw material cost (area x rate over all items).
+        Same arguments and output as calculate_job, minus the item scan - used by
+        JobAccumulator, which keeps the material total up to date incrementally.
+        Constant time, so it bypasses the calculate_job result cache.
+        """
         # Conditional Design Time Logic
         effective_design_hours = 0.0
         if not print_ready and not repeat_job:
             effective_design_hours = design_hours
         # If print_ready=True OR repeat_job=True, design time is zeroed
-        
-        # 1. Calculate Materials
-        for item in items:
-            # Check if item has optimized nesting data
-            if use_nesting and 'nesting_area_m2' in item:
-                # Use the optimized batch area instead of individual calculation
-                area = item['nesting_area_m2']
-            else:
-                # Standard individual calculation
-                area = item['width'] * item['height'] * item['qty']
-            
-            item_rate = sum([self.materials.get(m, 0) for m in item['materials']])
-            total_material_cost += (area * item_rate)
 
         # Apply Wastage
         wastage_cost = total_material_cost * (wastage_percent / 100.0)
@@ -126,3 +258,391 @@ class PricingEngine:
             "repeat_job": repeat_job,
             "nesting_enabled": use_nesting
         }
+
+    def calculate_jobs_batch(self, jobs, items):
+        """
+        Price many jobs in one vectorized pass.
+
+        Args:
+            jobs: DataFrame (or dict of columns), one row per job. Columns mirror the
+                  calculate_job keywords: prod_hours, install_hours and optionally
+                  travel_hours, installers, wastage_percent, markup, print_ready,
+                  repeat_job, design_hours, use_nesting (missing columns take the
+                  calculate_job defaults).
+            items: DataFrame (or dict of columns), one row per material item:
+                  job (row position of the owning job in `jobs`), width, height, qty,
+                  materials (list of material names) and optionally nesting_area_m2
+                  (NaN where the item has no nesting data). Rows with a 'type'
+                  other than 'material' are ignored, as in calculate_job.
+
+        Returns:
+            DataFrame indexed like `jobs` with the same fields calculate_job returns.
+            Money fields match the scalar path to the penny.
+        """
+        jobs = pd.DataFrame(jobs)
+        items = pd.DataFrame(items)
+        n_jobs = len(jobs)
+
+        def col(name, default):
+            if name in jobs.columns:
+                return jobs[name].to_numpy()
+            return np.full(n_jobs, default)
+
+        prod_hours = col("prod_hours", 0.0).astype(float)
+        install_hours = col("install_hours", 0.0).astype(float)
+        travel_hours = col("travel_hours", JOB_DEFAULTS["travel_hours"]).astype(float)
+        installers = col("installers", JOB_DEFAULTS["installers"])
+        wastage_percent = col("wastage_percent", JOB_DEFAULTS["wastage_percent"]).astype(float)
+        markup = col("markup", JOB_DEFAULTS["markup"]).astype(float)
+        print_ready = col("print_ready", JOB_DEFAULTS["print_ready"]).astype(bool)
+        repeat_job = col("repeat_job", JOB_DEFAULTS["repeat_job"]).astype(bool)
+        design_hours = col("design_hours", JOB_DEFAULTS["design_hours"]).astype(float)
+        use_nesting = col("use_nesting", JOB_DEFAULTS["use_nesting"]).astype(bool)
+
+        # 1. Materials - per-item rate, then per-job cost (bincount sums in input
+        #    order, so the float accumulation is identical to the scalar loop)
+        if "type" in items.columns:
+            items = items[items["type"] == "material"]
+        total_material_cost = np.zeros(n_jobs)
+        if len(items):
+            job_pos = items["job"].to_numpy(dtype=np.int64)
+            intern = self.rate_index.intern
+            combo_ids = np.fromiter((intern(m) for m in items["materials"]), dtype=np.int64, count=len(items))
+            item_rate = self.rate_index.combo_rates_array()[combo_ids]
+
+            area = (items["width"].to_numpy(dtype=float) * items["height"].to_numpy(dtype=float)
+                    * items["qty"].to_numpy(dtype=float))
+            if "nesting_area_m2" in items.columns:
+                nest_area = items["nesting_area_m2"].to_numpy(dtype=float)
+                nested = use_nesting[job_pos] & ~np.isnan(nest_area)
+                area = np.where(nested, nest_area, area)
+
+            total_material_cost = np.bincount(job_pos, weights=area * item_rate, minlength=n_jobs)
+
+        # Conditional Design Time Logic
+        effective_design_hours = np.where(~print_ready & ~repeat_job, design_hours, 0.0)
+
+        raw = self._price_arrays(
+            total_material_cost, prod_hours, install_hours, travel_hours, installers,
+            wastage_percent, markup, effective_design_hours
+        )
+        out = {k: _round_money(raw[k]) for k in MONEY_FIELDS}
+        out.update({
+            "design_hours_input": design_hours,
+            "design_hours_billed": effective_design_hours,
+            "print_ready": print_ready,
+            "repeat_job": repeat_job,
+            "nesting_enabled": use_nesting,
+        })
+        return pd.DataFrame(out, index=jobs.index)
+
+    def _price_arrays(self, total_material_cost, prod_hours, install_hours, travel_hours, installers,
+                      wastage_percent, markup, effective_design_hours):
+        """
+        Array form of price_totals (unrounded). Arguments broadcast against each
+        other, so the same code prices a batch of jobs or a what-if grid.
+        """
+        # Apply Wastage
+        wastage_cost = total_material_cost * (wastage_percent / 100.0)
+        total_mat_with_waste = total_material_cost + wastage_cost
+
+        # 2. Internal Costs (Breakeven)
+        shop_cost = (prod_hours + effective_design_hours) * self.overhead_rate
+        has_installers = installers > 0
+        install_cost_internal = np.where(
+            has_installers,
+            (install_hours * self.overhead_rate) + (install_hours * 15.00 * (installers - 1)),
+            0.0)
+        travel_cost_internal = np.where(
+            has_installers,
+            (travel_hours * self.overhead_rate) + (travel_hours * 15.00 * (installers - 1)),
+            0.0)
+
+        true_breakeven = total_mat_with_waste + shop_cost + install_cost_internal + travel_cost_internal
+
+        # 3. Pricing Strategy (Billable Rates)
+        workshop_price = (prod_hours + effective_design_hours) * self.workshop_rate
+        install_price = install_hours * installers * self.fitting_rate
+        travel_price = travel_hours * installers * self.travel_rate
+
+        labor_total_price = workshop_price + install_price + travel_price
+        quote_price = (total_mat_with_waste * markup) + labor_total_price
+
+        return {
+            "material_cost_raw": total_material_cost,
+            "wastage_cost": wastage_cost,
+            "material_cost_total": total_mat_with_waste,
+            "shop_cost_internal": shop_cost,
+            "install_cost_internal": install_cost_internal,
+            "travel_cost_internal": travel_cost_internal,
+            "breakeven": true_breakeven,
+            "workshop_price_billed": workshop_price,
+            "install_price_billed": install_price,
+            "travel_price_billed": travel_price,
+            "labor_total_billed": labor_total_price,
+            "quote_price": quote_price,
+            "profit": quote_price - true_breakeven,
+        }
+
+    def material_cost(self, items, use_nesting=False):
+        """Raw material cost (area x combined rate, before wastage) of a list of material items."""
+        total_material_cost = 0
+        combo_rate = self.rate_index.combo_rate
+        for item in items:
+            if use_nesting and 'nesting_area_m2' in item:
+                area = item['nesting_area_m2']
+            else:
+                area = item['width'] * item['height'] * item['qty']
+            total_material_cost += (area * combo_rate(item['materials']))
+        return total_material_cost
+
+    def sweep(self, items, prod_hours, install_hours, travel_hours=0.0,
+              markups=(1.0,), wastage_percents=(0.0,), installers=(2,),
+              print_ready=False, repeat_job=False, design_hours=0.0, use_nesting=False,
+              material_cost=None):
+        """
+        What-if grid: price one job for every markup x wastage x installer-count
+        combination in a single vectorized pass.
+
+        Args:
+            items, prod_hours, ...: as for calculate_job
+            markups / wastage_percents / installers: values to sweep along each axis
+            material_cost: Pre-summed raw material cost (e.g. JobAccumulator's);
+                           skips the item scan when given
+
+        Returns:
+            Dictionary with the three axes and 'quote_price', 'breakeven', 'profit'
+            (GBP, rounded like calculate_job) and 'margin_percent' surfaces, each
+            shaped (len(markups), len(wastage_percents), len(installers)).
+        """
+        if material_cost is None:
+            material_cost = self.material_cost(items, use_nesting)
+        m = np.asarray(markups, dtype=float)
+        w = np.asarray(wastage_percents, dtype=float)
+        n = np.asarray(installers)
+        effective_design_hours = 0.0 if (print_ready or repeat_job) else design_hours
+
+        raw = self._price_arrays(
+            material_cost, prod_hours, install_hours, travel_hours,
+            n[None, None, :], w[None, :, None], m[:, None, None], effective_design_hours
+        )
+        shape = (len(m), len(w), len(n))
+        quote = _round_money(np.broadcast_to(raw["quote_price"], shape))
+        breakeven = _round_money(np.broadcast_to(raw["breakeven"], shape))
+        profit = _round_money(np.broadcast_to(raw["profit"], shape))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            margin = np.where(quote > 0, profit / quote * 100, 0.0)
+        return {
+            "markup": m,
+            "wastage_percent": w,
+            "installers": n,
+            "quote_price": quote,
+            "breakeven": breakeven,
+            "profit": profit,
+            "margin_percent": margin,
+        }
+
+    def solve_markup(self, items, prod_hours, install_hours, travel_hours=0.0, installers=2,
+                     wastage_percent=0.0, print_ready=False, repeat_job=False, design_hours=0.0,
+                     use_nesting=False, target_margin=None, target_price=None, material_cost=None):
+        """
+        Closed-form markup that hits a target margin (%) or quote price.
+        Quote is linear in markup (material_with_waste x markup + labour), so
+        no iteration over calculate_job is needed.
+
+        Returns:
+            Dictionary with 'markup' (None if unreachable - e.g. no material cost
+            to mark up, or a margin of 100% or more) and 'results', the
+            calculate_job-style breakdown at that markup.
+        """
+        if (target_margin is None) == (target_price is None):
+            raise ValueError("Pass exactly one of target_margin or target_price")
+        if material_cost is None:
+            material_cost = self.material_cost(items, use_nesting)
+        effective_design_hours = 0.0 if (print_ready or repeat_job) else design_hours
+        base = self._price_arrays(
+            material_cost, prod_hours, install_hours, travel_hours, installers,
+            wastage_percent, 0.0, effective_design_hours
+        )
+        mat_with_waste = float(base["material_cost_total"])
+        labour = float(base["labor_total_billed"])
+        cost_basis = float(base["breakeven"])
+
+        markup = None
+        if mat_with_waste > 0:
+            if target_price is not None:
+                markup = (target_price - labour) / mat_with_waste
+            elif target_margin < 100:
+                markup = (cost_basis / (1 - target_margin / 100.0) - labour) / mat_with_waste
+
+        results = None
+        if markup is not None:
+            results = self.price_totals(
+                material_cost, prod_hours, install_hours, travel_hours, installers,
+                wastage_percent, markup, print_ready, repeat_job, design_hours, use_nesting
+            )
+        return {"markup": markup, "results": results}
+
+    @staticmethod
+    def to_batch_frames(job_specs):
+        """
+        Convert a list of calculate_job keyword dicts (each with an 'items' list)
+        into the (jobs, items) frames expected by calculate_jobs_batch.
+        """
+        job_rows = []
+        item_rows = []
+        for pos, spec in enumerate(job_specs):
+            row = {k: spec.get(k, v) for k, v in JOB_DEFAULTS.items()}
+            row["prod_hours"] = spec.get("prod_hours", 0.0)
+            row["install_hours"] = spec.get("install_hours", 0.0)
+            job_rows.append(row)
+            for item in spec.get("items", []):
+                if item.get("type", "material") != "material":
+                    continue
+                item_rows.append({
+                    "job": pos,
+                    "width": item["width"],
+                    "height": item["height"],
+                    "qty": item["qty"],
+                    "materials": list(item["materials"]),
+                    "nesting_area_m2": item.get("nesting_area_m2", np.nan),
+                })
+        items = pd.DataFrame(item_rows, columns=["job", "width", "height", "qty", "materials", "nesting_area_m2"])
+        return pd.DataFrame(job_rows), items
+
+
+class JobAccumulator:
+    """
+    Running totals over a job_items list (material cost, area, quantity and
+    additional labour), so adding, deleting or clearing an item is an O(1)
+    update rather than a rescan.
+
+    The accumulator owns mutations of `items`: use append/pop/clear instead of
+    editing the list directly. A material price change (rate index version
+    bump) triggers a one-off rebuild.
+    """
+
+    def __init__(self, items=None, rate_index=None):
+        self.items = items if items is not None else []
+        self.rate_index = rate_index if rate_index is not None else MaterialRateIndex()
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute every total from scratch (after a price change or external edit)."""
+        self.material_cost = 0            # sum of area x rate, standard areas
+        self.material_cost_nested = 0     # same, preferring nesting_area_m2 where present
+        self.area_m2 = 0.0
+        self.total_qty = 0
+        self.prod_hours = 0
+        self.install_hours = 0
+        self.travel_hours = 0
+        self._fitters = {}                # fitters value -> count, for an O(1)-ish max
+        self._material_count = 0
+        self._contribs = []
+        self._version = self.rate_index.version
+        for item in self.items:
+            contrib = self._contribution(item)
+            self._contribs.append(contrib)
+            self._apply(contrib, 1)
+
+    def _contribution(self, item):
+        if item.get('type') == 'material':
+            area = item['width'] * item['height'] * item['qty']
+            rate = self.rate_index.combo_rate(item['materials'])
+            nested_area = item.get('nesting_area_m2', area)
+            return ('material', area * rate, nested_area * rate, area, item['qty'])
+        if item.get('type') == 'labor':
+            lab = item['raw_labor']
+            return ('labor', lab['prod'], lab['inst'], lab['trav'], lab['fit'])
+        return (None,)
+
+    def _apply(self, contrib, sign):
+        kind = contrib[0]
+        if kind == 'material':
+            _, cost, cost_nested, area, qty = contrib
+            self._material_count += sign
+            if self._material_count == 0:
+                # Snap back to exact zero so add/remove cycles don't leave float dust
+                self.material_cost = 0
+                self.material_cost_nested = 0
+                self.area_m2 = 0.0
+                self.total_qty = 0
+            else:
+                self.material_cost += sign * cost
+                self.material_cost_nested += sign * cost_nested
+                self.area_m2 += sign * area
+                self.total_qty += sign * qty
+        elif kind == 'labor':
+            _, prod, inst, trav, fit = contrib
+            self.prod_hours += sign * prod
+            self.install_hours += sign * inst
+            self.travel_hours += sign * trav
+            count = self._fitters.get(fit, 0) + sign
+            if count:
+                self._fitters[fit] = count
+            else:
+                self._fitters.pop(fit, None)
+
+    def _check_rates(self):
+        if self._version != self.rate_index.version:
+            self.rebuild()
+
+    # ── Mutations ────────────────────────────────────────────────────────────
+
+    def append(self, item):
+        self._check_rates()
+        contrib = self._contribution(item)
+        self.items.append(item)
+        self._contribs.append(contrib)
+        self._apply(contrib, 1)
+
+    def pop(self, idx=-1):
+        """Remove and return the item at `idx` (the 🗑️ delete-by-index)."""
+        self._check_rates()
+        item = self.items.pop(idx)
+        self._apply(self._contribs.pop(idx), -1)
+        return item
+
+    def clear(self):
+        self.items.clear()
+        self.rebuild()
+
+    # ── Views ────────────────────────────────────────────────────────────────
+
+    @property
+    def max_fitters(self):
+        """Largest fitter count across additional labour items (0 if none)."""
+        return max(self._fitters) if self._fitters else 0
+
+    def material_total(self, use_nesting=False):
+        """Raw material cost (before wastage), as calculate_job would sum it."""
+        self._check_rates()
+        return self.material_cost_nested if use_nesting else self.material_cost
+
+    def material_items(self):
+        return [i for i in self.items if i.get('type') == 'material']
+
+    def calculate_job(self, engine, prod_hours=0.0, install_hours=0.0, travel_hours=0.0, installers=1,
+                      wastage_percent=0.0, markup=1.0, print_ready=False, repeat_job=False,
+                      design_hours=0.0, use_nesting=False):
+        """
+        Equivalent of engine.calculate_job over the accumulated items, without
+        rescanning them. The hour/installer arguments are the live inputs; the
+        additional labour items are added on top (installers takes the max).
+        """
+        return engine.price_totals(
+            self.material_total(use_nesting),
+            self.prod_hours + prod_hours,
+            self.install_hours + install_hours,
+            travel_hours=self.travel_hours + travel_hours,
+            installers=max(self.max_fitters, installers),
+            wastage_percent=wastage_percent,
+            markup=markup,
+            print_ready=print_ready,
+            repeat_job=repeat_job,
+            design_hours=design_hours,
+            use_nesting=use_nesting,
+        )
+
+    def __len__(self):
+        return len(self.items)
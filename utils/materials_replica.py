@@ -0,0 +1,190 @@
+"""
+Local Materials Replica
+In-memory copy of the Firestore 'materials' collection, kept current by a
+snapshot listener (or by polling a loader, for mock mode / emulators), so
+fetch_materials() reads never wait on the network.
+"""
+
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+ADDED, MODIFIED, REMOVED = "ADDED", "MODIFIED", "REMOVED"
+
+Delta = Tuple[str, str, Optional[Dict]]  # (change type, doc id, data)
+
+
+class MaterialsReplica:
+    """
+    Dict of material documents keyed by id, updated by add/modify/remove deltas.
+
+    `version` is bumped whenever an applied delta actually changes the data;
+    callbacks registered with on_change() run after each such change.
+    """
+
+    def __init__(self, loader: Callable[[], List[Dict]], collection=None, poll_interval: float = 30.0):
+        """
+        Args:
+            loader: Returns the full collection as dicts with an 'id' key (raises on failure)
+            collection: Firestore CollectionReference to listen to; None to poll `loader`
+            poll_interval: Seconds between polls when not listening
+        """
+        self._loader = loader
+        self._collection = collection
+        self.poll_interval = poll_interval
+        self.mode = "listen" if collection is not None else "poll"
+
+        self._docs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._watch = None
+        self._callbacks: List[Callable[[int], None]] = []
+
+        self.version = 0
+        self.deltas_applied = 0
+        self.last_change_at: Optional[datetime] = None
+        self.last_sync_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    # ── Lifecycle ────────────────────────────────────────────────────────────
+
+    def start(self) -> 'MaterialsReplica':
+        if self._watch is not None or self._thread is not None:
+            return self
+        self._stop.clear()
+        if self._collection is not None:
+            try:
+                self._watch = self._collection.on_snapshot(self._on_snapshot)
+                return self
+            except Exception as e:
+                # Listener unavailable (e.g. emulator without watch support): poll instead
+                self.last_error = f"on_snapshot failed, polling instead: {e}"
+                self.mode = "poll"
+        self._thread = threading.Thread(target=self._poll_loop, name="materials-replica", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception:
+                pass
+            self._watch = None
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the first full snapshot has been applied."""
+        return self._ready.wait(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def on_change(self, callback: Callable[[int], None]):
+        """Register `callback(version)`, called after every change to the data."""
+        self._callbacks.append(callback)
+
+    # ── Reads ────────────────────────────────────────────────────────────────
+
+    def snapshot(self) -> List[Dict]:
+        """Copies of every document, in the order they were first seen."""
+        with self._lock:
+            return [dict(d) for d in self._docs.values()]
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        with self._lock:
+            doc = self._docs.get(doc_id)
+            return dict(doc) if doc is not None else None
+
+    def info(self) -> Dict:
+        return {
+            'mode': self.mode,
+            'ready': self.ready,
+            'version': self.version,
+            'size': len(self._docs),
+            'deltas_applied': self.deltas_applied,
+            'last_change_at': self.last_change_at,
+            'last_sync_at': self.last_sync_at,
+            'last_error': self.last_error,
+        }
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ── Updates ──────────────────────────────────────────────────────────────
+
+    def apply(self, deltas: Iterable[Delta]) -> bool:
+        """Apply (type, id, data) deltas; returns True if anything changed."""
+        changed = False
+        with self._lock:
+            for kind, doc_id, data in deltas:
+                if kind == REMOVED:
+                    if self._docs.pop(doc_id, None) is not None:
+                        changed = True
+                        self.deltas_applied += 1
+                    continue
+                doc = dict(data or {})
+                doc['id'] = doc_id
+                if self._docs.get(doc_id) != doc:
+                    self._docs[doc_id] = doc
+                    changed = True
+                    self.deltas_applied += 1
+            self.last_sync_at = datetime.now()
+            if changed:
+                self.version += 1
+                self.last_change_at = self.last_sync_at
+                version = self.version
+        if changed:
+            for callback in list(self._callbacks):
+                callback(version)
+        # Readiness is signalled after the callbacks so waiters see the bumped versions
+        self._ready.set()
+        return changed
+
+    def resync(self) -> bool:
+        """Read the whole collection now and apply the difference; True if anything changed."""
+        try:
+            docs = self._loader()
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+        self.last_error = None
+        return self.apply(self.diff(docs))
+
+    def diff(self, docs: Iterable[Dict]) -> List[Delta]:
+        """Deltas that turn the replica into `docs` (a full collection read)."""
+        with self._lock:
+            current = dict(self._docs)
+        deltas = []
+        seen = set()
+        for d in docs:
+            doc_id = d.get('id')
+            if doc_id is None:
+                continue
+            seen.add(doc_id)
+            old = current.get(doc_id)
+            if old is None:
+                deltas.append((ADDED, doc_id, d))
+            elif old != d:
+                deltas.append((MODIFIED, doc_id, d))
+        deltas.extend((REMOVED, doc_id, None) for doc_id in current if doc_id not in seen)
+        return deltas
+
+    def _on_snapshot(self, col_snapshot, changes, read_time):
+        # Firestore calls this on its own thread; the first call lists every doc as ADDED
+        self.apply(
+            (change.type.name, change.document.id,
+             change.document.to_dict() if change.type.name != REMOVED else None)
+            for change in changes
+        )
+
+    def _poll_loop(self):
+        while not self._stop.is_set():
+            self.resync()
+            self._stop.wait(self.poll_interval)
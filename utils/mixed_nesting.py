@@ -0,0 +1,335 @@
+"""
+Mixed-Size Nesting for Wide-Format Printing
+Packs rectangles of different sizes (each with a quantity) onto one roll or
+onto repeated sheets, using a skyline bottom-left bin packer with rotation.
+"""
+
+import math
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.lru import LRUCache
+from utils.nesting_optimizer import geometry_key
+
+# Process-wide result cache, shared by every Streamlit session
+PACK_CACHE_SIZE = 128
+_PACK_CACHE = LRUCache(PACK_CACHE_SIZE)
+
+
+class MixedNestingOptimizer:
+    """
+    Heterogeneous counterpart to NestingOptimizer.calculate_nesting.
+
+    Spacing follows the single-size optimizer: each piece occupies its size plus
+    2 x bleed plus one gutter in each direction, and roll length includes the
+    trailing gutter.
+    """
+
+    @staticmethod
+    def pack(
+        pieces: Sequence[Dict],
+        material_width_cm: float,
+        material_length_cm: Optional[float] = None,
+        bleed_mm: float = 3.0,
+        gutter_mm: float = 5.0,
+        allow_rotation: bool = True
+    ) -> Dict:
+        """
+        Nest mixed pieces onto roll or sheet stock.
+
+        Args:
+            pieces: List of dicts with 'width_cm', 'height_cm', 'qty' (and an optional
+                    'label'); each entry's position in the list is its item index
+            material_width_cm: Roll or sheet width in cm
+            material_length_cm: Sheet length in cm (None for roll media)
+            bleed_mm: Bleed allowance in mm (added to each side)
+            gutter_mm: Gutter spacing between items in mm
+            allow_rotation: Allow pieces to be turned 90°
+
+        Returns:
+            Dictionary with placements, roll length or sheet count, areas,
+            efficiency and a per-item share of the total material area.
+            Results are memoized process-wide by geometry, so treat them as read-only.
+        """
+        key = (
+            tuple(geometry_key(p['width_cm'], p['height_cm'], int(p.get('qty', 1))) + (p.get('label'),)
+                  for p in pieces),
+            geometry_key(material_width_cm, material_length_cm or None, bleed_mm, gutter_mm),
+            bool(allow_rotation)
+        )
+        return _PACK_CACHE.get_or_compute(key, lambda: MixedNestingOptimizer._pack(
+            pieces, material_width_cm, material_length_cm, bleed_mm, gutter_mm, allow_rotation
+        ))
+
+    @staticmethod
+    def cache_info() -> Dict:
+        """Hit/miss counters of the shared packing cache."""
+        return _PACK_CACHE.info()
+
+    @staticmethod
+    def clear_cache():
+        _PACK_CACHE.clear()
+
+    @staticmethod
+    def _pack(pieces, material_width_cm, material_length_cm, bleed_mm, gutter_mm, allow_rotation) -> Dict:
+        """Uncached body of pack."""
+        bleed_cm = bleed_mm / 10.0
+        gutter_cm = gutter_mm / 10.0
+        sheet_w = float(material_width_cm)
+        sheet_l = float(material_length_cm) if material_length_cm else None
+
+        # Expand quantities into individual pieces (occupied size incl. bleed + gutter)
+        queue = []
+        used_by_item = [0.0] * len(pieces)
+        for idx, p in enumerate(pieces):
+            w = p['width_cm'] + 2 * bleed_cm
+            h = p['height_cm'] + 2 * bleed_cm
+            qty = int(p.get('qty', 1))
+            used_by_item[idx] = w * h * qty
+            queue.extend([(w + gutter_cm, h + gutter_cm, idx)] * qty)
+
+        # Tallest first (by longer side, then area) gives the skyline its best shot
+        queue.sort(key=lambda q: (max(q[0], q[1]), q[0] * q[1]), reverse=True)
+
+        sheets: List[_Skyline] = [_Skyline(sheet_w, sheet_l)]
+        # Largest square each sheet could still take: a piece whose shorter side
+        # is bigger cannot fit, so one vectorised comparison rules out full sheets
+        square = np.zeros(64)
+        square[0] = sheets[0].largest_square()
+        placements = []
+        oversize = set()
+        last_size, resume = None, 0
+        for w, h, idx in queue:
+            # Identical pieces are consecutive, and sheets only fill up: one that
+            # turned the previous copy away will turn this one away too
+            if (w, h) != last_size:
+                last_size, resume = (w, h), 0
+            placed = None
+            if sheet_l:
+                candidates = (np.flatnonzero(square[resume:len(sheets)] >= min(w, h) - 1e-9) + resume).tolist()
+            else:
+                candidates = [0]
+            for sheet_no in candidates:
+                sky = sheets[sheet_no]
+                if sky.fits(w, h, allow_rotation):
+                    placed = sky.place(w, h, allow_rotation)
+                    break
+            if placed is None and sheet_l:
+                sheets.append(_Skyline(sheet_w, sheet_l))
+                sheet_no = len(sheets) - 1
+                if sheet_no == len(square):
+                    square = np.concatenate([square, np.zeros(len(square))])
+                placed = sheets[sheet_no].place(w, h, allow_rotation)
+            if placed is None:
+                # Wider than the stock either way round: bill it in full-width strips
+                # (a roll is one continuous "sheet", so everything stays on sheets[0])
+                oversize.add(idx)
+                if not sheet_l:
+                    sheet_no = 0
+                placed = sheets[sheet_no].place_oversize(w, h)
+            square[sheet_no] = sheets[sheet_no].largest_square()
+            resume = sheet_no
+            x, y, pw, ph, rotated = placed
+            placements.append({
+                'item': idx,
+                'sheet': sheet_no,
+                'x_cm': x,
+                'y_cm': y,
+                'width_cm': pw - gutter_cm,
+                'height_cm': ph - gutter_cm,
+                'rotated': rotated
+            })
+
+        if sheet_l:
+            sheets_needed = len(sheets) if queue else 0
+            total_length = sheets_needed * sheet_l
+        else:
+            sheets_needed = 1  # Continuous roll
+            total_length = sheets[0].max_height()
+
+        total_area = sheet_w * total_length
+        used_area = sum(used_by_item)
+        waste_area = total_area - used_area
+        efficiency = (used_area / total_area * 100) if total_area > 0 else 0
+
+        total_area_m2 = total_area / 10000.0
+        per_item = [{
+            'item': idx,
+            'label': pieces[idx].get('label', f'Item {idx + 1}'),
+            'used_area_cm2': used_by_item[idx],
+            # Share of the nested material, in proportion to the area each item uses
+            'share_area_m2': (total_area_m2 * used_by_item[idx] / used_area) if used_area > 0 else 0.0
+        } for idx in range(len(pieces))]
+
+        return {
+            'placements': placements,
+            'pieces_placed': len(placements),
+            'material_width_cm': sheet_w,
+            'material_length_cm': total_length,
+            'sheet_length_cm': sheet_l,
+            'sheets_needed': sheets_needed,
+            'total_area_cm2': total_area,
+            'used_area_cm2': used_area,
+            'waste_area_cm2': waste_area,
+            'efficiency_percent': efficiency,
+            'total_area_m2': total_area_m2,
+            'per_item': per_item,
+            'oversize_items': sorted(oversize)
+        }
+
+
+class _Skyline:
+    """
+    Skyline of one roll/sheet: contiguous segments [x, x + w) at height y.
+    Pieces go at the position with the lowest resulting top edge, then leftmost.
+    """
+
+    __slots__ = ('width', 'length', 'xs', 'ys', 'ws', '_levels', '_runs')
+
+    def __init__(self, width: float, length: Optional[float]):
+        self.width = width
+        self.length = length
+        self.xs = [0.0]
+        self.ys = [0.0]
+        self.ws = [width]
+        self._levels = None   # distinct skyline heights, ascending (built lazily)
+        self._runs = None     # widest contiguous run at or below each level
+
+    def fits(self, w: float, h: float, allow_rotation: bool) -> bool:
+        """
+        Whether place() would succeed. A piece fits if some run of adjacent
+        segments, all low enough to leave h of headroom, is at least w wide.
+        """
+        if self.length is None:
+            return w <= self.width + 1e-9 or (allow_rotation and h <= self.width + 1e-9)
+        if self._run_below(self.length - h) >= w - 1e-9:
+            return True
+        return allow_rotation and self._run_below(self.length - w) >= h - 1e-9
+
+    def largest_square(self) -> float:
+        """Side of the largest square that still fits (unbounded on a roll)."""
+        if self.length is None:
+            return float('inf')
+        self._build_runs()
+        return max(min(run, self.length - level) for level, run in zip(self._levels, self._runs))
+
+    def _build_runs(self):
+        if self._levels is None:
+            self._levels = sorted(set(self.ys))
+            self._runs = []
+            for level in self._levels:
+                run = best = 0.0
+                for sy, sw in zip(self.ys, self.ws):
+                    run = run + sw if sy <= level + 1e-9 else 0.0
+                    if run > best:
+                        best = run
+                self._runs.append(best)
+
+    def _run_below(self, limit: float) -> float:
+        self._build_runs()
+        i = bisect_right(self._levels, limit + 1e-9)
+        return self._runs[i - 1] if i else 0.0
+
+    def max_height(self) -> float:
+        return max(self.ys)
+
+    def _fit(self, i: int, w: float) -> Optional[float]:
+        """Height at which a piece of width w rests if its left edge is at segment i."""
+        xs, ys, ws = self.xs, self.ys, self.ws
+        if xs[i] + w > self.width + 1e-9:
+            return None
+        y = ys[i]
+        remaining = w - ws[i]
+        j = i + 1
+        n = len(xs)
+        while remaining > 1e-9 and j < n:
+            if ys[j] > y:
+                y = ys[j]
+            remaining -= ws[j]
+            j += 1
+        return y
+
+    def _best(self, w: float, h: float):
+        best = None
+        for i in range(len(self.xs)):
+            y = self._fit(i, w)
+            if y is None:
+                # Segments only move right from here, so nothing further fits
+                break
+            top = y + h
+            if self.length is not None and top > self.length + 1e-9:
+                continue
+            if best is None or top < best[0] - 1e-9:
+                best = (top, i, y)
+        return best
+
+    def place(self, w: float, h: float, allow_rotation: bool):
+        best = self._best(w, h)
+        rotated = False
+        if allow_rotation and w != h:
+            alt = self._best(h, w)
+            if alt is not None and (best is None or alt[0] < best[0] - 1e-9
+                                    or (abs(alt[0] - best[0]) <= 1e-9 and self.xs[alt[1]] < self.xs[best[1]])):
+                best, rotated = alt, True
+        if best is None:
+            return None
+        if rotated:
+            w, h = h, w
+        _, i, y = best
+        x = self.xs[i]
+        self._add(x, y + h, w)
+        return x, y, w, h, rotated
+
+    def place_oversize(self, w: float, h: float):
+        """Lay a piece wider than the stock across the full width, on top of everything."""
+        if w > self.width and h <= self.width:
+            w, h = h, w
+            rotated = True
+        else:
+            rotated = False
+        y = self.max_height()
+        # Too wide even turned: it has to be tiled in strips laid end to end
+        strips = math.ceil(w / self.width - 1e-9)
+        if strips > 1 and math.ceil(h / self.width - 1e-9) * w < strips * h:
+            w, h, rotated = h, w, not rotated
+            strips = math.ceil(w / self.width - 1e-9)
+        self.xs, self.ys, self.ws = [0.0], [y + h * strips], [self.width]
+        self._levels = None
+        return 0.0, y, w, h, rotated
+
+    def _add(self, x: float, top: float, w: float):
+        """Raise the skyline over [x, x + w) to `top` and merge equal neighbours."""
+        xs, ys, ws = self.xs, self.ys, self.ws
+        end = x + w
+        new_xs, new_ys, new_ws = [], [], []
+        inserted = False
+        for sx, sy, sw in zip(xs, ys, ws):
+            s_end = sx + sw
+            if s_end <= x + 1e-9 or sx >= end - 1e-9:
+                if not inserted and sx >= end - 1e-9:
+                    new_xs.append(x); new_ys.append(top); new_ws.append(w)
+                    inserted = True
+                new_xs.append(sx); new_ys.append(sy); new_ws.append(sw)
+                continue
+            # Overlapping segment: keep any uncovered parts either side
+            if sx < x - 1e-9:
+                new_xs.append(sx); new_ys.append(sy); new_ws.append(x - sx)
+            if not inserted:
+                new_xs.append(x); new_ys.append(top); new_ws.append(w)
+                inserted = True
+            if s_end > end + 1e-9:
+                new_xs.append(end); new_ys.append(sy); new_ws.append(s_end - end)
+        if not inserted:
+            new_xs.append(x); new_ys.append(top); new_ws.append(w)
+
+        # Merge neighbours at the same height
+        mx, my, mw = [new_xs[0]], [new_ys[0]], [new_ws[0]]
+        for sx, sy, sw in zip(new_xs[1:], new_ys[1:], new_ws[1:]):
+            if abs(sy - my[-1]) <= 1e-9:
+                mw[-1] += sw
+            else:
+                mx.append(sx); my.append(sy); mw.append(sw)
+        self.xs, self.ys, self.ws = mx, my, mw
+        self._levels = None
@@ -4,7 +4,21 @@ Maximizes yield from roll/sheet media to minimize waste and cost
 """
 
 import math
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Sequence
+
+import numpy as np
+
+from utils.lru import LRUCache
+
+# Process-wide result cache, shared by every Streamlit session
+NESTING_CACHE_SIZE = 1024
+_NESTING_CACHE = LRUCache(NESTING_CACHE_SIZE)
+
+
+def geometry_key(*values) -> Tuple:
+    """Normalise floats (6 dp) so 155 and 155.0000000001 share a cache entry."""
+    return tuple(None if v is None else round(float(v), 6) for v in values)
+
 
 class NestingOptimizer:
     """
@@ -41,7 +55,8 @@ class NestingOptimizer:
         material_width_cm: float,
         material_length_cm: Optional[float] = None,
         bleed_mm: float = 3.0,
-        gutter_mm: float = 5.0
+        gutter_mm: float = 5.0,
+        orientation: Optional[str] = None
     ) -> Dict:
         """
         Calculate optimal nesting layout for Rectangle items.
@@ -54,11 +69,42 @@ class NestingOptimizer:
             material_length_cm: Available material length in cm (None for roll media)
             bleed_mm: Bleed allowance in mm (added to each side)
             gutter_mm: Gutter spacing between items in mm
+            orientation: 'Portrait' or 'Landscape' to use as the best layout, e.g.
+                the orientation StockCatalog.select() priced; None picks the
+                minimum-waste one
             
         Returns:
-            Dictionary containing nesting analysis and recommendations
+            Dictionary containing nesting analysis and recommendations.
+            Results are memoized process-wide by geometry, so treat them as read-only.
         """
-        
+        key = geometry_key(item_width_cm, item_height_cm, quantity, material_width_cm,
+                           material_length_cm, bleed_mm, gutter_mm) + (orientation,)
+        return _NESTING_CACHE.get_or_compute(key, lambda: NestingOptimizer._calculate_nesting(
+            item_width_cm, item_height_cm, quantity, material_width_cm,
+            material_length_cm, bleed_mm, gutter_mm, orientation
+        ))
+
+    @staticmethod
+    def cache_info() -> Dict:
+        """Hit/miss counters of the shared nesting result cache."""
+        return _NESTING_CACHE.info()
+
+    @staticmethod
+    def clear_cache():
+        _NESTING_CACHE.clear()
+
+    @staticmethod
+    def _calculate_nesting(
+        item_width_cm: float,
+        item_height_cm: float,
+        quantity: int,
+        material_width_cm: float,
+        material_length_cm: Optional[float],
+        bleed_mm: float,
+        gutter_mm: float,
+        orientation: Optional[str] = None
+    ) -> Dict:
+        """Uncached body of calculate_nesting."""
         # Add bleed to item dimensions
         bleed_cm = bleed_mm / 10.0
         gutter_cm = gutter_mm / 10.0
@@ -83,8 +129,11 @@ class NestingOptimizer:
         )
         layouts.append(landscape)
         
-        # Find best layout (minimum waste)
-        best_layout = min(layouts, key=lambda x: x['waste_area_cm2'])
+        # Find best layout (minimum waste), unless the caller fixed the orientation
+        if orientation is None:
+            best_layout = min(layouts, key=lambda x: x['waste_area_cm2'])
+        else:
+            best_layout = portrait if orientation == 'Portrait' else landscape
         
         # Calculate waste comparison vs individual pricing
         individual_waste = NestingOptimizer._calculate_individual_waste(
@@ -111,6 +160,108 @@ class NestingOptimizer:
             }
         }
     
+    @staticmethod
+    def stock_options(roll_widths_cm: Sequence[float] = (MAX_VINYL_WIDTH,),
+                      sheet_sizes_cm: Sequence[Tuple[float, float]] = tuple(HOARDING_PANEL_SIZES)) -> Dict:
+        """
+        Candidate stocks for evaluate_stock_grid: roll widths (length NaN) followed
+        by sheet sizes (width, length).
+        """
+        widths = [float(w) for w in roll_widths_cm] + [float(w) for w, _ in sheet_sizes_cm]
+        lengths = [np.nan] * len(roll_widths_cm) + [float(l) for _, l in sheet_sizes_cm]
+        labels = [f"Roll {w:.1f}cm" for w in roll_widths_cm] + \
+                 [f"Sheet {w:.1f}x{l:.1f}cm" for w, l in sheet_sizes_cm]
+        return {'widths_cm': np.array(widths), 'lengths_cm': np.array(lengths), 'labels': labels}
+
+    @staticmethod
+    def evaluate_stock_grid(
+        item_widths_cm: Sequence[float],
+        item_heights_cm: Sequence[float],
+        quantities: Sequence[int],
+        stock_widths_cm: Sequence[float],
+        stock_lengths_cm: Optional[Sequence[float]] = None,
+        bleed_mm: float = 3.0,
+        gutter_mm: float = 5.0
+    ) -> Dict:
+        """
+        Vectorized _calculate_layout over every item x stock x orientation.
+
+        Args:
+            item_widths_cm / item_heights_cm / quantities: One entry per item
+            stock_widths_cm: One entry per candidate stock (roll or sheet width)
+            stock_lengths_cm: Sheet length per stock; NaN, 0 or None for roll media
+                              (None means every stock is a roll)
+            bleed_mm: Bleed allowance in mm (added to each side)
+            gutter_mm: Gutter spacing between items in mm
+
+        Returns:
+            Dictionary of arrays shaped (items, stocks, 2) - orientation 0 is
+            Portrait, 1 is Landscape - for items_across, items_down,
+            items_per_sheet, sheets_needed, material_length_cm, total_area_cm2,
+            used_area_cm2, waste_area_cm2 and efficiency_percent, plus per-item
+            best_stock / best_orientation (minimum waste, ties resolved like
+            calculate_nesting), best_waste_cm2 and best_total_area_m2.
+        """
+        bleed_cm = bleed_mm / 10.0
+        gutter = gutter_mm / 10.0
+
+        w = np.asarray(item_widths_cm, dtype=float) + (2 * bleed_cm)
+        h = np.asarray(item_heights_cm, dtype=float) + (2 * bleed_cm)
+        qty = np.asarray(quantities, dtype=float)[:, None, None]
+        sheet_w = np.asarray(stock_widths_cm, dtype=float)[None, :, None]
+        if stock_lengths_cm is None:
+            sheet_l = np.full(sheet_w.shape, np.nan)
+        else:
+            sheet_l = np.asarray(stock_lengths_cm, dtype=float)[None, :, None]
+        is_roll = ~(sheet_l > 0)  # NaN or 0 -> roll
+
+        # (items, 1, 2): orientation 0 as-is, 1 rotated
+        item_w = np.stack([w, h], axis=-1)[:, None, :]
+        item_h = np.stack([h, w], axis=-1)[:, None, :]
+
+        items_across = np.maximum(1, np.floor(sheet_w / (item_w + gutter)))
+
+        # Roll media - length needed
+        roll_down = np.ceil(qty / items_across)
+        roll_length = (roll_down * item_h) + ((roll_down - 1) * gutter) + gutter
+
+        # Sheet media - whole sheets needed
+        with np.errstate(invalid='ignore'):
+            sheet_down = np.maximum(1, np.floor(sheet_l / (item_h + gutter)))
+        sheet_per = items_across * sheet_down
+        sheets = np.ceil(qty / sheet_per)
+
+        items_down = np.where(is_roll, roll_down, sheet_down)
+        sheets_needed = np.where(is_roll, 1, sheets)
+        total_length = np.where(is_roll, roll_length, sheets * sheet_l)
+
+        total_area = sheet_w * total_length
+        used_area = qty * (item_w * item_h)
+        waste_area = total_area - used_area
+        with np.errstate(divide='ignore', invalid='ignore'):
+            efficiency = np.where(total_area > 0, used_area / total_area * 100, 0.0)
+
+        flat_waste = waste_area.reshape(len(w), -1)
+        best = np.argmin(flat_waste, axis=1)
+        best_stock, best_orientation = np.divmod(best, 2)
+        rows = np.arange(len(w))
+
+        return {
+            'items_across': items_across.astype(int),
+            'items_down': items_down.astype(int),
+            'items_per_sheet': (items_across * items_down).astype(int),
+            'sheets_needed': sheets_needed.astype(int),
+            'material_length_cm': total_length,
+            'total_area_cm2': total_area,
+            'used_area_cm2': np.broadcast_to(used_area, total_area.shape),
+            'waste_area_cm2': waste_area,
+            'efficiency_percent': efficiency,
+            'best_stock': best_stock,
+            'best_orientation': best_orientation,
+            'best_waste_cm2': flat_waste[rows, best],
+            'best_total_area_m2': total_area.reshape(len(w), -1)[rows, best] / 10000.0
+        }
+
     @staticmethod
     def _calculate_layout(
         item_width: float,
@@ -0,0 +1,336 @@
+"""
+Batch Cost Report Export
+Renders the cost report of many saved jobs at once, across a process pool,
+into a single ZIP (one PDF per job) or one combined multi-job PDF. Jobs are
+consumed lazily, only a few renders are in flight at a time and finished
+reports are streamed to the output, so memory stays bounded however long
+the history is.
+
+    report = export_jobs_zip(iter_jobs(filters), "reports.zip", progress=print)
+"""
+
+import hashlib
+import os
+import re
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Callable, Dict, Iterable, Optional
+
+from utils.pdf_gen import CostReportPDF, add_quote_report, generate_quote_pdf, write_pdf_output
+
+# progress(done, total, name): total is None when the job source has no length
+Progress = Callable[[int, Optional[int], str], None]
+
+IN_FLIGHT_PER_WORKER = 2   # queued renders per worker (bounds pending job data and PDF bytes)
+POOL_MIN_JOBS = 20         # fewer known jobs render in-process (pool start-up costs more)
+
+
+def default_workers() -> int:
+    return max(1, min(4, (os.cpu_count() or 1) - 1))
+
+
+# ── Job documents → render arguments ─────────────────────────────────────────
+
+def _plain_datetime(value) -> datetime:
+    """Saved created_at as a plain datetime (Firestore / SQLite / mock all differ)."""
+    if isinstance(value, datetime):
+        return datetime(*value.timetuple()[:6])
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value[:19])
+        except ValueError:
+            pass
+    return datetime.now()
+
+
+def _saved_labour_hours(job: Dict) -> Dict:
+    """
+    Labour totals for the report. Jobs saved before the Calculator stored its
+    live hours only have the extra labour lines, so those are summed instead.
+    """
+    if job.get('labour_hours'):
+        return dict(job['labour_hours'])
+    hours = {'prod': 0.0, 'inst': 0.0, 'trav': 0.0, 'fitters': 1}
+    for item in job.get('items') or []:
+        raw = item.get('raw_labor') if item.get('type') == 'labor' else None
+        if raw:
+            hours['prod'] += raw.get('prod', 0)
+            hours['inst'] += raw.get('inst', 0)
+            hours['trav'] += raw.get('trav', 0)
+            hours['fitters'] = max(hours['fitters'], raw.get('fit', 1))
+    return hours
+
+
+def job_pdf_args(job: Dict) -> Dict:
+    """Keyword arguments for generate_quote_pdf() from a saved job document (all picklable)."""
+    return {
+        'client_info': dict(job.get('client') or {}),
+        'items': [{k: v for k, v in item.items() if k != 'nesting_result'} for item in job.get('items') or []],
+        'results': dict(job.get('results') or {}),
+        'markup': job.get('markup', 1.0),
+        'created_by': job.get('created_by', 'Unknown'),
+        'timestamp': _plain_datetime(job.get('created_at')),
+        'labour_hours': _saved_labour_hours(job),
+    }
+
+
+def job_pdf_name(job: Dict, used: set) -> str:
+    """DanielSigns_Quote_<Client>_<date>_<id>.pdf, unique within `used` (which it updates)."""
+    client = re.sub(r'[^A-Za-z0-9_-]', '', ((job.get('client') or {}).get('name') or 'Job').replace(' ', '_'))
+    date = _plain_datetime(job.get('created_at')).strftime('%Y%m%d')
+    base = f"DanielSigns_Quote_{client or 'Job'}_{date}_{str(job.get('id') or '')[:8]}".rstrip('_')
+    name, n = f"{base}.pdf", 1
+    while name in used:
+        n += 1
+        name = f"{base}_{n}.pdf"
+    used.add(name)
+    return name
+
+
+def _render_job(args: Dict) -> bytes:
+    # Top-level so the process pool can pickle it
+    return generate_quote_pdf(**args)
+
+
+def _layout_job(args: Dict) -> CostReportPDF:
+    pdf = CostReportPDF()
+    add_quote_report(pdf, **args)
+    return pdf
+
+
+def _raise(error: Exception):
+    def render():
+        raise error
+    return render
+
+
+def _renders(jobs: Iterable[Dict], workers: int, layout: Callable[[Dict], object]):
+    """
+    Yield (job, file name, render) in job order, where render() returns the
+    job's report (layout(args) in this process, PDF bytes from the pool) or
+    raises. A job too malformed to turn into render arguments gets a render()
+    that raises, so callers record it like any other failed job.
+    """
+    used = set()
+
+    def prepared():
+        for job in jobs:
+            try:
+                yield job, job_pdf_name(job, used), job_pdf_args(job), None
+            except Exception as e:
+                yield job, f"job {job.get('id')}", None, e
+
+    if workers == 1:
+        for job, name, args, error in prepared():
+            yield job, name, _raise(error) if error else (lambda args=args: layout(args))
+        return
+
+    # spawn, not fork: the Streamlit server process is multi-threaded
+    with ProcessPoolExecutor(workers, mp_context=get_context('spawn')) as pool:
+        pending = deque()
+        for job, name, args, error in prepared():
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                yield pending.popleft()
+            pending.append((job, name, _raise(error) if error else pool.submit(_render_job, args).result))
+        while pending:
+            yield pending.popleft()
+
+
+def _pool_size(jobs, max_workers: Optional[int]) -> int:
+    total = len(jobs) if hasattr(jobs, '__len__') else None
+    if total is not None and total < POOL_MIN_JOBS:
+        return 1
+    return max_workers or default_workers()
+
+
+# ── Combined PDF writer ──────────────────────────────────────────────────────
+
+_OBJ_RE = re.compile(rb'(\d+) 0 obj\s*')
+_REF_RE = re.compile(rb'(\d+) 0 R')
+_STREAM_RE = re.compile(rb'>>\s*stream\r?\n')
+
+
+class _CombinedPDF:
+    """
+    Concatenates finished single-job PDFs (as generate_quote_pdf() writes
+    them) into one document written straight to `dest`. Each job's objects
+    are renumbered and written as soon as the job is added, so only one job
+    is in memory at a time; its pages are re-parented onto one shared page
+    tree (object 1) that close() writes with the catalog, xref and trailer.
+    """
+
+    def __init__(self, dest):
+        self._own = isinstance(dest, (str, os.PathLike))
+        self._out = open(dest, 'wb') if self._own else dest
+        self._sha = hashlib.sha256()
+        self._size = 0
+        self._offsets = {}      # object id -> byte offset in the output
+        self._kids = []         # page object ids, in order
+        self._next_id = 3       # 1 = page tree, 2 = catalog
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data: bytes):
+        self._out.write(data)
+        self._sha.update(data)
+        self._size += len(data)
+
+    def _write_object(self, obj_id: int, body: bytes):
+        self._offsets[obj_id] = self._size
+        self._write(b'%d 0 obj\n' % obj_id + body + b'\nendobj\n')
+
+    @staticmethod
+    def _objects(pdf: bytes) -> Dict[int, bytes]:
+        """{id: body} from the classic xref table fpdf2 writes (body excludes obj/endobj)."""
+        xref = int(pdf[pdf.rindex(b'startxref') + 9:].split()[0])
+        head = re.match(rb'xref\s+0 (\d+)\s+', pdf[xref:])
+        table = pdf[xref + head.end():]
+        offsets = sorted((int(table[20 * n:20 * n + 10]), n) for n in range(1, int(head.group(1))))
+        objects = {}
+        for i, (start, n) in enumerate(offsets):
+            end = offsets[i + 1][0] if i + 1 < len(offsets) else xref
+            chunk = pdf[start:end].rstrip()
+            match = _OBJ_RE.match(chunk)
+            if match is None or int(match.group(1)) != n or not chunk.endswith(b'endobj'):
+                raise ValueError(f"Unexpected PDF object layout at offset {start}")
+            objects[n] = chunk[match.end():-len(b'endobj')].rstrip()
+        return objects
+
+    def add(self, pdf: bytes) -> int:
+        """Append every page of a finished PDF; returns the number of pages added."""
+        objects = self._objects(pdf)
+        trailer = pdf[pdf.rindex(b'trailer'):]
+        root = int(re.search(rb'/Root (\d+) 0 R', trailer).group(1))
+        info = re.search(rb'/Info (\d+) 0 R', trailer)
+        pages = int(re.search(rb'/Pages (\d+) 0 R', objects[root]).group(1))
+        tree = objects[pages]
+        kids = [int(k) for k in _REF_RE.findall(re.search(rb'/Kids \[(.*?)\]', tree, re.S).group(1))]
+        media = re.search(rb'/MediaBox \[[^\]]*\]', tree)
+
+        # Everything but this job's own page tree, catalog and info is copied
+        skip = {root, pages} | ({int(info.group(1))} if info else set())
+        ids = {n: self._next_id + i for i, n in enumerate(n for n in sorted(objects) if n not in skip)}
+        ids[pages] = 1
+
+        def renumber(match):
+            return b'%d 0 R' % ids[int(match.group(1))]
+
+        # Renumber everything before writing anything, so a bad document adds nothing
+        bodies = []
+        for n, new_id in ids.items():
+            if n == pages:
+                continue
+            body = objects[n]
+            # References only occur in the dictionary, never inside a stream
+            split = _STREAM_RE.search(body)
+            head, stream = (body, b'') if split is None else (body[:split.start() + 2], body[split.start() + 2:])
+            head = _REF_RE.sub(renumber, head)
+            if n in kids and media is not None and b'/MediaBox' not in head:
+                head = head.replace(b'<<', b'<<\n' + media.group(0), 1)
+            bodies.append((new_id, head + stream))
+
+        for new_id, body in bodies:
+            self._write_object(new_id, body)
+        self._next_id += len(bodies)
+        self._kids += [ids[k] for k in kids]
+        return len(kids)
+
+    def close(self) -> Dict:
+        """Write the page tree, catalog, info, xref and trailer. Returns {'bytes', 'sha256'}."""
+        kids = b'\n'.join(b'%d 0 R' % k for k in self._kids)
+        self._write_object(1, b'<<\n/Count %d\n/Kids [%s]\n/Type /Pages\n>>' % (len(self._kids), kids))
+        self._write_object(2, b'<<\n/Pages 1 0 R\n/Type /Catalog\n>>')
+        info_id = self._next_id
+        stamp = datetime.now().strftime('D:%Y%m%d%H%M%S').encode()
+        self._write_object(info_id, b'<<\n/CreationDate (%s)\n/Producer (Daniel Signs)\n>>' % stamp)
+
+        xref = self._size
+        lines = [b'xref\n0 %d\n' % (info_id + 1), b'0000000000 65535 f \n']
+        lines += [b'%010d 00000 n \n' % self._offsets[n] for n in range(1, info_id + 1)]
+        lines.append(b'trailer\n<<\n/Size %d\n/Root 2 0 R\n/Info %d 0 R\n>>\nstartxref\n%d\n%%%%EOF\n'
+                     % (info_id + 1, info_id, xref))
+        self._write(b''.join(lines))
+        if self._own:
+            self._out.close()
+        return {'bytes': self._size, 'sha256': self._sha.hexdigest()}
+
+
+# ── Exporters ────────────────────────────────────────────────────────────────
+
+def _report(jobs_done: int, errors, started: float, size: int) -> Dict:
+    return {'jobs': jobs_done, 'written': jobs_done - len(errors), 'errors': errors,
+            'seconds': time.perf_counter() - started, 'bytes': size}
+
+
+def export_jobs_zip(jobs: Iterable[Dict], dest, max_workers: Optional[int] = None,
+                    progress: Optional[Progress] = None) -> Dict:
+    """
+    Render every job's cost report into a ZIP, one PDF per job.
+
+    Args:
+        jobs: Saved job documents (a list, or a generator such as db.iter_jobs())
+        dest: Output path or writable binary file object
+        max_workers: Render processes (1, or fewer than POOL_MIN_JOBS jobs,
+                     renders in this process)
+        progress: Called after each job as progress(done, total, file_name)
+
+    Returns:
+        {'jobs', 'written', 'errors': [{'id', 'error'}], 'seconds', 'bytes'}
+    """
+    total = len(jobs) if hasattr(jobs, '__len__') else None
+    started = time.perf_counter()
+    errors = []
+    done = 0
+
+    # PDFs are already deflate-compressed, so members are stored as-is
+    with zipfile.ZipFile(dest, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for job, name, render in _renders(jobs, _pool_size(jobs, max_workers), _layout_job):
+            try:
+                out = render()
+                if isinstance(out, CostReportPDF):
+                    # Laid out in this process: stream fpdf2's buffer straight into the member
+                    with zf.open(name, 'w') as member:
+                        write_pdf_output(out, member)
+                else:
+                    zf.writestr(name, out)
+            except Exception as e:
+                errors.append({'id': job.get('id'), 'error': str(e)})
+            done += 1
+            if progress:
+                progress(done, total, name)
+
+    size = os.path.getsize(dest) if isinstance(dest, (str, os.PathLike)) else dest.tell()
+    return _report(done, errors, started, size)
+
+
+def export_jobs_pdf(jobs: Iterable[Dict], dest, max_workers: Optional[int] = None,
+                    progress: Optional[Progress] = None) -> Dict:
+    """
+    Render every job's cost report into one combined PDF, each job starting
+    on a new page. Each job is laid out once, as its own document (across
+    the process pool, like the ZIP export), and its pages are appended to
+    `dest` as soon as it is finished, so a job that fails leaves nothing
+    behind and only one job is held in memory. Page numbers restart per job.
+
+    Args / Returns as for export_jobs_zip() (`progress` gets the client name),
+    plus the PDF's 'sha256'.
+    """
+    total = len(jobs) if hasattr(jobs, '__len__') else None
+    started = time.perf_counter()
+    combined = _CombinedPDF(dest)
+    errors = []
+    done = 0
+    for job, _, render in _renders(jobs, _pool_size(jobs, max_workers), _render_job):
+        try:
+            combined.add(render())
+        except Exception as e:
+            errors.append({'id': job.get('id'), 'error': str(e)})
+        done += 1
+        if progress:
+            progress(done, total, (job.get('client') or {}).get('name') or 'Job')
+
+    written = combined.close()
+    return dict(_report(done, errors, started, written['bytes']), sha256=written['sha256'])
@@ -1,5 +1,13 @@
-from fpdf import FPDF
+import hashlib
+import json
+import os
 from datetime import datetime
+from functools import lru_cache
+
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+from utils.lru import LRUCache
 
 
 # ── Unicode sanitiser ─────────────────────────────────────────────────────────
@@ -26,19 +34,72 @@ _UNICODE_MAP = {
     '\u00e4': 'a',                   # a with umlaut
 }
 
+_UNICODE_CHARS = frozenset(_UNICODE_MAP)
+
+
+@lru_cache(maxsize=2048)
+def _latin1(s):
+    # Replace only the mapped characters present (str.translate with a dict
+    # table does a lookup per character and measured slower on long rows)
+    for ch in _UNICODE_CHARS.intersection(s):
+        s = s.replace(ch, _UNICODE_MAP[ch])
+    # Drop any remaining non-Latin-1 characters rather than crashing
+    return s.encode('latin-1', errors='replace').decode('latin-1')
+
+
 def safe(text):
     """Convert any value to a Latin-1-safe string for fpdf Helvetica rendering."""
     s = str(text) if text is not None else ''
-    for ch, rep in _UNICODE_MAP.items():
-        s = s.replace(ch, rep)
-    # Drop any remaining non-Latin-1 characters rather than crashing
-    return s.encode('latin-1', errors='replace').decode('latin-1')
+    # Most cells are plain ASCII and need no mapping
+    if s.isascii():
+        return s
+    return _latin1(s)
+
+
+# ── Text widths ───────────────────────────────────────────────────────────────
+# Right-aligned / centred cells need their text measured. The labels, headings
+# and common amounts repeat in every report, so widths are kept per process.
+
+TEXT_WIDTH_CACHE_SIZE = 4096
+_TEXT_WIDTHS = LRUCache(TEXT_WIDTH_CACHE_SIZE)
 
 
 # ── PDF Class ─────────────────────────────────────────────────────────────────
 
 class CostReportPDF(FPDF):
 
+    def text_cell(self, w, h, text='', align='L', fill=False, border=0, next_line=False):
+        """
+        Same output as cell() for this report's single-line cells (fill,
+        bottom border, L/R/C alignment) drawn with rect/line/text, which skip
+        cell()'s per-call text shaping and cost about half as much. A cell
+        that would break the page goes through cell(), which handles the break.
+        """
+        if self.will_page_break(h):
+            if next_line:
+                return self.cell(w, h, text, align=align, fill=fill, border=border,
+                                 new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            return self.cell(w, h, text, align=align, fill=fill, border=border)
+        x, y = self.x, self.y
+        if w == 0:
+            w = self.w - self.r_margin - x
+        if fill:
+            self.rect(x, y, w, h, 'F')
+        if border == 'B':
+            self.line(x, y + h, x + w, y + h)
+        if text:
+            if align == 'L':
+                dx = self.c_margin
+            else:
+                key = (self.font_family, self.font_style, self.font_size_pt, text)
+                tw = _TEXT_WIDTHS.get_or_compute(key, lambda: self.get_string_width(text))
+                dx = w - self.c_margin - tw if align == 'R' else (w - tw) / 2
+            self.text(x + dx, y + 0.5 * h + 0.3 * self.font_size, text)
+        if next_line:
+            self.set_xy(self.l_margin, y + h)
+        else:
+            self.x = x + w
+
     def header(self):
         # Dark red brand bar at top
         self.set_fill_color(30, 30, 30)
@@ -48,16 +109,16 @@ class CostReportPDF(FPDF):
         # Left: Company name
         self.set_font('helvetica', 'B', 20)
         self.set_text_color(245, 158, 11)          # orange
-        self.cell(110, 9, 'DANIEL SIGNS', ln=0)
+        self.text_cell(110, 9, 'DANIEL SIGNS')
 
         # Right: Document type - clearly internal
         self.set_font('helvetica', 'B', 11)
         self.set_text_color(180, 50, 50)           # dark red
-        self.cell(0, 9, 'INTERNAL COST REPORT', ln=1, align='R')
+        self.text_cell(0, 9, 'INTERNAL COST REPORT', align='R', next_line=True)
 
         self.set_font('helvetica', '', 9)
         self.set_text_color(130, 130, 130)
-        self.cell(0, 5, 'CONFIDENTIAL - Not for client distribution', ln=1, align='R')
+        self.text_cell(0, 5, 'CONFIDENTIAL - Not for client distribution', align='R', next_line=True)
 
         self.ln(4)
         self.set_draw_color(200, 200, 200)
@@ -70,10 +131,10 @@ class CostReportPDF(FPDF):
         self.line(10, self.get_y(), 200, self.get_y())
         self.set_font('helvetica', 'I', 7.5)
         self.set_text_color(160, 160, 160)
-        self.cell(0, 8,
-                  safe(f'INTERNAL - Daniel Signs Cost Report  |  Page {self.page_no()}  |  '
-                  f'Generated {datetime.now().strftime("%d/%m/%Y %H:%M")}'),
-                  align='C')
+        self.text_cell(0, 8,
+                       safe(f'INTERNAL - Daniel Signs Cost Report  |  Page {self.page_no()}  |  '
+                       f'Generated {datetime.now().strftime("%d/%m/%Y %H:%M")}'),
+                       align='C')
 
     # ── Shared helpers ────────────────────────────────────────────────────────
 
@@ -81,7 +142,7 @@ class CostReportPDF(FPDF):
         self.set_fill_color(*bg)
         self.set_text_color(*text_color)
         self.set_font('helvetica', 'B', 10)
-        self.cell(0, 7, safe(f'  {title}'), ln=1, fill=True, border=0)
+        self.text_cell(0, 7, safe(f'  {title}'), fill=True, next_line=True)
         self.set_text_color(0, 0, 0)
         self.ln(1)
 
@@ -93,8 +154,8 @@ class CostReportPDF(FPDF):
         for i, (label, w) in enumerate(cols):
             align = 'R' if i > 0 else 'L'
             s = safe(label)
-            self.cell(w, 7, f'  {s}' if align == 'L' else s, fill=True, align=align, border=0)
-        self.ln()
+            self.text_cell(w, 7, f'  {s}' if align == 'L' else s, fill=True, align=align)
+        self.ln(7)
         self.set_text_color(30, 30, 30)
 
     def table_row(self, values, widths, row_idx=0, bold=False):
@@ -105,27 +166,57 @@ class CostReportPDF(FPDF):
         for i, (val, w) in enumerate(zip(values, widths)):
             align = 'R' if i > 0 else 'L'
             s = safe(val)
-            self.cell(w, 6, f'  {s}' if align == 'L' else f'{s}  ', fill=True, border='B', align=align)
-        self.ln()
+            self.text_cell(w, 6, f'  {s}' if align == 'L' else f'{s}  ', fill=True, border='B', align=align)
+        self.ln(6)
 
     def kv(self, label, value, label_w=100, bold_val=False):
         self.set_font('helvetica', '', 9.5)
         self.set_text_color(80, 80, 80)
-        self.cell(label_w, 6, safe(label))
+        self.text_cell(label_w, 6, safe(label))
         self.set_font('helvetica', 'B' if bold_val else '', 9.5)
         self.set_text_color(20, 20, 20)
-        self.cell(0, 6, safe(value), ln=1)
+        self.text_cell(0, 6, safe(value), next_line=True)
         self.set_text_color(0, 0, 0)
 
     def big_total_row(self, label, value, color=(40, 40, 40), text_color=(255, 255, 255)):
         self.set_fill_color(*color)
         self.set_text_color(*text_color)
         self.set_font('helvetica', 'B', 12)
-        self.cell(130, 11, safe(f'  {label}'), fill=True)
-        self.cell(60, 11, safe(f'{value}  '), fill=True, align='R', ln=1)
+        self.text_cell(130, 11, safe(f'  {label}'), fill=True)
+        self.text_cell(60, 11, safe(f'{value}  '), fill=True, align='R', next_line=True)
         self.set_text_color(0, 0, 0)
 
 
+class ClientQuotePDF(CostReportPDF):
+    """Client-facing quotation: same helpers and branding, no internal markings."""
+
+    def header(self):
+        self.set_fill_color(30, 30, 30)
+        self.rect(0, 0, 210, 4, 'F')
+        self.ln(6)
+
+        self.set_font('helvetica', 'B', 20)
+        self.set_text_color(245, 158, 11)          # orange
+        self.text_cell(110, 9, 'DANIEL SIGNS')
+
+        self.set_font('helvetica', 'B', 11)
+        self.set_text_color(30, 30, 30)
+        self.text_cell(0, 9, 'QUOTATION', align='R', next_line=True)
+
+        self.ln(4)
+        self.set_draw_color(200, 200, 200)
+        self.line(10, self.get_y(), 200, self.get_y())
+        self.ln(4)
+
+    def footer(self):
+        self.set_y(-13)
+        self.set_draw_color(220, 220, 220)
+        self.line(10, self.get_y(), 200, self.get_y())
+        self.set_font('helvetica', 'I', 7.5)
+        self.set_text_color(160, 160, 160)
+        self.text_cell(0, 8, f'Daniel Signs Quotation  |  Page {self.page_no()}', align='C')
+
+
 # ── Public entry point ─────────────────────────────────────────────────────────
 
 def generate_quote_pdf(client_info, items, results, markup,
@@ -145,10 +236,149 @@ def generate_quote_pdf(client_info, items, results, markup,
     labour_hours : dict | None  - {prod, inst, trav, design, fitters}
                                   (hours aren't echoed by the engine so passed separately)
     """
+    pdf = CostReportPDF()
+    add_quote_report(pdf, client_info, items, results, markup,
+                     created_by=created_by, timestamp=timestamp, labour_hours=labour_hours)
+    return bytes(pdf.output())
+
+
+def write_quote_pdf(dest, client_info, items, results, markup,
+                    created_by='Unknown', timestamp=None, labour_hours=None):
+    """
+    generate_quote_pdf() written straight to `dest` instead of returned, so
+    no bytes copy of the document is made.
+
+    Parameters
+    ----------
+    dest : str | PathLike | binary stream - file path, or anything with write()
+           (an open file, a socket's makefile('wb'), a ZIP member, ...)
+    Others as for generate_quote_pdf().
+
+    Returns {'bytes': size, 'sha256': hex digest} of the written PDF.
+    """
+    pdf = CostReportPDF()
+    add_quote_report(pdf, client_info, items, results, markup,
+                     created_by=created_by, timestamp=timestamp, labour_hours=labour_hours)
+    return write_pdf_output(pdf, dest)
+
+
+def write_pdf_output(pdf, dest):
+    """
+    Serialise a finished FPDF document into `dest` (path or binary stream)
+    from fpdf2's single output buffer. Returns {'bytes', 'sha256'}.
+    """
+    buf = pdf.output()
+    if isinstance(dest, (str, os.PathLike)):
+        with open(dest, 'wb') as f:
+            f.write(buf)
+    else:
+        dest.write(buf)
+    return {'bytes': len(buf), 'sha256': hashlib.sha256(buf).hexdigest()}
+
+
+def generate_client_quote_pdf(client_info, items, results, markup,
+                              created_by='Unknown', timestamp=None, labour_hours=None):
+    """
+    Generate the client-facing quotation PDF: items, sizes and selling prices
+    only (no costs, markup or profit). Parameters as for generate_quote_pdf().
+    """
+    pdf = ClientQuotePDF()
+    draw_client_quote(pdf, report_rows(client_info, items, results, markup,
+                                       created_by, timestamp, labour_hours))
+    return bytes(pdf.output())
+
+
+def generate_quote_pdf_pair(client_info, items, results, markup,
+                            created_by='Unknown', timestamp=None, labour_hours=None):
+    """
+    Both documents from one row model. Parameters as for generate_quote_pdf().
+
+    Returns (cost_report_bytes, client_quote_bytes).
+    """
+    rows = report_rows(client_info, items, results, markup, created_by, timestamp, labour_hours)
+    report, quote = CostReportPDF(), ClientQuotePDF()
+    draw_cost_report(report, rows)
+    draw_client_quote(quote, rows)
+    return bytes(report.output()), bytes(quote.output())
+
+
+# ── Shared row model ──────────────────────────────────────────────────────────
+# Both documents print from one pre-formatted model, so rendering the cost
+# report and the client quote together sanitises and formats the job once.
+
+def report_rows(client_info, items, results, markup,
+                created_by='Unknown', timestamp=None, labour_hours=None):
+    """
+    Client details, dates, the materials table and the client price lines,
+    sanitised and formatted for printing. Reads the calculate_job() results
+    as given; nothing is recalculated. Parameters as for generate_quote_pdf().
+    """
     if timestamp is None:
         timestamp = datetime.now()
-    if labour_hours is None:
-        labour_hours = {}
+    nesting_on = results.get('nesting_enabled', False)
+
+    material_items = [i for i in items if i.get('type') == 'material']
+    materials = []
+    client_items = []
+    for n, item in enumerate(material_items, 1):
+        w_m = item.get('width', 0)
+        h_m = item.get('height', 0)
+        qty = item.get('qty', 1)
+        # If nesting, show optimised area; else standard
+        if nesting_on and 'nesting_area_m2' in item:
+            area = item['nesting_area_m2']
+        else:
+            area = w_m * h_m * qty
+        size = [f'{w_m*100:.1f}cm', f'{h_m*100:.1f}cm', str(qty)]
+        materials.append([safe(item.get('description', 'Unknown'))] + size + [f'{area:.4f}'])
+        # The internal description names stock and nesting figures; the client
+        # sees only the item's own label (size and quantity are columns)
+        client_items.append([safe(item.get('label') or f'Item {n}')] + size)
+
+    # Client price lines: billed labour as charged, the rest of the quote is
+    # supply (materials x markup), so the lines always add up to the quote
+    quote_price = results.get('quote_price', 0)
+    billed = [('Design & production', results.get('workshop_price_billed', 0)),
+              ('Installation',        results.get('install_price_billed', 0)),
+              ('Travel',              results.get('travel_price_billed', 0))]
+    supply = round(quote_price - sum(v for _, v in billed), 2)
+    prices = [('Supply of materials & print', f'£{supply:,.2f}')]
+    prices += [(label, f'£{value:,.2f}') for label, value in billed if value]
+
+    return {
+        'client_name':  safe(client_info.get('name', '') or 'N/A'),
+        'client_ref':   safe(client_info.get('contact', '') or ''),
+        'job_desc':     safe(client_info.get('description', '') or ''),
+        'created_by':   safe(created_by),
+        'date':         timestamp.strftime('%d %B %Y'),
+        'time':         timestamp.strftime('%H:%M'),
+        'materials':    materials,           # [desc, width, height, qty, area] (internal)
+        'client_items': client_items,        # [label, width, height, qty] for the client quote
+        'labour_items': [i for i in items if i.get('type') == 'labor'],
+        'total_qty':    sum(i.get('qty', 1) for i in material_items),
+        'prices':       prices,              # [(label, amount)] for the client quote
+        'quote_total':  f'£{quote_price:,.2f}',
+        'results':      results,
+        'markup':       markup,
+        'labour_hours': labour_hours or {},
+    }
+
+
+def add_quote_report(pdf, client_info, items, results, markup,
+                     created_by='Unknown', timestamp=None, labour_hours=None):
+    """
+    Append one job's cost report to `pdf`, starting on a new page (so several
+    jobs can share one document). Parameters as for generate_quote_pdf().
+    """
+    draw_cost_report(pdf, report_rows(client_info, items, results, markup,
+                                      created_by, timestamp, labour_hours))
+
+
+def draw_cost_report(pdf, rows):
+    """Append the internal cost report for a report_rows() model to `pdf`."""
+    results      = rows['results']
+    markup       = rows['markup']
+    labour_hours = rows['labour_hours']
 
     # ── Unpack results ────────────────────────────────────────────────────────
     mat_raw          = results.get('material_cost_raw', 0)          # before wastage
@@ -180,17 +410,13 @@ def generate_quote_pdf(client_info, items, results, markup,
     margin_pct = (profit / quote_price * 100) if quote_price > 0 else 0
     markup_pct = (markup - 1) * 100   # e.g. markup=2.5 -> 150%
 
-    # ── Client info (sanitised for Latin-1) ─────────────────────────────────
-    client_name = safe(client_info.get('name', '') or 'N/A')
-    client_ref  = safe(client_info.get('contact', '') or '')
-    job_desc    = safe(client_info.get('description', '') or '')
-
-    material_items = [i for i in items if i.get('type') == 'material']
-    labour_items   = [i for i in items if i.get('type') == 'labor']
-    total_qty      = sum(i.get('qty', 1) for i in material_items)
+    client_name  = rows['client_name']
+    client_ref   = rows['client_ref']
+    job_desc     = rows['job_desc']
+    labour_items = rows['labour_items']
+    total_qty    = rows['total_qty']
 
     # ── Build PDF ─────────────────────────────────────────────────────────────
-    pdf = CostReportPDF()
     pdf.add_page()
 
     # ═══════════════════════════════════════════════════════════════════════════
@@ -202,19 +428,19 @@ def generate_quote_pdf(client_info, items, results, markup,
     pdf.rect(10, box_y, 190, 26, 'FD')
     pdf.set_y(box_y + 3)
 
-    left_items  = [('Prepared by:', safe(created_by)), ('Date:', timestamp.strftime('%d %B %Y'))]
-    right_items = [('Time:', timestamp.strftime('%H:%M')), ('Ref / Contact:', client_ref or '-')]
+    left_items  = [('Prepared by:', rows['created_by']), ('Date:', rows['date'])]
+    right_items = [('Time:', rows['time']), ('Ref / Contact:', client_ref or '-')]
 
     for (ll, lv), (rl, rv) in zip(left_items, right_items):
         pdf.set_x(14)
         pdf.set_font('helvetica', '', 8.5); pdf.set_text_color(110, 110, 110)
-        pdf.cell(22, 5, ll)
+        pdf.text_cell(22, 5, ll)
         pdf.set_font('helvetica', 'B', 8.5); pdf.set_text_color(20, 20, 20)
-        pdf.cell(68, 5, lv)
+        pdf.text_cell(68, 5, lv)
         pdf.set_font('helvetica', '', 8.5); pdf.set_text_color(110, 110, 110)
-        pdf.cell(20, 5, rl)
+        pdf.text_cell(20, 5, rl)
         pdf.set_font('helvetica', 'B', 8.5); pdf.set_text_color(20, 20, 20)
-        pdf.cell(0, 5, rv, ln=1)
+        pdf.text_cell(0, 5, rv, next_line=True)
 
     pdf.ln(6)
 
@@ -227,7 +453,7 @@ def generate_quote_pdf(client_info, items, results, markup,
         pdf.kv('Contact / Reference:', client_ref)
     if job_desc:
         pdf.set_font('helvetica', '', 9.5); pdf.set_text_color(80, 80, 80)
-        pdf.cell(100, 6, 'Job Description:')
+        pdf.text_cell(100, 6, 'Job Description:')
         pdf.set_text_color(20, 20, 20)
         pdf.multi_cell(0, 5, job_desc)
     # Job flags
@@ -237,7 +463,7 @@ def generate_quote_pdf(client_info, items, results, markup,
     if nesting_on:  flags.append('Nesting Optimiser Enabled')
     if flags:
         pdf.set_font('helvetica', 'I', 9); pdf.set_text_color(100, 100, 150)
-        pdf.cell(0, 5, 'Flags: ' + '  |  '.join(flags), ln=1)
+        pdf.text_cell(0, 5, 'Flags: ' + '  |  '.join(flags), next_line=True)
     pdf.ln(4)
 
     # ═══════════════════════════════════════════════════════════════════════════
@@ -253,24 +479,12 @@ def generate_quote_pdf(client_info, items, results, markup,
         ('Qty', col_w[3]),
         ('Area (m2)', col_w[4]),
     ])
-    for ri, item in enumerate(material_items):
-        desc = item.get('description', 'Unknown')
-        w_m  = item.get('width', 0)
-        h_m  = item.get('height', 0)
-        qty  = item.get('qty', 1)
-        # If nesting, show optimised area; else standard
-        if nesting_on and 'nesting_area_m2' in item:
-            area = item['nesting_area_m2']
-        else:
-            area = w_m * h_m * qty
-        pdf.table_row(
-            [desc, f'{w_m*100:.1f}cm', f'{h_m*100:.1f}cm', str(qty), f'{area:.4f}'],
-            col_w, row_idx=ri
-        )
+    for ri, row in enumerate(rows['materials']):
+        pdf.table_row(row, col_w, row_idx=ri)
 
     if labour_items:
         pdf.set_font('helvetica', 'I', 8); pdf.set_text_color(120, 120, 120)
-        pdf.cell(0, 5, '  Additional labour items also included (see Section 3)', ln=1)
+        pdf.text_cell(0, 5, '  Additional labour items also included (see Section 3)', next_line=True)
 
     pdf.ln(3)
     # Material cost sub-table
@@ -383,11 +597,11 @@ def generate_quote_pdf(client_info, items, results, markup,
     pdf.set_fill_color(235, 235, 235)
     pdf.set_font('helvetica', 'B', 9)
     pdf.set_text_color(30, 30, 30)
-    pdf.cell(lab_col_w[0], 7, '  TOTAL LABOUR', fill=True)
-    pdf.cell(lab_col_w[1], 7, '', fill=True)
-    pdf.cell(lab_col_w[2], 7, '', fill=True)
-    pdf.cell(lab_col_w[3], 7, f'£{l_internal_total:,.2f}  ', fill=True, align='R')
-    pdf.cell(lab_col_w[4], 7, f'£{labour_billed:,.2f}  ', fill=True, align='R', ln=1)
+    pdf.text_cell(lab_col_w[0], 7, '  TOTAL LABOUR', fill=True)
+    pdf.text_cell(lab_col_w[1], 7, '', fill=True)
+    pdf.text_cell(lab_col_w[2], 7, '', fill=True)
+    pdf.text_cell(lab_col_w[3], 7, f'£{l_internal_total:,.2f}  ', fill=True, align='R')
+    pdf.text_cell(lab_col_w[4], 7, f'£{labour_billed:,.2f}  ', fill=True, align='R', next_line=True)
     pdf.set_text_color(0, 0, 0)
     pdf.ln(4)
 
@@ -469,6 +683,116 @@ def generate_quote_pdf(client_info, items, results, markup,
     # ── Confidentiality footer note ────────────────────────────────────────────
     pdf.set_font('helvetica', 'B', 8)
     pdf.set_text_color(180, 50, 50)
-    pdf.cell(0, 5, 'CONFIDENTIAL - This document contains internal cost data and must not be shared with clients.', ln=1, align='C')
+    pdf.text_cell(0, 5, 'CONFIDENTIAL - This document contains internal cost data and must not be shared with clients.', align='C', next_line=True)
 
-    return bytes(pdf.output())
+
+def draw_client_quote(pdf, rows):
+    """Append the client quotation for a report_rows() model to `pdf`."""
+    pdf.add_page()
+
+    # Quote meta box
+    pdf.set_fill_color(250, 246, 240)
+    pdf.set_draw_color(235, 210, 180)
+    box_y = pdf.get_y()
+    pdf.rect(10, box_y, 190, 16, 'FD')
+    pdf.set_y(box_y + 3)
+    pdf.set_x(14)
+    pdf.set_font('helvetica', '', 8.5); pdf.set_text_color(110, 110, 110)
+    pdf.text_cell(22, 5, 'Date:')
+    pdf.set_font('helvetica', 'B', 8.5); pdf.set_text_color(20, 20, 20)
+    pdf.text_cell(68, 5, rows['date'])
+    pdf.set_font('helvetica', '', 8.5); pdf.set_text_color(110, 110, 110)
+    pdf.text_cell(20, 5, 'Prepared by:')
+    pdf.set_font('helvetica', 'B', 8.5); pdf.set_text_color(20, 20, 20)
+    pdf.text_cell(0, 5, rows['created_by'], next_line=True)
+    pdf.ln(10)
+
+    # 1. Client / job
+    pdf.section_heading('1. YOUR JOB', bg=(245, 158, 11), text_color=(255, 255, 255))
+    pdf.kv('Client:', rows['client_name'], label_w=50)
+    if rows['client_ref']:
+        pdf.kv('Contact / Reference:', rows['client_ref'], label_w=50)
+    if rows['job_desc']:
+        pdf.set_font('helvetica', '', 9.5); pdf.set_text_color(80, 80, 80)
+        pdf.text_cell(50, 6, 'Description:')
+        pdf.set_text_color(20, 20, 20)
+        pdf.multi_cell(0, 5, rows['job_desc'])
+    pdf.ln(4)
+
+    # 2. Items (label and size only - stock, nesting and area are internal)
+    if rows['client_items']:
+        pdf.section_heading('2. ITEMS', bg=(50, 50, 50), text_color=(255, 255, 255))
+        col_w = [112, 26, 26, 26]   # Desc | W | H | Qty
+        pdf.table_header([
+            ('Description', col_w[0]),
+            ('Width', col_w[1]),
+            ('Height', col_w[2]),
+            ('Qty', col_w[3]),
+        ])
+        for ri, row in enumerate(rows['client_items']):
+            pdf.table_row(row, col_w, row_idx=ri)
+        pdf.ln(5)
+
+    # 3. Price
+    pdf.section_heading('3. PRICE' if rows['client_items'] else '2. PRICE', bg=(50, 50, 50),
+                        text_color=(255, 255, 255))
+    for lbl, val in rows['prices']:
+        pdf.kv(lbl, val)
+    pdf.ln(2)
+    pdf.big_total_row('TOTAL QUOTE PRICE', rows['quote_total'], color=(245, 158, 11))
+
+
+# ── Deferred rendering, cached by fingerprint ─────────────────────────────────
+# The Calculator only fingerprints the quote on each rerun; the PDFs themselves
+# are built when a download / save is requested, once per distinct quote.
+
+PDF_CACHE_SIZE = 32
+_PDF_CACHE = LRUCache(PDF_CACHE_SIZE)
+
+
+def quote_fingerprint(client_info, items, results, markup,
+                      created_by='Unknown', timestamp=None, labour_hours=None):
+    """
+    Stable hash of everything generate_quote_pdf() prints. Only the report
+    date is included, so an unchanged quote maps to one cached PDF per day.
+    """
+    if timestamp is None:
+        timestamp = datetime.now()
+    # The full nesting layout is bulky and not printed (its area is)
+    canon_items = [{k: v for k, v in item.items() if k != 'nesting_result'} for item in items]
+    key = json.dumps(
+        [client_info, canon_items, results, markup, created_by, labour_hours or {},
+         timestamp.strftime('%Y-%m-%d')],
+        sort_keys=True, default=str
+    )
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def cached_quote_pdf(fingerprint, client=False):
+    """Rendered bytes for a fingerprint, or None if it hasn't been rendered yet."""
+    pair = _PDF_CACHE.get(fingerprint)
+    return None if pair is None else pair[1 if client else 0]
+
+
+def render_quote_pdf(client_info, items, results, markup,
+                     created_by='Unknown', timestamp=None, labour_hours=None,
+                     fingerprint=None, client=False):
+    """
+    The cost report (or with client=True the client quote) through the
+    process-wide cache. Both documents are rendered together on the first
+    request, so repeated downloads of either return the first render.
+
+    Parameters
+    ----------
+    fingerprint : str | None - quote_fingerprint() of the same arguments, if
+                               the caller already has it
+    client      : bool       - return the client quote instead of the cost report
+    """
+    if fingerprint is None:
+        fingerprint = quote_fingerprint(client_info, items, results, markup,
+                                        created_by, timestamp, labour_hours)
+    pair = _PDF_CACHE.get_or_compute(fingerprint, lambda: generate_quote_pdf_pair(
+        client_info, items, results, markup,
+        created_by=created_by, timestamp=timestamp, labour_hours=labour_hours
+    ))
+    return pair[1 if client else 0]
@@ -0,0 +1,195 @@
+"""
+Rerun Latency Instrumentation
+Wall-clock timers for the stages of a Streamlit rerun. Each rerun's stage
+timings are kept in a bounded log and every stage feeds a rolling histogram,
+all in process memory (shared by every session), for the admin perf panel.
+
+    with perf.rerun():                     # once per script run (main.main)
+        with perf.stage("calc.engine"):
+            ...
+
+    @perf.timed("pdf.generate")
+    def build(): ...
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Dict, List, Optional
+
+import numpy as np
+
+ENABLED = os.environ.get("DANIEL_SIGNS_PERF", "on").lower() not in ("0", "off", "false", "no")
+LOG_PATH = os.environ.get(
+    "DANIEL_SIGNS_PERF_LOG",
+    os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'perf_log.jsonl'))
+)
+
+WINDOW = 1000          # samples kept per stage for percentiles
+RERUN_LOG_SIZE = 500   # most recent reruns kept for the panel / JSONL dump
+
+# Histogram bucket upper bounds in ms (log-spaced, last bucket open-ended)
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class StageStats:
+    """Rolling latency window plus all-time bucket counts for one stage."""
+
+    def __init__(self, window: int = WINDOW):
+        self.samples = deque(maxlen=window)
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def add(self, ms: float):
+        self.samples.append(ms)
+        self.buckets[int(np.searchsorted(BUCKETS_MS, ms, side='left'))] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.last_ms = ms
+
+    def summary(self) -> Dict:
+        window = np.fromiter(self.samples, dtype=float) if self.samples else np.zeros(1)
+        return {
+            'count': self.count,
+            'last_ms': self.last_ms,
+            'p50_ms': float(np.percentile(window, 50)),
+            'p95_ms': float(np.percentile(window, 95)),
+            'max_ms': self.max_ms,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+        }
+
+
+_lock = threading.Lock()
+_stages: Dict[str, StageStats] = {}
+_reruns = deque(maxlen=RERUN_LOG_SIZE)
+_rerun_seq = 0                 # sequence number of the last logged rerun
+_dumped: Dict[str, int] = {}   # JSONL path -> last rerun seq already appended to it
+_dump_lock = threading.Lock()
+# Streamlit runs each script run on its own thread, so the open rerun is per thread
+_current = threading.local()
+
+
+def _record(name: str, ms: float):
+    with _lock:
+        stats = _stages.get(name)
+        if stats is None:
+            stats = _stages[name] = StageStats()
+        stats.add(ms)
+    run = getattr(_current, 'run', None)
+    if run is not None:
+        # A stage entered twice in one rerun (e.g. in a loop) is summed
+        run['stages'][name] = run['stages'].get(name, 0.0) + ms
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as `name` (also when it exits via st.rerun / st.stop)."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, (time.perf_counter() - start) * 1000.0)
+
+
+def timed(name: Optional[str] = None):
+    """Decorator form of stage(); the stage name defaults to module.function."""
+    def decorate(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def rerun(name: str = "rerun", session: Optional[str] = None):
+    """
+    Bracket one whole script run: its total time is recorded as stage `name`,
+    and the per-stage timings collected inside it are logged as one record.
+    """
+    if not ENABLED:
+        yield
+        return
+    _current.run = {'at': datetime.now(), 'session': session, 'stages': {}}
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        total = (time.perf_counter() - start) * 1000.0
+        run, _current.run = _current.run, None
+        _record(name, total)
+        run['total_ms'] = total
+        global _rerun_seq
+        with _lock:
+            _rerun_seq += 1
+            run['seq'] = _rerun_seq
+            _reruns.append(run)
+
+
+# ── Reading / exporting ─────────────────────────────────────────────────────
+
+def summary() -> List[Dict]:
+    """One row per stage (count, last, p50, p95, max, mean ms), slowest p95 first."""
+    with _lock:
+        rows = [dict(stage=name, **stats.summary()) for name, stats in _stages.items()]
+    return sorted(rows, key=lambda r: r['p95_ms'], reverse=True)
+
+
+def histogram(name: str) -> Optional[Dict]:
+    """All-time bucket counts for a stage as {'<=1 ms': n, ..., '>5000 ms': n}."""
+    with _lock:
+        stats = _stages.get(name)
+        if stats is None:
+            return None
+        counts = list(stats.buckets)
+    labels = [f"<={b} ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]} ms"]
+    return dict(zip(labels, counts))
+
+
+def recent_reruns(limit: Optional[int] = None) -> List[Dict]:
+    """Most recent rerun records, newest first."""
+    with _lock:
+        runs = list(_reruns)
+    runs.reverse()
+    return runs[:limit] if limit is not None else runs
+
+
+def dump_jsonl(path: str = LOG_PATH) -> int:
+    """
+    Append the reruns logged since the last dump to `path`, one record per
+    line, plus a final line with the current per-stage summary, so repeated
+    dumps never write a rerun twice. Returns the reruns written.
+    """
+    key = os.path.abspath(path)
+    with _dump_lock:
+        mark = _dumped.get(key, 0)
+        runs = [run for run in reversed(recent_reruns()) if run['seq'] > mark]
+        with open(path, 'a', encoding='utf-8') as f:
+            for run in runs:
+                f.write(json.dumps({'type': 'rerun', 'at': run['at'].isoformat(), 'session': run['session'],
+                                    'total_ms': run['total_ms'], 'stages': run['stages']}) + "\n")
+            f.write(json.dumps({'type': 'summary', 'at': datetime.now().isoformat(), 'stages': summary()}) + "\n")
+        if runs:
+            _dumped[key] = runs[-1]['seq']
+    return len(runs)
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _reruns.clear()
@@ -0,0 +1,255 @@
+"""
+Compiled Material Rate Index
+Maps material names and Firestore ids to dense integer slots so pricing
+loops index into a flat rate array instead of hashing names per item.
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+class MaterialRateIndex:
+    """
+    Dense slot table of material rates (GBP per m²) plus interned material
+    combinations (e.g. vinyl + laminate) with their combined rate cached.
+
+    Unknown names are given a zero-rate slot, matching the `.get(m, 0)`
+    behaviour of the old name-keyed dict.
+    """
+
+    def __init__(self):
+        self._rates = array('d')                 # slot -> rate per m²
+        self._names: Dict[str, int] = {}         # catalogue name -> slot (first-seen order)
+        self._ghosts: Dict[str, int] = {}        # names priced but not in the catalogue
+        self._ids: Dict[str, int] = {}           # Firestore doc id -> slot
+        self._slot_names: List[Optional[str]] = []
+
+        self._combos: Dict[tuple, int] = {}      # tuple of names -> combo id
+        self._combo_slots: List[tuple] = []      # combo id -> tuple of slots
+        self._combo_rates = array('d')           # combo id -> combined rate
+        self._slot_combos: List[List[int]] = []  # slot -> combo ids using it
+
+        self.version = 0                          # bumped on every rate change
+
+    # ── Construction ─────────────────────────────────────────────────────────
+
+    @classmethod
+    def from_rates(cls, rates: Dict[str, float]) -> 'MaterialRateIndex':
+        """Build from a {name: cost_per_m2} dict."""
+        index = cls()
+        for name, rate in rates.items():
+            index.set_rate(name, rate)
+        index.version = 0
+        return index
+
+    @classmethod
+    def from_materials(cls, materials: Iterable[Dict]) -> 'MaterialRateIndex':
+        """Build from fetch_materials() output (dicts with id, name, cost_per_m2)."""
+        index = cls()
+        index.sync(materials)
+        index.version = 0
+        return index
+
+    def _new_slot(self, name: Optional[str], rate: float) -> int:
+        slot = len(self._rates)
+        self._rates.append(float(rate))
+        self._slot_names.append(name)
+        self._slot_combos.append([])
+        return slot
+
+    def _slot_for_name(self, name: str) -> int:
+        slot = self._names.get(name)
+        if slot is None:
+            slot = self._ghosts.get(name)
+        if slot is None:
+            slot = self._new_slot(name, 0.0)
+            self._ghosts[name] = slot
+        return slot
+
+    # ── Lookups ──────────────────────────────────────────────────────────────
+
+    def names(self) -> List[str]:
+        """Catalogue material names, in first-seen order."""
+        return list(self._names)
+
+    def slot(self, key: str) -> Optional[int]:
+        """Slot for a material name or Firestore id (None if unknown)."""
+        slot = self._ids.get(key)
+        if slot is None:
+            slot = self._names.get(key)
+        return slot
+
+    def rate(self, key: str) -> float:
+        slot = self.slot(key)
+        return self._rates[slot] if slot is not None else 0
+
+    def intern(self, materials) -> int:
+        """Return the combo id for a sequence of material names, creating it if new."""
+        key = tuple(materials)
+        cid = self._combos.get(key)
+        if cid is None:
+            slots = tuple(self._slot_for_name(m) for m in key)
+            cid = len(self._combo_slots)
+            self._combo_slots.append(slots)
+            self._combo_rates.append(self._sum_slots(slots))
+            for s in set(slots):
+                self._slot_combos[s].append(cid)
+            self._combos[key] = cid
+        return cid
+
+    def combo_rate(self, materials) -> float:
+        """Combined rate per m² for a sequence of material names."""
+        cid = self._combos.get(tuple(materials))
+        if cid is None:
+            cid = self.intern(materials)
+        return self._combo_rates[cid]
+
+    def combo_rates_array(self) -> np.ndarray:
+        """Zero-copy NumPy view of the combined rates, indexable by combo id."""
+        return np.frombuffer(self._combo_rates, dtype=float) if self._combo_rates else np.zeros(0)
+
+    def _sum_slots(self, slots) -> float:
+        # Same left-to-right summation as sum([rates...]) for penny parity
+        return sum([self._rates[s] for s in slots])
+
+    # ── Update-in-place ──────────────────────────────────────────────────────
+
+    def set_rate(self, key: str, rate: float, mat_id: Optional[str] = None) -> int:
+        """
+        Set the rate for a material name (or Firestore id) and refresh every
+        cached combination that uses it. Returns the slot. The version is
+        bumped if the rate changes or the name now resolves to another slot.
+        """
+        moved = False
+        if mat_id is not None:
+            # Each document gets its own slot; a duplicate name points at the
+            # last one seen, like the old name-keyed dict did
+            slot = self._ids.get(mat_id)
+            if slot is None:
+                slot = self._ghosts.pop(key, None)
+                if slot is None:
+                    slot = self._new_slot(key, rate)
+                self._ids[mat_id] = slot
+            moved = self._point_name(key, slot)
+        else:
+            slot = self._names.get(key)
+            if slot is None:
+                slot = self._ghosts.pop(key, None)
+                if slot is None:
+                    slot = self._new_slot(key, rate)
+                self._names[key] = slot
+                moved = True
+
+        rate = float(rate)
+        if self._rates[slot] != rate:
+            self._rates[slot] = rate
+            self._refresh_combos(slot)
+            moved = True
+        if moved:
+            self.version += 1
+        return slot
+
+    def update_material(self, mat_id: str, updates: Dict) -> bool:
+        """
+        Apply a Supplier Manager edit (same `updates` dict passed to
+        db.update_material) in place. Returns False if the id is unknown.
+        """
+        slot = self._ids.get(mat_id)
+        if slot is None:
+            return False
+        new_name = updates.get('name')
+        old_name = self._slot_names[slot]
+        if new_name is not None and new_name != old_name:
+            # Combos are keyed by name, so the renamed slot's combos no longer apply
+            self._drop_combos(slot)
+            if old_name is not None and self._names.get(old_name) == slot:
+                self._fall_back(old_name, slot)
+            self._slot_names[slot] = new_name
+            for other in (self._ghosts.pop(new_name, None), self._names.get(new_name)):
+                if other is not None and other != slot:
+                    self._drop_combos(other)
+            self._names[new_name] = slot
+            self.version += 1
+        if 'cost_per_m2' in updates:
+            rate = float(updates['cost_per_m2'])
+            if self._rates[slot] != rate:
+                self._rates[slot] = rate
+                self._refresh_combos(slot)
+                self.version += 1
+        return True
+
+    def remove_material(self, key: str) -> bool:
+        """Drop a material (name or id); names priced afterwards rate at 0."""
+        slot = self.slot(key)
+        if slot is None:
+            return False
+        name = self._slot_names[slot]
+        for mid in [k for k, s in self._ids.items() if s == slot]:
+            del self._ids[mid]
+        self._rates[slot] = 0.0
+        self._drop_combos(slot)
+        self._slot_names[slot] = None
+        if name is not None and self._names.get(name) == slot:
+            self._fall_back(name, slot)
+        self.version += 1
+        return True
+
+    def sync(self, materials: Iterable[Dict]) -> bool:
+        """
+        Reconcile with a fresh fetch_materials() list, touching only the slots
+        whose name or price changed. Returns True if anything changed.
+        """
+        start = self.version
+        seen = set()
+        for m in materials:
+            mat_id = m.get('id')
+            name = m.get('name', 'Unknown')
+            rate = m.get('cost_per_m2', 0.0)
+            if mat_id is not None:
+                seen.add(mat_id)
+                if mat_id in self._ids:
+                    self.update_material(mat_id, {'name': name, 'cost_per_m2': rate})
+                    # Last document seen with a name wins, as in the old dict
+                    if self._point_name(name, self._ids[mat_id]):
+                        self.version += 1
+                    continue
+            self.set_rate(name, rate, mat_id=mat_id)
+        for mat_id in [k for k in self._ids if k not in seen]:
+            self.remove_material(mat_id)
+        return self.version != start
+
+    def _point_name(self, name: str, slot: int) -> bool:
+        """Resolve `name` to `slot`; True if it used to resolve elsewhere."""
+        prev = self._names.get(name)
+        if prev == slot:
+            return False
+        if prev is not None:
+            self._drop_combos(prev)
+        self._names[name] = slot
+        return True
+
+    def _fall_back(self, name: str, slot: int):
+        """`slot` no longer carries `name`: point it at another document with that name, if any."""
+        others = [s for s in self._ids.values() if s != slot and self._slot_names[s] == name]
+        if others:
+            self._names[name] = others[-1]
+        else:
+            del self._names[name]
+
+    def _refresh_combos(self, slot: int):
+        for cid in self._slot_combos[slot]:
+            self._combo_rates[cid] = self._sum_slots(self._combo_slots[cid])
+
+    def _drop_combos(self, slot: int):
+        # Forget combos that resolved through this slot so they re-intern by name
+        dead = set(self._slot_combos[slot])
+        if not dead:
+            return
+        for key in [k for k, cid in self._combos.items() if cid in dead]:
+            del self._combos[key]
+        self._slot_combos[slot] = []
+
+    def __len__(self):
+        return len(self._names)
@@ -0,0 +1,262 @@
+"""
+Embedded SQLite Storage Backend
+Offline, persistent alternative to Firestore for utils/db.py. Documents are
+stored as JSON with the queried fields (material name, job created_at and
+client name) copied into indexed columns.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS materials (
+    id   TEXT PRIMARY KEY,
+    name TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_materials_name ON materials (name);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    created_at  TEXT,
+    client_name TEXT,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_client_created ON jobs (client_name, created_at, id);
+
+CREATE TABLE IF NOT EXISTS settings (
+    key  TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+_FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+
+# ── JSON encoding (datetimes and NumPy scalars survive a round trip) ─────────
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if hasattr(value, "item"):  # NumPy scalar
+        return value.item()
+    raise TypeError(f"Cannot store {type(value).__name__} in SQLite backend")
+
+
+def _decode(obj):
+    if "__datetime__" in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj and len(obj) == 1:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def dump_document(doc: Dict) -> str:
+    """JSON text for a Firestore-style document (also used by the write-behind journal)."""
+    return json.dumps(doc, default=_encode, separators=(",", ":"))
+
+
+def load_document(text: str) -> Dict:
+    return json.loads(text, object_hook=_decode)
+
+
+def _sort_key(value) -> Optional[str]:
+    """Timestamps as sortable ISO text (aware values normalised to naive UTC)."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat(sep="T", timespec="microseconds")
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day).isoformat(sep="T", timespec="microseconds")
+    return str(value)
+
+
+class SQLiteStore:
+    """
+    Materials, jobs and settings in one SQLite file (WAL mode).
+
+    One connection per thread; every public method is a single transaction.
+    close() closes the connections of every thread, not just the caller's.
+    Method names and return values mirror the Firestore code paths in utils/db.py.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns: Dict[sqlite3.Connection, threading.Thread] = {}  # open connection -> owning thread
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn not in self._conns:
+            # check_same_thread is off only so close() can close it from
+            # another thread; it is never used by any thread but this one
+            conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                # Connections left by threads that have since exited
+                for old, thread in list(self._conns.items()):
+                    if not thread.is_alive():
+                        old.close()
+                        del self._conns[old]
+                self._conns[conn] = threading.current_thread()
+        return conn
+
+    def close(self):
+        """Close every thread's connection; a thread that uses the store again reconnects."""
+        with self._lock:
+            conns, self._conns = list(self._conns), {}
+        for conn in conns:
+            conn.close()
+        self._local.conn = None
+
+    # ── Materials ────────────────────────────────────────────────────────────
+
+    def fetch_materials(self) -> List[Dict]:
+        rows = self._conn().execute("SELECT id, data FROM materials ORDER BY rowid").fetchall()
+        materials = []
+        for mat_id, data in rows:
+            doc = load_document(data)
+            doc['id'] = mat_id
+            materials.append(doc)
+        return materials
+
+    def add_material(self, data: Dict) -> str:
+        return self.add_materials([data])[0]
+
+    def add_materials(self, docs: Iterable[Dict]) -> List[str]:
+        rows = []
+        for doc in docs:
+            doc = {k: v for k, v in doc.items() if k != 'id'}
+            rows.append((uuid.uuid4().hex, doc.get('name'), dump_document(doc)))
+        with self._conn() as conn:
+            conn.executemany("INSERT INTO materials (id, name, data) VALUES (?, ?, ?)", rows)
+        return [r[0] for r in rows]
+
+    def update_material(self, mat_id: str, updates: Dict) -> bool:
+        return self.update_materials([(mat_id, updates)])[0]
+
+    def update_materials(self, changes: Iterable) -> List[bool]:
+        """Apply (id, updates) pairs in one transaction; True per pair whose id existed."""
+        return self.apply_material_changes(changes)[0]
+
+    def apply_material_changes(self, updates: Iterable, deletes: Iterable[str] = ()) -> Tuple[List[bool], List[bool]]:
+        """
+        Apply (id, updates) pairs, then delete ids, all in one transaction.
+        Returns (found per update, found per delete).
+        """
+        updated, deleted = [], []
+        with self._conn() as conn:
+            for mat_id, fields in updates:
+                row = conn.execute("SELECT data FROM materials WHERE id = ?", (mat_id,)).fetchone()
+                if row is None:
+                    updated.append(False)
+                    continue
+                doc = load_document(row[0])
+                doc.update({k: v for k, v in fields.items() if k != 'id'})
+                conn.execute("UPDATE materials SET name = ?, data = ? WHERE id = ?",
+                             (doc.get('name'), dump_document(doc), mat_id))
+                updated.append(True)
+            for mat_id in deletes:
+                deleted.append(conn.execute("DELETE FROM materials WHERE id = ?", (mat_id,)).rowcount > 0)
+        return updated, deleted
+
+    def delete_material(self, mat_id: str) -> bool:
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM materials WHERE id = ?", (mat_id,)).rowcount > 0
+
+    # ── Jobs ─────────────────────────────────────────────────────────────────
+
+    def save_job(self, job_data: Dict) -> str:
+        job_id = job_data.get('id') or uuid.uuid4().hex
+        doc = {k: v for k, v in job_data.items() if k != 'id'}
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, created_at, client_name, data) VALUES (?, ?, ?, ?)",
+                (job_id, _sort_key(doc.get('created_at')), (doc.get('client') or {}).get('name'), dump_document(doc))
+            )
+        return job_id
+
+    def fetch_jobs(self) -> List[Dict]:
+        rows = self._conn().execute("SELECT id, data FROM jobs ORDER BY rowid").fetchall()
+        return [self._job(job_id, data) for job_id, data in rows]
+
+    def fetch_jobs_page(self, limit: int, start_after: Optional[str] = None, order_by: str = 'created_at',
+                        client_name: Optional[str] = None, date_from=None, date_to=None,
+                        descending: bool = True) -> List[Dict]:
+        """
+        Up to `limit` jobs after the `start_after` job id, using keyset
+        pagination on (order_by, id). Callers ask for limit + 1 to detect more.
+        If the cursor job no longer exists the page is empty.
+        """
+        if order_by == 'created_at':
+            sort_col = "created_at"
+            params: List = []
+        elif _FIELD_RE.match(order_by):
+            sort_col = "json_extract(data, ?)"
+            params = ["$." + order_by]
+        else:
+            raise ValueError(f"Invalid order_by field: {order_by!r}")
+
+        where = [f"{sort_col} IS NOT NULL"]
+        where_params = list(params)
+        if client_name:
+            where.append("client_name = ?")
+            where_params.append(client_name)
+        if date_from is not None:
+            where.append("created_at >= ?")
+            where_params.append(_sort_key(date_from))
+        if date_to is not None:
+            where.append("created_at <= ?")
+            where_params.append(_sort_key(date_to))
+
+        conn = self._conn()
+        if start_after:
+            cursor = conn.execute(f"SELECT {sort_col} FROM jobs WHERE id = ?",
+                                  params + [start_after]).fetchone()
+            if cursor is None or cursor[0] is None:
+                return []  # cursor job deleted (or unsortable): nothing after it
+            # Row-value comparison, so SQLite can seek the (created_at, id) index
+            op = "<" if descending else ">"
+            where.append(f"({sort_col}, id) {op} (?, ?)")
+            where_params += params + [cursor[0], start_after]
+
+        direction = "DESC" if descending else "ASC"
+        sql = (f"SELECT id, data FROM jobs WHERE {' AND '.join(where)} "
+               f"ORDER BY {sort_col} {direction}, id {direction} LIMIT ?")
+        rows = conn.execute(sql, where_params + params + [int(limit)]).fetchall()
+        return [self._job(job_id, data) for job_id, data in rows]
+
+    def delete_job(self, job_id: str) -> bool:
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount > 0
+
+    @staticmethod
+    def _job(job_id: str, data: str) -> Dict:
+        doc = load_document(data)
+        doc['id'] = job_id
+        return doc
+
+    # ── Settings ─────────────────────────────────────────────────────────────
+
+    def load_settings(self, key: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT data FROM settings WHERE key = ?", (key,)).fetchone()
+        return load_document(row[0]) if row is not None else None
+
+    def save_settings(self, key: str, data: Dict):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO settings (key, data) VALUES (?, ?)", (key, dump_document(data)))
@@ -0,0 +1,195 @@
+"""
+Cheapest-Stock Selection
+Evaluates every compatible roll width and sheet size in the materials list for
+an item and picks the one with the lowest total material cost (not the lowest
+waste percentage).
+"""
+
+import hashlib
+import math
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils.lru import LRUCache
+from utils.nesting_optimizer import NestingOptimizer, geometry_key
+
+
+def catalog_signature(materials: Iterable[Dict]) -> str:
+    """Cheap fingerprint of the stock-relevant fields, to know when to rebuild a StockCatalog."""
+    key = tuple(
+        (m.get('id'), m.get('name'), m.get('category'), m.get('roll_width'), m.get('cost_per_m2'), m.get('unit_cost'))
+        for m in materials
+    )
+    return hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class StockCatalog:
+    """
+    Compiled array view of the roll and sheet stocks in fetch_materials() output.
+
+    Vinyl (and legacy uncategorised) materials are rolls of `roll_width` metres.
+    Sheet materials are `roll_width` wide; their length comes from
+    unit_cost / cost_per_m2 (the sheet area) or, failing that, the matching
+    NestingOptimizer.HOARDING_PANEL_SIZES entry. Misc items are not stock.
+    """
+
+    CHUNK = 32  # candidates evaluated per vectorized pass before checking the bound
+
+    def __init__(self, materials: Iterable[Dict], cache_size: int = 256):
+        materials = list(materials)
+        self.signature = catalog_signature(materials)
+        rows = []
+        for m in materials:
+            stock = self._stock_from_material(m)
+            if stock is not None:
+                rows.append(stock)
+        self.stocks = rows
+        self.width_cm = np.array([r['width_cm'] for r in rows], dtype=float)
+        self.length_cm = np.array([np.nan if r['length_cm'] is None else r['length_cm'] for r in rows], dtype=float)
+        self.cost_per_m2 = np.array([r['cost_per_m2'] for r in rows], dtype=float)
+        self.category = np.array([r['category'] for r in rows], dtype=object)
+        self.name = np.array([r['name'] for r in rows], dtype=object)
+        self._cache = LRUCache(cache_size)
+
+    @staticmethod
+    def _stock_from_material(m: Dict) -> Optional[Dict]:
+        category = m.get('category') or 'Vinyl'
+        width_m = float(m.get('roll_width') or 0.0)
+        rate = float(m.get('cost_per_m2') or 0.0)
+        if category == 'Misc' or width_m <= 0 or rate <= 0:
+            return None
+        length_cm = None
+        if category == 'Sheet':
+            unit_cost = m.get('unit_cost')
+            if unit_cost:
+                length_cm = float(unit_cost) / rate / width_m * 100.0
+            else:
+                width_cm = width_m * 100.0
+                matches = [l for w, l in NestingOptimizer.HOARDING_PANEL_SIZES if abs(w - width_cm) < 1.0] + \
+                          [w for w, l in NestingOptimizer.HOARDING_PANEL_SIZES if abs(l - width_cm) < 1.0]
+                if not matches:
+                    return None
+                length_cm = matches[0]
+        return {
+            'material_id': m.get('id'),
+            'name': m.get('name', 'Unknown'),
+            'category': category,
+            'width_cm': width_m * 100.0,
+            'length_cm': length_cm,
+            'cost_per_m2': rate,
+        }
+
+    def __len__(self):
+        return len(self.stocks)
+
+    def cache_info(self) -> Dict:
+        return self._cache.info()
+
+    def select(self, item_width_cm: float, item_height_cm: float, quantity: int,
+               bleed_mm: float = 3.0, gutter_mm: float = 5.0,
+               category: Optional[str] = None, exclude: Iterable[str] = (),
+               top_n: int = 5) -> Optional[Dict]:
+        """
+        Cheapest stock for one item.
+
+        Args:
+            category: Only consider stocks of this category (None for all)
+            exclude: Material names never to pick, e.g. laminates layered on top
+
+        Returns:
+            Dictionary for the winning stock (name, id, width/length, orientation,
+            total_area_m2, material_cost, efficiency) with 'ranked' holding the
+            top_n evaluated alternatives and candidate counts; None if no stock
+            in the category fits the item.
+        """
+        exclude = tuple(sorted(set(exclude)))
+        key = (geometry_key(item_width_cm, item_height_cm, quantity, bleed_mm, gutter_mm), category, exclude, top_n)
+        return self._cache.get_or_compute(key, lambda: self._select(
+            item_width_cm, item_height_cm, quantity, bleed_mm, gutter_mm, category, exclude, top_n
+        ))
+
+    def _select(self, item_width_cm, item_height_cm, quantity, bleed_mm, gutter_mm, category, exclude, top_n):
+        bleed_cm = bleed_mm / 10.0
+        gutter_cm = gutter_mm / 10.0
+        w_b = item_width_cm + 2 * bleed_cm
+        h_b = item_height_cm + 2 * bleed_cm
+
+        # Prune 1: category, and stocks the item can't fit across in either orientation
+        mask = self.width_cm >= min(w_b, h_b) + gutter_cm
+        if category is not None:
+            mask &= self.category == category
+        if exclude:
+            mask &= ~np.isin(self.name, list(exclude))
+        sheet = self.length_cm > 0
+        with np.errstate(invalid='ignore'):
+            fits_sheet = (((self.width_cm >= w_b + gutter_cm) & (self.length_cm >= h_b + gutter_cm)) |
+                          ((self.width_cm >= h_b + gutter_cm) & (self.length_cm >= w_b + gutter_cm)))
+        mask &= ~sheet | fits_sheet
+        candidates = np.flatnonzero(mask)
+        total = len(candidates)
+        if total == 0:
+            return None
+
+        # Prune 2: identical geometry can only be won by its cheapest rate
+        best_by_geometry = {}
+        for i in candidates:
+            g = (round(self.width_cm[i], 6), None if np.isnan(self.length_cm[i]) else round(self.length_cm[i], 6))
+            j = best_by_geometry.get(g)
+            if j is None or self.cost_per_m2[i] < self.cost_per_m2[j]:
+                best_by_geometry[g] = i
+        candidates = np.array(sorted(best_by_geometry.values()))
+
+        # Prune 3: no layout can use less than the printed area, so evaluate in
+        # ascending lower-bound order and stop once the bound beats the best cost
+        used_m2 = quantity * w_b * h_b / 10000.0
+        lower_bound = used_m2 * self.cost_per_m2[candidates]
+        order = np.argsort(lower_bound, kind='stable')
+        candidates = candidates[order]
+        lower_bound = lower_bound[order]
+
+        evaluated = []
+        best_cost = math.inf
+        for start in range(0, len(candidates), self.CHUNK):
+            if lower_bound[start] >= best_cost:
+                break
+            chunk = candidates[start:start + self.CHUNK]
+            grid = NestingOptimizer.evaluate_stock_grid(
+                [item_width_cm], [item_height_cm], [quantity],
+                self.width_cm[chunk], self.length_cm[chunk], bleed_mm, gutter_mm
+            )
+            # Cheapest orientation per stock, ignoring orientations that would
+            # overhang (the layout maths clamps those to one across / one down)
+            area_m2 = grid['total_area_cm2'][0] / 10000.0            # (stocks, 2)
+            cost = area_m2 * self.cost_per_m2[chunk][:, None]
+            stock_w = self.width_cm[chunk][:, None]
+            stock_l = self.length_cm[chunk][:, None]
+            across = np.array([w_b, h_b])[None, :] + gutter_cm
+            down = np.array([h_b, w_b])[None, :] + gutter_cm
+            with np.errstate(invalid='ignore'):
+                overhang = (across > stock_w) | ((stock_l > 0) & (down > stock_l))
+            cost = np.where(overhang, np.inf, cost)
+            orient = np.argmin(cost, axis=1)
+            for k, i in enumerate(chunk):
+                o = orient[k]
+                row = dict(self.stocks[i])
+                row.update({
+                    'orientation': 'Portrait' if o == 0 else 'Landscape',
+                    'total_area_m2': float(area_m2[k, o]),
+                    'material_cost': float(cost[k, o]),
+                    'sheets_needed': int(grid['sheets_needed'][0, k, o]),
+                    'material_length_cm': float(grid['material_length_cm'][0, k, o]),
+                    'efficiency_percent': float(grid['efficiency_percent'][0, k, o]),
+                })
+                evaluated.append(row)
+                best_cost = min(best_cost, row['material_cost'])
+
+        evaluated.sort(key=lambda r: r['material_cost'])
+        best = dict(evaluated[0])
+        best['ranked'] = evaluated[:top_n]
+        best['candidates_total'] = total
+        best['candidates_evaluated'] = len(evaluated)
+        return best
+
+    def categories(self) -> List[str]:
+        return sorted(set(self.category.tolist()))
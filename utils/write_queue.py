@@ -0,0 +1,320 @@
+"""
+Durable Write-Behind Queue
+Pending database writes are journaled to a local SQLite file and acknowledged
+at once; a background thread flushes them to the backend in FIFO batches,
+retrying with exponential backoff when the connection drops. Writes the
+backend rejects outright (a missing document, an invalid value) are set aside
+at once so they cannot hold up the rest of the queue.
+"""
+
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.sqlite_store import dump_document, load_document
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending (
+    seq          INTEGER PRIMARY KEY AUTOINCREMENT,
+    op           TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    last_error   TEXT,
+    enqueued_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS failed (
+    seq          INTEGER PRIMARY KEY,
+    op           TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    attempts     INTEGER NOT NULL,
+    last_error   TEXT,
+    enqueued_at  REAL NOT NULL,
+    failed_at    REAL NOT NULL
+);
+"""
+
+# Backend errors that retrying cannot fix (google.api_core exception names, and
+# the errors a malformed payload raises). Anything else, e.g. ServiceUnavailable
+# or a dropped connection, is treated as transient.
+PERMANENT_ERRORS = frozenset({
+    'NotFound', 'InvalidArgument', 'BadRequest', 'FailedPrecondition',
+    'ValueError', 'TypeError', 'KeyError',
+})
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """True if `error` (or a base class) is one of PERMANENT_ERRORS."""
+    return any(cls.__name__ in PERMANENT_ERRORS for cls in type(error).__mro__)
+
+
+class WriteBehindQueue:
+    """
+    FIFO journal of write operations, each an (op name, JSON payload) pair.
+
+    `apply(ops)` receives a list of {'seq', 'op', 'payload'} dicts and must
+    apply all of them or raise. A transient failure (connection lost, backend
+    unavailable) is retried after an exponentially growing delay, capped at
+    `max_delay`, for as long as it takes. A permanent failure (see
+    is_permanent_error) is retried one operation at a time so the bad write
+    can be found; that one is moved to the `failed` table straight away,
+    reported in status(), and can be requeued with retry_failed().
+    """
+
+    def __init__(self, path: str, apply: Callable[[List[Dict]], None], batch_size: int = 100,
+                 base_delay: float = 1.0, max_delay: float = 300.0,
+                 on_flushed: Optional[Callable[[List[Dict]], None]] = None,
+                 is_permanent: Callable[[Exception], bool] = is_permanent_error):
+        """
+        Args:
+            path: SQLite journal file (survives restarts; pending writes resume)
+            apply: Writes a batch of operations to the backend, raising on failure
+            batch_size: Maximum operations per apply() call
+            base_delay / max_delay: Backoff bounds in seconds
+            on_flushed: Called with each successfully applied batch
+            is_permanent: Decides whether an apply() error is worth retrying
+        """
+        self.path = path
+        self._apply = apply
+        self._on_flushed = on_flushed
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._is_permanent = is_permanent
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+        self.failures = 0                       # consecutive transient failures
+        self.isolate_until = 0                  # apply one at a time up to this seq
+        self.retry_at = 0.0                     # time.monotonic() of the next attempt
+        self.last_error: Optional[str] = None
+        self.last_flush_at: Optional[datetime] = None
+        self.flushed = 0
+
+    # ── Producer side ────────────────────────────────────────────────────────
+
+    def enqueue(self, op: str, payload: Dict) -> int:
+        """Journal one operation (durably) and return its sequence number."""
+        text = dump_document(payload)
+        with self._lock:
+            with self._conn:
+                seq = self._conn.execute(
+                    "INSERT INTO pending (op, payload, enqueued_at) VALUES (?, ?, ?)",
+                    (op, text, time.time())
+                ).lastrowid
+        self._wake.set()
+        return seq
+
+    def enqueue_many(self, ops: List[Tuple[str, Dict]]) -> List[int]:
+        """Journal several (op, payload) pairs in one transaction, in order."""
+        rows = [(op, dump_document(payload), time.time()) for op, payload in ops]
+        seqs = []
+        with self._lock:
+            with self._conn:
+                for row in rows:
+                    seqs.append(self._conn.execute(
+                        "INSERT INTO pending (op, payload, enqueued_at) VALUES (?, ?, ?)", row
+                    ).lastrowid)
+        if seqs:
+            self._wake.set()
+        return seqs
+
+    def pending(self, op: Optional[str] = None) -> List[Dict]:
+        """Operations not yet flushed (optionally only one kind), oldest first."""
+        sql = "SELECT seq, op, payload FROM pending"
+        params = ()
+        if op is not None:
+            sql += " WHERE op = ?"
+            params = (op,)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY seq", params).fetchall()
+        return [{'seq': seq, 'op': kind, 'payload': load_document(text)} for seq, kind, text in rows]
+
+    def status(self) -> Dict:
+        """Depth, failure and timing figures for the UI."""
+        with self._lock:
+            depth = self._conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+            failed = self._conn.execute("SELECT COUNT(*) FROM failed").fetchone()[0]
+            oldest = self._conn.execute("SELECT MIN(enqueued_at) FROM pending").fetchone()[0]
+            parked = self._conn.execute(
+                "SELECT last_error FROM failed ORDER BY failed_at DESC LIMIT 1").fetchone()
+        return {
+            'depth': depth,
+            'failed': failed,
+            'failed_error': parked[0] if parked else None,
+            'last_error': self.last_error,
+            'consecutive_failures': self.failures,
+            'retry_in_seconds': max(0.0, self.retry_at - time.monotonic()) if self.failures else 0.0,
+            'oldest_age_seconds': (time.time() - oldest) if oldest is not None else None,
+            'last_flush_at': self.last_flush_at,
+            'flushed': self.flushed,
+            'running': self._thread is not None and self._thread.is_alive(),
+        }
+
+    # ── Flushing ─────────────────────────────────────────────────────────────
+
+    def start(self) -> 'WriteBehindQueue':
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def retry_now(self):
+        """Skip the current backoff delay (e.g. the user pressed 'retry')."""
+        self.retry_at = 0.0
+        self._wake.set()
+
+    def failed(self) -> List[Dict]:
+        """Operations set aside after a permanent error, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, op, payload, attempts, last_error FROM failed ORDER BY seq").fetchall()
+        return [{'seq': seq, 'op': op, 'payload': load_document(text), 'attempts': attempts,
+                 'last_error': error} for seq, op, text, attempts, error in rows]
+
+    def retry_failed(self, seqs: Optional[List[int]] = None) -> int:
+        """
+        Move set-aside operations (all, or those in `seqs`) back onto the end of
+        the queue, e.g. once the missing document exists again. Returns how many
+        were requeued.
+        """
+        sql = "SELECT seq, op, payload FROM failed"
+        params: Tuple = ()
+        if seqs is not None:
+            if not seqs:
+                return 0
+            sql += f" WHERE seq IN ({','.join('?' * len(seqs))})"
+            params = tuple(seqs)
+        with self._lock:
+            with self._conn:
+                rows = self._conn.execute(sql + " ORDER BY seq", params).fetchall()
+                for seq, op, text in rows:
+                    self._conn.execute(
+                        "INSERT INTO pending (op, payload, enqueued_at) VALUES (?, ?, ?)",
+                        (op, text, time.time()))
+                    self._conn.execute("DELETE FROM failed WHERE seq = ?", (seq,))
+        if rows:
+            self._wake.set()
+        return len(rows)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the queue is empty; True if it drained within `timeout`."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.retry_now()
+        while True:
+            if self.status()['depth'] == 0:
+                return True
+            if self._thread is None:
+                # Not running in the background: flush on the caller's thread
+                if self.flush_once() is None:
+                    return self.status()['depth'] == 0
+            else:
+                self._wake.set()
+                time.sleep(0.01)
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def flush_once(self) -> Optional[int]:
+        """
+        Apply the next due batch. Returns the number of operations flushed,
+        0 if the batch failed, or None if there was nothing due.
+        """
+        if self.failures and time.monotonic() < self.retry_at:
+            return None
+        # After a failure, isolate the head operation until it succeeds or is parked
+        limit = 1 if self.failures or self.isolate_until else self.batch_size
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, op, payload, attempts FROM pending ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+        if not rows:
+            return None
+        ops = [{'seq': seq, 'op': op, 'payload': load_document(text)} for seq, op, text, _ in rows]
+
+        try:
+            self._apply(ops)
+        except Exception as e:
+            self._record_failure(rows, e)
+            return 0
+
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    f"DELETE FROM pending WHERE seq IN ({','.join('?' * len(rows))})",
+                    [r[0] for r in rows]
+                )
+        self.failures = 0
+        self.last_error = None
+        if rows[-1][0] >= self.isolate_until:
+            self.isolate_until = 0
+        self.last_flush_at = datetime.now()
+        self.flushed += len(ops)
+        if self._on_flushed is not None:
+            try:
+                self._on_flushed(ops)
+            except Exception:
+                pass
+        return len(ops)
+
+    def _record_failure(self, rows, error: Exception):
+        message = f"{type(error).__name__}: {error}"
+        if not self._is_permanent(error):
+            self.failures += 1
+            self.last_error = message
+            delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - 1))
+            self.retry_at = time.monotonic() + delay * random.uniform(0.8, 1.2)
+            with self._lock:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE pending SET attempts = attempts + 1, last_error = ? WHERE seq = ?",
+                        [(message, r[0]) for r in rows])
+            return
+
+        # Retrying will not help. In a batch the culprit is unknown, so replay
+        # those operations one by one without waiting; a single one is parked.
+        self.failures = 0
+        self.retry_at = 0.0
+        if len(rows) > 1:
+            self.isolate_until = rows[-1][0]
+            return
+        seq, _, _, attempts = rows[0]
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO failed (seq, op, payload, attempts, last_error, enqueued_at, failed_at) "
+                    "SELECT seq, op, payload, ?, ?, enqueued_at, ? FROM pending WHERE seq = ?",
+                    (attempts + 1, message, time.time(), seq)
+                )
+                self._conn.execute("DELETE FROM pending WHERE seq = ?", (seq,))
+        self.last_error = None
+        if seq >= self.isolate_until:
+            self.isolate_until = 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Clear before flushing so an enqueue during the flush is not missed
+            self._wake.clear()
+            result = self.flush_once()
+            if result:
+                continue  # more may be waiting
+            if self.failures:
+                timeout = max(0.0, self.retry_at - time.monotonic())
+            else:
+                timeout = None if result is None else 0.0
+            self._wake.wait(timeout)